@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问答结果缓存
+
+相同的问题（规范化后）在相同的回答模式、AI模型和知识库版本下直接返回上次的回答，
+不再检索知识库和调用大模型。内存 LRU，条目超过 TTL 后失效；知识库版本号是缓存键的一部分，
+知识库变更后旧条目不再命中，随 LRU 淘汰。
+"""
+
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """按条目数限制的 TTL LRU 回答缓存，存取时复制，调用方可以修改返回的字典"""
+
+    def __init__(self, max_entries: int = 1000, ttl: int = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (response, expires_at)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            response = entry[0]
+        return copy.deepcopy(response)
+
+    def put(self, key: Hashable, response: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._entries[key] = (response, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify, render_template, session, redirect, url_for, Response
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -10,6 +11,7 @@ from functools import wraps
 from config import Config
 from db_utils import db_manager
 from enhanced_rag_engine import enhanced_rag_engine
+from embedding_worker import embedding_worker
 import csv
 import io
 from datetime import datetime
@@ -36,6 +38,14 @@ logger = logging.getLogger(__name__)
 
 # 使用增强版RAG引擎（已初始化）
 
+# 知识条目的向量嵌入由后台任务生成（每个工作进程一个线程，通过任务表协调）
+if Config.EMBEDDING_ASYNC:
+    embedding_worker.start()
+
+# 向量模型懒加载：启动时在后台线程预热，不阻塞应用启动
+if Config.MODEL_WARMUP_ON_START:
+    threading.Thread(target=enhanced_rag_engine.warm_up, name='model-warmup', daemon=True).start()
+
 # 权限检查装饰器
 def require_permission(permission_type):
     def decorator(f):
@@ -496,7 +506,8 @@ def revise_answer():
             question=original_interaction['question'],
             answer_mode='hybrid',  # 默认使用混合模式
             session_id=original_interaction['session_id'],
-            user_id=original_interaction['user_id']
+            user_id=original_interaction['user_id'],
+            use_cache=False  # 用户要求重新回答，不使用缓存的回答
         )
         
         # 保存重新回答记录
@@ -840,6 +851,16 @@ def health_check():
         logger.error(f"健康检查失败: {e}")
         return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
 
+@app.route('/admin/cache/stats')
+@login_required
+def admin_cache_stats():
+    """获取缓存命中率统计（当前工作进程）"""
+    try:
+        return jsonify(enhanced_rag_engine.get_cache_stats())
+    except Exception as e:
+        logger.error(f"获取缓存统计失败: {e}")
+        return jsonify({'error': '获取缓存统计失败'}), 500
+
 # 权限管理相关路由
 @app.route('/admin/permissions')
 @require_admin_access
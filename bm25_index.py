@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库 BM25 倒排索引（进程内）
+
+- 分词：文本规范化后，连续的中文按字切分为 1~2 字 n-gram，英文/数字按单词切分
+- 打分：BM25F，标题/内容/标签各字段先按字段长度归一化词频，再乘字段权重合并
+- 倒排列表在构建时预先算好每个 (词, 条目) 的 idf * 饱和词频，查询只需按词累加
+- 可与向量相似度加权融合
+"""
+
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+FIELD_TITLE = 'title'
+FIELD_CONTENT = 'content'
+FIELD_TAGS = 'tags'
+DEFAULT_FIELD_BOOSTS = {FIELD_TITLE: 3.0, FIELD_CONTENT: 1.0, FIELD_TAGS: 2.0}
+
+# 必含词过滤后的候选少于条目总数的 1/该值 时，只对候选打分
+_SPARSE_SCORING_RATIO = 16
+
+_TOKEN_RUN = re.compile(r'[a-z0-9]+(?:[._+#-][a-z0-9]+)*|[㐀-䶿一-鿿]+')
+
+
+def tokenize(text: str, max_ngram: int = 2) -> List[str]:
+    """分词：中文连续字符切分为 1~max_ngram 字的 n-gram，英文和数字保留整个单词"""
+    tokens = []
+    for run in _TOKEN_RUN.findall(normalize_text(text)):
+        if run.isascii():
+            tokens.append(run)
+            continue
+        for n in range(1, max_ngram + 1):
+            tokens.extend(run[i:i + n] for i in range(len(run) - n + 1))
+    return tokens
+
+
+class BM25Index:
+    """只读的 BM25F 倒排索引，知识库变更后整体重建"""
+
+    def __init__(self, ids: np.ndarray, postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 max_ngram: int = 2, version: Optional[int] = None):
+        self.ids = ids
+        self.postings = postings  # 词 -> (升序的条目位置数组, idf*饱和词频数组)
+        self.max_ngram = max_ngram
+        self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[int, Dict[str, str]]], field_boosts: Optional[Dict[str, float]] = None,
+              k1: float = 1.2, b: float = 0.75, max_ngram: int = 2, version: Optional[int] = None) -> 'BM25Index':
+        """从 [(知识ID, {字段: 文本}), ...] 构建索引"""
+        field_boosts = field_boosts or DEFAULT_FIELD_BOOSTS
+        ids = []
+        field_counts = {field: [] for field in field_boosts}
+        for knowledge_id, fields in documents:
+            ids.append(knowledge_id)
+            for field in field_boosts:
+                field_counts[field].append(Counter(tokenize(fields.get(field) or '', max_ngram)))
+
+        doc_count = len(ids)
+        weights = defaultdict(dict)  # 词 -> {条目位置: 加权归一化词频}
+        for field, boost in field_boosts.items():
+            counts = field_counts[field]
+            lengths = [sum(counter.values()) for counter in counts]
+            avg_length = (sum(lengths) / doc_count) if doc_count else 0.0
+            if not avg_length:
+                continue
+            for position, (counter, length) in enumerate(zip(counts, lengths)):
+                norm = boost / (1.0 - b + b * length / avg_length)
+                for term, tf in counter.items():
+                    term_weights = weights[term]
+                    term_weights[position] = term_weights.get(position, 0.0) + tf * norm
+
+        postings = {}
+        for term, term_weights in weights.items():
+            idf = math.log(1.0 + (doc_count - len(term_weights) + 0.5) / (len(term_weights) + 0.5))
+            positions = np.fromiter(term_weights.keys(), dtype=np.int32, count=len(term_weights))
+            tf = np.fromiter(term_weights.values(), dtype=np.float32, count=len(term_weights))
+            order = np.argsort(positions, kind='stable')  # 位置升序，便于求交集和二分查找
+            positions, tf = positions[order], tf[order]
+            postings[term] = (positions, (idf * tf * (k1 + 1.0) / (tf + k1)).astype(np.float32))
+
+        return cls(np.asarray(ids, dtype=np.int64), postings, max_ngram, version)
+
+    def _required_positions(self, required: str) -> Optional[np.ndarray]:
+        """包含 required 全部词项的条目位置（升序）；required 没有可索引的词项时返回 None（不过滤）"""
+        terms = set(tokenize(required, self.max_ngram))
+        if not terms:
+            return None
+        postings = []
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                return np.zeros(0, dtype=np.int32)
+            postings.append(posting[0])
+        postings.sort(key=len)
+        positions = postings[0]
+        for other in postings[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def search(self, query: str, top_k: int, required: Optional[str] = None) -> List[Tuple[int, float]]:
+        """查询，返回按分数降序的 [(知识ID, BM25分数), ...]
+
+        指定 required 时只返回包含其全部词项的条目（相当于标题或内容包含该关键词），
+        此时只对这些条目打分，不扫描完整的倒排列表。
+        """
+        if not len(self.ids) or top_k <= 0:
+            return []
+
+        query_terms = Counter(tokenize(query, self.max_ngram))
+        candidates = self._required_positions(required) if required else None
+        if candidates is None or len(candidates) > len(self.ids) // _SPARSE_SCORING_RATIO:
+            # 候选较多时直接按倒排列表累加全部条目的分数
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term, query_tf in query_terms.items():
+                posting = self.postings.get(term)
+                if posting is not None:
+                    scores[posting[0]] += posting[1] * query_tf
+            if candidates is None:
+                candidates = np.flatnonzero(scores > 0)
+            scores = scores[candidates]
+            keep = scores > 0
+            candidates, scores = candidates[keep], scores[keep]
+        else:
+            # 候选较少时只对候选二分查找各词项的权重
+            scores = np.zeros(len(candidates), dtype=np.float32)
+            for term, query_tf in query_terms.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                positions, weights = posting
+                locations = np.minimum(np.searchsorted(positions, candidates), len(positions) - 1)
+                found = positions[locations] == candidates
+                scores[found] += weights[locations[found]] * query_tf
+            keep = scores > 0
+            candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [(int(self.ids[candidates[i]]), float(scores[i])) for i in order]
+
+
+def fuse_scores(lexical_hits: List[Tuple[int, float]], vector_scores: Dict[int, float],
+                vector_weight: float) -> List[Tuple[int, float]]:
+    """BM25 与向量相似度加权融合，返回按融合分数降序的 [(知识ID, 分数), ...]
+
+    BM25 分数按本次结果的最大值归一化到 [0, 1]；只对 BM25 命中的条目打分，
+    不在向量结果中的条目向量分按 0 计。
+    """
+    if not lexical_hits:
+        return []
+    max_score = lexical_hits[0][1] or 1.0
+    fused = [(knowledge_id, (1.0 - vector_weight) * score / max_score
+              + vector_weight * max(vector_scores.get(knowledge_id, 0.0), 0.0))
+             for knowledge_id, score in lexical_hits]
+    fused.sort(key=lambda hit: hit[1], reverse=True)
+    return fused
+
+
+class LexicalIndexHolder:
+    """按知识库版本号刷新的 BM25 索引
+
+    首次查询时同步构建；之后每隔 check_interval 秒检查一次版本号，版本变化时在后台线程重建，
+    重建完成前继续使用旧索引，查询不会等待。
+    """
+
+    def __init__(self, builder: Callable[[int], BM25Index], version_fn: Callable[[], int],
+                 check_interval: int = 5):
+        self._builder = builder
+        self._version_fn = version_fn
+        self._check_interval = check_interval
+        self._index = None
+        self._last_check = 0.0
+        self._building = False
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """本进程修改了知识库，下次查询时立即检查版本号"""
+        self._last_check = 0.0
+
+    def get(self) -> Optional[BM25Index]:
+        if self._index is not None and time.time() - self._last_check < self._check_interval:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and time.time() - self._last_check < self._check_interval:
+                return self._index
+            self._last_check = time.time()
+            try:
+                version = self._version_fn()
+                if self._index is None:
+                    self._index = self._build(version)
+                elif self._index.version != version and not self._building:
+                    self._building = True
+                    threading.Thread(target=self._rebuild, args=(version,), name='bm25-rebuild', daemon=True).start()
+            except Exception as e:
+                logger.error(f"刷新BM25索引失败: {e}")
+            return self._index
+
+    def _build(self, version: int) -> BM25Index:
+        start_time = time.time()
+        index = self._builder(version)
+        logger.info(f"BM25索引构建完成: {len(index)} 条，{len(index.postings)} 个词项，"
+                    f"版本 {version}，耗时: {time.time() - start_time:.2f}秒")
+        return index
+
+    def _rebuild(self, version: int):
+        try:
+            self._index = self._build(version)
+        except Exception as e:
+            logger.error(f"重建BM25索引失败: {e}")
+        finally:
+            self._building = False
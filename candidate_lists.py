@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题类型候选知识列表（物化）
+
+问题经 _extract_keywords 归为少数几个问题类型之一，每个问题类型在关键词检索阶段的候选条目
+（按检索词搜索并通过严格相关性过滤的条目）只取决于知识库内容和词表。
+知识库版本或词表变化后在后台线程重新生成，结果写入 problem_type_candidates 表供其他工作进程直接读取；
+每个列表按 base_score（不计问题词匹配时的分数）降序排列；查询时按 (检索模式, 问题类型) 直接取出候选条目，
+只需在 base_score 上加上问题词匹配的分数。
+生成完成前返回 None，调用方退回实时检索。
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from problem_taxonomy import ProblemTaxonomy
+
+logger = logging.getLogger(__name__)
+
+MODE_HYBRID = 'hybrid'  # _strict_keyword_search：标题与问题类型严格相关
+MODE_STRICT = 'strict'  # _strict_keyword_search_strict：标题包含问题类型名称
+
+
+class CandidateLists:
+    """某个知识库版本、词表下各问题类型的候选条目（只读）"""
+
+    def __init__(self, kb_version: int, taxonomy: ProblemTaxonomy,
+                 lists: Dict[Tuple[str, str], List[Dict[str, Any]]]):
+        self.kb_version = kb_version
+        self.taxonomy = taxonomy
+        self._lists = lists  # (检索模式, 问题类型) -> [{'id', 'title', 'content', 'base_score'}, ...]
+
+    def __len__(self):
+        return sum(len(items) for items in self._lists.values())
+
+    def get(self, mode: str, problem_type: str) -> Optional[List[Dict[str, Any]]]:
+        """按 base_score 降序排列的候选条目；不是词表中的问题类型（如通用关键词）时返回 None"""
+        if problem_type not in self.taxonomy.type_bits:
+            return None
+        return self._lists.get((mode, problem_type), [])
+
+
+class CandidateListHolder:
+    """按知识库版本号和词表刷新的候选列表
+
+    每隔 check_interval 秒检查一次版本号；版本或词表变化后在后台线程重新生成，
+    生成期间返回 None（旧列表已不准确），不会阻塞查询。
+    """
+
+    def __init__(self, builder: Callable[[int, ProblemTaxonomy], CandidateLists], version_fn: Callable[[], int],
+                 taxonomy_fn: Callable[[], ProblemTaxonomy], check_interval: int = 5):
+        self._builder = builder
+        self._version_fn = version_fn
+        self._taxonomy_fn = taxonomy_fn
+        self._check_interval = check_interval
+        self._lists = None
+        self._version = None
+        self._last_check = 0.0
+        self._building = False
+        self._last_attempt = (None, None, 0.0)  # (版本号, 词表, 时间)，生成失败后间隔 check_interval 再重试
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """本进程修改了知识库，下次查询时立即检查版本号"""
+        self._last_check = 0.0
+
+    def get(self) -> Optional[CandidateLists]:
+        if time.time() - self._last_check >= self._check_interval:
+            with self._lock:
+                if time.time() - self._last_check >= self._check_interval:
+                    self._last_check = time.time()
+                    try:
+                        self._version = self._version_fn()
+                    except Exception as e:
+                        logger.error(f"检查知识库版本号失败: {e}")
+                        self._version = None
+
+        lists = self._lists
+        taxonomy = self._taxonomy_fn()
+        if lists is not None and lists.kb_version == self._version and lists.taxonomy is taxonomy:
+            return lists
+        self._start_build(self._version, taxonomy)
+        return None
+
+    def _start_build(self, version: Optional[int], taxonomy: ProblemTaxonomy):
+        if version is None:
+            return
+        with self._lock:
+            if self._building:
+                return
+            last_version, last_taxonomy, last_time = self._last_attempt
+            if (last_version, last_taxonomy) == (version, taxonomy) and time.time() - last_time < self._check_interval:
+                return
+            self._building = True
+            self._last_attempt = (version, taxonomy, time.time())
+        threading.Thread(target=self._build, args=(version, taxonomy), name='candidate-lists', daemon=True).start()
+
+    def _build(self, version: int, taxonomy: ProblemTaxonomy):
+        try:
+            start_time = time.time()
+            lists = self._builder(version, taxonomy)
+            # 生成期间知识库又有变化时丢弃，下次查询按新版本重新生成
+            if self._version_fn() != version:
+                logger.info(f"问题类型候选列表生成期间知识库版本已变化，丢弃版本 {version} 的结果")
+                return
+            self._lists = lists
+            logger.info(f"问题类型候选列表生成完成: {len(lists)} 条，知识库版本 {version}，"
+                        f"词表版本 {taxonomy.version}，耗时: {time.time() - start_time:.2f}秒")
+        except Exception as e:
+            logger.error(f"生成问题类型候选列表失败: {e}")
+        finally:
+            self._building = False
@@ -49,10 +49,71 @@ class Config:
     TEMPERATURE = float(os.getenv('TEMPERATURE', 0.3))  # 降低随机性
     TOP_K_SEARCH = int(os.getenv('TOP_K_SEARCH', 3))  # 减少搜索数量
     SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.1))  # 降低相似度阈值
-    
+
+    # 向量模型配置
+    EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')  # 推理后端: torch / torch_int8 / onnx
+    EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', '')  # ONNX后端使用的模型文件（如 onnx/model_qint8_avx512.onnx），为空时使用默认导出
+    MODEL_WARMUP_ON_START = os.getenv('MODEL_WARMUP_ON_START', 'true').lower() == 'true'  # 应用启动后在后台线程预加载向量模型
+    EMBEDDING_BACKEND_MIN_COSINE = float(os.getenv('EMBEDDING_BACKEND_MIN_COSINE', 0.98))  # 自检时与fp32参考向量的最小余弦相似度
+    EMBEDDING_SERVICE_ENABLED = os.getenv('EMBEDDING_SERVICE_ENABLED', 'false').lower() == 'true'  # 由独立的向量嵌入服务进程编码
+    EMBEDDING_SERVICE_SOCKET = os.getenv('EMBEDDING_SERVICE_SOCKET', 'data/embedding.sock')  # 向量嵌入服务的Unix socket路径
+    EMBEDDING_SERVICE_TIMEOUT = float(os.getenv('EMBEDDING_SERVICE_TIMEOUT', 10))  # 调用向量嵌入服务的超时时间（秒）
+    EMBEDDING_SERVICE_MAX_BATCH = int(os.getenv('EMBEDDING_SERVICE_MAX_BATCH', 64))  # 服务端每批编码的最大文本数，客户端也按此拆分批量请求
+    EMBEDDING_SERVICE_MAX_WAIT_MS = float(os.getenv('EMBEDDING_SERVICE_MAX_WAIT_MS', 5))  # 服务端凑批的最长等待时间（毫秒）
+
+    # 知识分段配置
+    CHUNK_MAX_CHARS = int(os.getenv('CHUNK_MAX_CHARS', 200))  # 每个段落的最大字符数（模型最多处理256个token）
+    CONTEXT_MAX_PASSAGES = int(os.getenv('CONTEXT_MAX_PASSAGES', 4))  # 提示词中最多包含的段落数
+
+    # 向量索引配置
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))  # 批量编码大小
+    EMBEDDING_ASYNC = os.getenv('EMBEDDING_ASYNC', 'true').lower() == 'true'  # 新增/修改知识条目时由后台任务生成向量
+    EMBEDDING_JOB_BATCH_SIZE = int(os.getenv('EMBEDDING_JOB_BATCH_SIZE', 32))  # 后台任务每批处理的条目数
+    EMBEDDING_WORKER_POLL_INTERVAL = float(os.getenv('EMBEDDING_WORKER_POLL_INTERVAL', 2))  # 后台任务轮询间隔（秒）
+    EMBEDDING_JOB_MAX_ATTEMPTS = int(os.getenv('EMBEDDING_JOB_MAX_ATTEMPTS', 3))  # 失败重试次数上限
+    EMBEDDING_JOB_TIMEOUT = int(os.getenv('EMBEDDING_JOB_TIMEOUT', 300))  # running 状态超过该秒数视为进程已退出，重新领取
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))  # 知识库批量导入时每块写入/编码的条目数
+    VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', 'data/vector_index')  # 共享向量索引文件目录（各工作进程mmap映射）
+    VECTOR_INDEX_CHECK_INTERVAL = int(os.getenv('VECTOR_INDEX_CHECK_INTERVAL', 5))  # 知识库版本号检查间隔（秒）
+    VECTOR_INDEX_COMPACT_THRESHOLD = int(os.getenv('VECTOR_INDEX_COMPACT_THRESHOLD', 500))  # 增量变更达到该条数时合并为新快照
+    VECTOR_INDEX_RETRY_INTERVAL = int(os.getenv('VECTOR_INDEX_RETRY_INTERVAL', 60))  # 构建/合并快照失败后的重试间隔（秒），期间继续使用旧索引
+    VECTOR_INDEX_BACKEND = os.getenv('VECTOR_INDEX_BACKEND', 'brute')  # brute: 全量扫描; ivf: IVF-flat近似检索
+    IVF_NLIST = int(os.getenv('IVF_NLIST', 0))  # 倒排列表数量，0表示按 4*sqrt(N) 自动选取
+    IVF_NPROBE = int(os.getenv('IVF_NPROBE', 16))  # 每次查询探测的列表数，越大召回越高、速度越慢
+    IVF_MIN_ENTRIES = int(os.getenv('IVF_MIN_ENTRIES', 20000))  # 知识条目少于该数量时仍使用全量扫描
+    VECTOR_INDEX_QUANTIZE = os.getenv('VECTOR_INDEX_QUANTIZE', 'false').lower() == 'true'  # 用int8量化矩阵生成候选（常驻内存约为1/4）
+    VECTOR_INDEX_RESCORE_FACTOR = int(os.getenv('VECTOR_INDEX_RESCORE_FACTOR', 4))  # 量化打分取 top_k * 该倍数个候选做float32精确重打分
+
+    # 关键词检索配置
+    LEXICAL_SEARCH_BACKEND = os.getenv('LEXICAL_SEARCH_BACKEND', 'like')  # 关键词检索方式: like（MySQL LIKE）/ bm25（进程内BM25倒排索引）
+    BM25_K1 = float(os.getenv('BM25_K1', 1.2))  # BM25词频饱和参数
+    BM25_B = float(os.getenv('BM25_B', 0.75))  # BM25长度归一化参数
+    BM25_TITLE_BOOST = float(os.getenv('BM25_TITLE_BOOST', 3.0))  # 标题字段权重
+    BM25_CONTENT_BOOST = float(os.getenv('BM25_CONTENT_BOOST', 1.0))  # 内容字段权重
+    BM25_TAGS_BOOST = float(os.getenv('BM25_TAGS_BOOST', 2.0))  # 标签字段权重
+    BM25_VECTOR_WEIGHT = float(os.getenv('BM25_VECTOR_WEIGHT', 0.3))  # 与向量相似度融合时向量分的权重（0为不融合）
+    PROBLEM_TAXONOMY_FILE = os.getenv('PROBLEM_TAXONOMY_FILE', 'problem_taxonomy.json')  # 问题类型词表文件
+    PROBLEM_TAXONOMY_CHECK_INTERVAL = float(os.getenv('PROBLEM_TAXONOMY_CHECK_INTERVAL', 10))  # 检查词表文件是否修改的间隔（秒）
+    KNOWLEDGE_FEATURE_CACHE_SIZE = int(os.getenv('KNOWLEDGE_FEATURE_CACHE_SIZE', 10000))  # 知识条目打分特征缓存的最大条目数
+    KEYWORD_EXTRACTOR_REFRESH_INTERVAL = int(os.getenv('KEYWORD_EXTRACTOR_REFRESH_INTERVAL', 300))  # 保存知识条目时提取关键词所用的关键词表缓存时间（秒），修改关键词表后最多经过该时间生效
+    FULLTEXT_SEARCH_ENABLED = os.getenv('FULLTEXT_SEARCH_ENABLED', 'true').lower() == 'true'  # 存在ngram全文索引时用 MATCH ... AGAINST 预筛选，否则退回 LIKE
+    FULLTEXT_INDEX_CHECK_INTERVAL = int(os.getenv('FULLTEXT_INDEX_CHECK_INTERVAL', 300))  # 全文索引是否存在的缓存时间（秒），执行迁移后无需重启即可生效
+    FULLTEXT_NGRAM_TOKEN_SIZE = int(os.getenv('FULLTEXT_NGRAM_TOKEN_SIZE', 2))  # 与MySQL的 ngram_token_size 一致，更短的搜索词只用 LIKE
+
     # 缓存配置
     CACHE_SIZE = int(os.getenv('CACHE_SIZE', 1000))  # 增加缓存大小
     CACHE_TTL = int(os.getenv('CACHE_TTL', 3600))  # 缓存1小时
+    EMBEDDING_CACHE_MAX_BYTES = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 问题向量缓存的内存上限（字节）
+    SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 1000))  # 关键词检索结果缓存的最大条目数（知识库版本变化后失效），0为不缓存
+    SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', 2000))  # 大模型回答语义缓存的最大条目数，0为不缓存
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.95))  # 问题向量余弦相似度达到该值且知识上下文相同时复用回答
+    EMBEDDING_CACHE_DISK_PATH = os.getenv('EMBEDDING_CACHE_DISK_PATH', '')  # 多进程共享的向量磁盘缓存（SQLite文件，如 data/embedding_cache.db），为空时不启用
+
+    # 启动预热配置（按历史问答预计算高频问题的向量并预先检索）
+    WARMUP_QUESTION_COUNT = int(os.getenv('WARMUP_QUESTION_COUNT', 200))  # 预热的高频问题数
+    WARMUP_HISTORY_DAYS = int(os.getenv('WARMUP_HISTORY_DAYS', 7))  # 统计最近多少天的问答
+    WARMUP_TIME_BUDGET = float(os.getenv('WARMUP_TIME_BUDGET', 60))  # 预热最长耗时（秒），超时后停止
     
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
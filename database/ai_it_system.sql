@@ -4,6 +4,8 @@
 
 SET NAMES utf8mb4;
 SET FOREIGN_KEY_CHECKS = 0;
+-- ngram 全文索引不使用英文停用词表（否则包含停用词的二元组不会被索引）
+SET SESSION innodb_ft_enable_stopword = OFF;
 
 -- 创建数据库
 CREATE DATABASE IF NOT EXISTS `ai_it_system` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
@@ -43,7 +45,8 @@ CREATE TABLE `interactions` (
   PRIMARY KEY (`id`),
   KEY `idx_timestamp` (`timestamp`),
   KEY `idx_user` (`user_id`),
-  KEY `idx_session` (`session_id`)
+  KEY `idx_session` (`session_id`),
+  FULLTEXT KEY `ft_interactions_ngram` (`question`,`ai_response`) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ----------------------------
@@ -62,7 +65,8 @@ CREATE TABLE `knowledge_base` (
   `last_used` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `use_count` int(11) DEFAULT 0,
   PRIMARY KEY (`id`),
-  FULLTEXT KEY `title_content` (`title`,`content`)
+  FULLTEXT KEY `title_content` (`title`,`content`),
+  FULLTEXT KEY `ft_knowledge_ngram` (`title`,`content`,`tags`) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ----------------------------
@@ -189,6 +193,77 @@ CREATE TABLE `knowledge_keywords` (
   KEY `idx_keyword` (`keyword_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ----------------------------
+-- 知识库元数据表（知识库版本号等）
+-- ----------------------------
+DROP TABLE IF EXISTS `kb_meta`;
+CREATE TABLE `kb_meta` (
+  `meta_key` varchar(50) NOT NULL,
+  `meta_value` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`meta_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ----------------------------
+-- 知识库变更记录表（向量索引增量更新）
+-- ----------------------------
+DROP TABLE IF EXISTS `kb_change_log`;
+CREATE TABLE `kb_change_log` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `knowledge_id` int(11) NOT NULL,
+  `action` enum('upsert','delete') NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `idx_knowledge_id` (`knowledge_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ----------------------------
+-- 向量嵌入任务表（后台异步生成知识条目向量）
+-- ----------------------------
+DROP TABLE IF EXISTS `embedding_jobs`;
+CREATE TABLE `embedding_jobs` (
+  `knowledge_id` int(11) NOT NULL,
+  `status` enum('pending','running','done','failed') NOT NULL DEFAULT 'pending',
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `claim_token` varchar(32) DEFAULT NULL,
+  `error_message` text DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`knowledge_id`),
+  KEY `idx_status` (`status`,`updated_at`),
+  KEY `idx_claim_token` (`claim_token`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ----------------------------
+-- 知识段落表（段落偏移及段落向量）
+-- ----------------------------
+DROP TABLE IF EXISTS `knowledge_chunks`;
+CREATE TABLE `knowledge_chunks` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `knowledge_id` int(11) NOT NULL,
+  `chunk_index` int(11) NOT NULL,
+  `start_offset` int(11) NOT NULL,
+  `end_offset` int(11) NOT NULL,
+  `embedding` blob DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_knowledge_id` (`knowledge_id`,`chunk_index`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ----------------------------
+-- 问题类型候选知识表（各知识库版本预先生成）
+-- ----------------------------
+DROP TABLE IF EXISTS `problem_type_candidates`;
+CREATE TABLE `problem_type_candidates` (
+  `kb_version` bigint(20) NOT NULL,
+  `taxonomy_version` int(11) NOT NULL,
+  `search_mode` varchar(10) NOT NULL,
+  `problem_type` varchar(100) NOT NULL,
+  `candidate_rank` int(11) NOT NULL,
+  `knowledge_id` int(11) NOT NULL,
+  `base_score` double NOT NULL,
+  PRIMARY KEY (`kb_version`,`taxonomy_version`,`search_mode`,`problem_type`,`candidate_rank`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- ----------------------------
 -- 用户对话偏好表
 -- ----------------------------
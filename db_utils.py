@@ -1,21 +1,41 @@
 import mysql.connector
 from mysql.connector import Error, pooling
 import numpy as np
-import pickle
 import logging
 from datetime import datetime
 from config import Config
+from embedding_codec import encode_embedding, decode_embedding, encode_vector
+from search_cache import VersionedResultCache
+from keyword_matcher import KeywordExtractor
 import threading
 import time
+import re
+from collections import Counter
 
 # 配置日志
 logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
+# ngram 全文索引：表名 -> (索引名, 列)
+FULLTEXT_INDEXES = {
+    'knowledge_base': ('ft_knowledge_ngram', ('title', 'content', 'tags')),
+    'interactions': ('ft_interactions_ngram', ('question', 'ai_response')),
+}
+
+KEYWORD_LINK_BATCH_SIZE = 500  # 批量建立关键词关联时每条语句的行数
+
+# 可以用全文索引预筛选的搜索词：只含文字和数字（空白、标点不会被 ngram 索引，'_' 是 LIKE 通配符）
+_FULLTEXT_TERM = re.compile(r'^[^\W_]+$')
+
 class DatabaseManager:
     def __init__(self):
         self.connection_pool = None
         self._lock = threading.Lock()
+        self._fulltext_status = {}  # 表名 -> (是否有全文索引, 检查时间)
+        # 关键词检索结果缓存，知识库版本号变化后失效
+        self.search_cache = VersionedResultCache(self.get_kb_version, Config.SEARCH_CACHE_SIZE,
+                                                 Config.VECTOR_INDEX_CHECK_INTERVAL)
+        self._keyword_extractor = None  # (KeywordExtractor, 加载时间)
         self.connect()
     
     def connect(self):
@@ -202,10 +222,77 @@ class DatabaseManager:
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
             
+            # 创建知识库元数据表（保存知识库版本号等）
+            kb_meta_table = """
+            CREATE TABLE IF NOT EXISTS kb_meta (
+                meta_key VARCHAR(50) PRIMARY KEY,
+                meta_value BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+            
+            # 创建知识库变更记录表（向量索引据此增量更新）
+            kb_change_log_table = """
+            CREATE TABLE IF NOT EXISTS kb_change_log (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                knowledge_id INT NOT NULL,
+                action ENUM('upsert', 'delete') NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_knowledge_id (knowledge_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+            
+            # 创建向量嵌入任务表（后台线程异步生成向量）
+            embedding_jobs_table = """
+            CREATE TABLE IF NOT EXISTS embedding_jobs (
+                knowledge_id INT PRIMARY KEY,
+                status ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                claim_token VARCHAR(32) NULL,
+                error_message TEXT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_status (status, updated_at),
+                INDEX idx_claim_token (claim_token)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+            
+            # 创建知识段落表（段落偏移及段落向量）
+            knowledge_chunks_table = """
+            CREATE TABLE IF NOT EXISTS knowledge_chunks (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                knowledge_id INT NOT NULL,
+                chunk_index INT NOT NULL,
+                start_offset INT NOT NULL,
+                end_offset INT NOT NULL,
+                embedding BLOB,
+                INDEX idx_knowledge_id (knowledge_id, chunk_index)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+            
+            # 创建问题类型候选知识表（知识库每个版本预先算好的各问题类型候选条目）
+            problem_type_candidates_table = """
+            CREATE TABLE IF NOT EXISTS problem_type_candidates (
+                kb_version BIGINT NOT NULL,
+                taxonomy_version INT NOT NULL,
+                search_mode VARCHAR(10) NOT NULL,
+                problem_type VARCHAR(100) NOT NULL,
+                candidate_rank INT NOT NULL,
+                knowledge_id INT NOT NULL,
+                base_score DOUBLE NOT NULL,
+                PRIMARY KEY (kb_version, taxonomy_version, search_mode, problem_type, candidate_rank)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+            
             self.execute_query(users_table, fetch=False)
             self.execute_query(interactions_table, fetch=False)
             self.execute_query(knowledge_table, fetch=False)
             self.execute_query(tickets_table, fetch=False)
+            self.execute_query(kb_meta_table, fetch=False)
+            self.execute_query(kb_change_log_table, fetch=False)
+            self.execute_query(embedding_jobs_table, fetch=False)
+            self.execute_query(knowledge_chunks_table, fetch=False)
+            self.execute_query(problem_type_candidates_table, fetch=False)
             
             logger.info("数据库表创建成功")
             
@@ -213,6 +300,74 @@ class DatabaseManager:
             logger.error(f"创建数据库表失败: {e}")
             raise
     
+    def create_fulltext_indexes(self):
+        """为 knowledge_base、interactions 创建 ngram 全文索引（已存在的跳过），返回新建的索引名"""
+        created = []
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        try:
+            # 默认的英文停用词表会让 ngram 分词丢弃包含停用词的二元组，建索引时关闭
+            cursor.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+            for table, (index_name, columns) in FULLTEXT_INDEXES.items():
+                cursor.execute(
+                    "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                    (table, index_name)
+                )
+                if cursor.fetchone()[0]:
+                    continue
+                start_time = time.time()
+                cursor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {index_name} ({', '.join(columns)}) WITH PARSER ngram")
+                logger.info(f"全文索引 {table}.{index_name} 创建完成，耗时: {time.time() - start_time:.1f}秒")
+                created.append(index_name)
+            self._fulltext_status.clear()
+            return created
+        except Error as e:
+            logger.error(f"创建全文索引失败: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def has_fulltext_index(self, table):
+        """表上是否已建 ngram 全文索引（结果缓存 Config.FULLTEXT_INDEX_CHECK_INTERVAL 秒）"""
+        cached = self._fulltext_status.get(table)
+        if cached and time.time() - cached[1] < Config.FULLTEXT_INDEX_CHECK_INTERVAL:
+            return cached[0]
+        
+        index_name = FULLTEXT_INDEXES[table][0]
+        try:
+            result = self.execute_query(
+                "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                (table, index_name)
+            )
+            available = bool(result and result[0][0])
+        except Error as e:
+            logger.warning(f"检查全文索引失败: {e}")
+            available = False
+        self._fulltext_status[table] = (available, time.time())
+        return available
+    
+    def _fulltext_filter(self, table, terms, alias=''):
+        """生成 MATCH ... AGAINST 预筛选条件，返回 (SQL, 参数)；不适用时返回 (None, None)
+
+        ngram 短语检索命中的行是 LIKE '%词%' 命中行的超集，与原 LIKE 条件 AND 组合后结果不变，
+        但 MySQL 会先用全文索引定位候选行，不再全表扫描。多个词之间为"或"的关系。
+        索引不存在、任一词短于 ngram_token_size 或含有不会被索引的字符时只用 LIKE。
+        """
+        terms = [term for term in terms if term]
+        if not Config.FULLTEXT_SEARCH_ENABLED or not terms:
+            return None, None
+        if any(len(term) < Config.FULLTEXT_NGRAM_TOKEN_SIZE or not _FULLTEXT_TERM.match(term) for term in terms):
+            return None, None
+        if not self.has_fulltext_index(table):
+            return None, None
+        
+        prefix = f"{alias}." if alias else ''
+        columns = ', '.join(prefix + column for column in FULLTEXT_INDEXES[table][1])
+        return f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)", ' '.join(f'"{term}"' for term in terms)
+    
     def add_interaction(self, session_id, user_id, question, ai_response, confidence, is_escalated=False, ticket_id=None):
         """添加交互记录"""
         connection = None
@@ -275,17 +430,18 @@ class DatabaseManager:
                 except:
                     pass
     
-    def update_knowledge_embedding(self, knowledge_id, content):
+    def update_knowledge_embedding(self, knowledge_id, title, content):
         """更新知识库条目的向量嵌入"""
         try:
-            from enhanced_rag_engine import EnhancedRAGEngine
-            rag_engine = EnhancedRAGEngine()
-            embedding = rag_engine.generate_embedding(content)
+            from enhanced_rag_engine import enhanced_rag_engine
+            embeddings = enhanced_rag_engine.encode_knowledge_items([(title, content)])
             
-            if embedding:
+            if embeddings:
+                title_embedding, content_embedding, passages = embeddings[0]
                 query = "UPDATE knowledge_base SET embedding = %s WHERE id = %s"
-                params = (pickle.dumps(embedding), knowledge_id)
+                params = (encode_embedding(title_embedding, content_embedding), knowledge_id)
                 self.execute_query(query, params, fetch=False)
+                self.save_knowledge_chunks({knowledge_id: passages})
                 logger.info(f"知识条目 {knowledge_id} 的向量嵌入更新成功")
             else:
                 logger.warning(f"无法为知识条目 {knowledge_id} 生成向量嵌入")
@@ -392,6 +548,32 @@ class DatabaseManager:
             logger.error(f"获取知识库列表失败: {e}")
             return []
     
+    def get_all_knowledge_texts(self):
+        """获取所有知识条目的标题、内容和标签（用于构建BM25索引）"""
+        try:
+            query = "SELECT id, title, content, tags FROM knowledge_base"
+            return self.execute_query(query, dictionary=True)
+            
+        except Error as e:
+            logger.error(f"获取知识库文本失败: {e}")
+            return []
+    
+    def get_all_knowledge_embeddings(self):
+        """获取所有知识条目及其存储的向量嵌入（用于构建向量索引，跳过向量尚未生成完成的条目）"""
+        try:
+            query = """
+            SELECT kb.id, kb.title, kb.content, kb.embedding
+            FROM knowledge_base kb
+            LEFT JOIN embedding_jobs ej ON ej.knowledge_id = kb.id
+            WHERE ej.status IS NULL OR ej.status = 'done'
+            ORDER BY kb.created_at DESC
+            """
+            return self.execute_query(query, dictionary=True)
+            
+        except Error as e:
+            logger.error(f"获取知识库向量嵌入失败: {e}")
+            return []
+    
     def search_knowledge_by_keyword(self, keyword):
         """根据关键词搜索知识库 - 只搜索标题，提高精准度"""
         try:
@@ -484,10 +666,15 @@ class DatabaseManager:
             similarities = []
             for row in results:
                 knowledge_id, title, content, embedding_blob = row
-                if embedding_blob:
-                    stored_embedding = pickle.loads(embedding_blob)
-                    similarity = self.calculate_cosine_similarity(query_embedding, stored_embedding)
-                    similarities.append((knowledge_id, title, content, similarity))
+                title_embedding, content_embedding = decode_embedding(embedding_blob)
+                if content_embedding is None:
+                    continue
+                similarity = self.calculate_cosine_similarity(query_embedding, content_embedding)
+                if title_embedding is not None:
+                    # 标题权重更高，与向量检索保持一致
+                    title_similarity = self.calculate_cosine_similarity(query_embedding, title_embedding)
+                    similarity = title_similarity * 0.8 + similarity * 0.2
+                similarities.append((knowledge_id, title, content, similarity))
             
             # 按相似度排序并返回top_k
             similarities.sort(key=lambda x: x[3], reverse=True)
@@ -529,6 +716,22 @@ class DatabaseManager:
             logger.error(f"创建工单失败: {e}")
             raise
     
+    def get_frequent_questions(self, days=7, limit=200):
+        """获取最近若干天内提问次数最多的问题，按次数降序返回 [(问题, 次数), ...]"""
+        try:
+            query = """
+            SELECT question, COUNT(*) AS ask_count
+            FROM interactions
+            WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
+            GROUP BY question
+            ORDER BY ask_count DESC
+            LIMIT %s
+            """
+            return [(row[0], row[1]) for row in self.execute_query(query, (days, limit)) or []]
+        except Error as e:
+            logger.error(f"获取高频问题失败: {e}")
+            return []
+
     def get_interaction_stats(self):
         """获取交互统计信息"""
         try:
@@ -616,6 +819,12 @@ class DatabaseManager:
                         term_param = f"%{term.strip()}%"
                         search_params.extend([term_param, term_param, term_param])
                 
+                # 有全文索引时先用 MATCH 缩小范围
+                fulltext_sql, fulltext_param = self._fulltext_filter('knowledge_base', search_terms)
+                if fulltext_sql:
+                    where_conditions.append(fulltext_sql)
+                    params.append(fulltext_param)
+                
                 if search_conditions:
                     where_conditions.append(f"({' OR '.join(search_conditions)})")
                     params.extend(search_params)
@@ -684,13 +893,14 @@ class DatabaseManager:
                 # 获取插入的ID
                 knowledge_id = cursor.lastrowid
                 
-                # 自动生成向量嵌入
+                # 自动生成向量嵌入（异步模式下交给后台任务）
                 if knowledge_id:
-                    self._generate_embedding_for_knowledge(knowledge_id, content)
+                    self._schedule_embedding(knowledge_id, title, content)
                 
                 # 自动提取和添加关键词
                 if knowledge_id:
                     self._extract_and_add_keywords(knowledge_id, title, content)
+                    self._notify_knowledge_changed(knowledge_id)
                 
                 return knowledge_id
                 
@@ -702,28 +912,382 @@ class DatabaseManager:
             logger.error(f"添加知识条目失败: {e}")
             raise
     
-    def _generate_embedding_for_knowledge(self, knowledge_id, content):
-        """为知识条目生成向量嵌入"""
+    def _generate_embedding_for_knowledge(self, knowledge_id, title, content):
+        """为知识条目生成向量嵌入（标题向量和内容向量分别存储）"""
         try:
             from enhanced_rag_engine import enhanced_rag_engine
             
-            # 生成向量嵌入
-            embedding = enhanced_rag_engine.generate_embedding(content)
+            # 生成向量嵌入（标题、全文及各段落）
+            title_embedding, content_embedding, passages = enhanced_rag_engine.encode_knowledge_items([(title, content)])[0]
             
-            # 将向量嵌入存储到数据库
-            import pickle
-            embedding_blob = pickle.dumps(embedding)
+            # 将向量嵌入以float32二进制格式存储到数据库
+            embedding_blob = encode_embedding(title_embedding, content_embedding)
             
             query = "UPDATE knowledge_base SET embedding = %s WHERE id = %s"
             params = (embedding_blob, knowledge_id)
             self.execute_query(query, params, fetch=False)
+            self.save_knowledge_chunks({knowledge_id: passages})
             
-            logger.info(f"知识条目 {knowledge_id} 的向量嵌入生成成功")
-            
+            logger.info(f"知识条目 {knowledge_id} 的向量嵌入生成成功，共 {len(passages)} 个段落")
+
         except Exception as e:
             logger.error(f"生成向量嵌入失败: {e}")
             # 不抛出异常，避免影响知识条目的添加
     
+    def _schedule_embedding(self, knowledge_id, title, content):
+        """生成知识条目的向量嵌入：异步模式下写入任务表后立即返回，否则同步生成"""
+        if Config.EMBEDDING_ASYNC:
+            self.enqueue_embedding_job(knowledge_id)
+        else:
+            self._generate_embedding_for_knowledge(knowledge_id, title, content)
+    
+    def enqueue_embedding_job(self, knowledge_id):
+        """提交向量嵌入任务；条目原有向量作废，任务完成前不参与向量检索"""
+        try:
+            self.execute_query("UPDATE knowledge_base SET embedding = NULL WHERE id = %s", (knowledge_id,), fetch=False)
+            self.execute_query("DELETE FROM knowledge_chunks WHERE knowledge_id = %s", (knowledge_id,), fetch=False)
+            query = """
+            INSERT INTO embedding_jobs (knowledge_id, status) VALUES (%s, 'pending')
+            ON DUPLICATE KEY UPDATE status = 'pending', attempts = 0, claim_token = NULL, error_message = NULL
+            """
+            self.execute_query(query, (knowledge_id,), fetch=False)
+            
+            from embedding_worker import embedding_worker
+            embedding_worker.notify()
+            
+        except Error as e:
+            logger.error(f"提交向量嵌入任务失败: {e}")
+    
+    def claim_embedding_jobs(self, claim_token, limit, job_timeout, max_attempts):
+        """领取一批待处理任务（含超时未完成的 running 任务），返回条目的标题和内容
+
+        超时的 running 任务已达到最大重试次数时标记为 failed，不再领取
+        （例如每次处理都会导致进程退出的条目）。
+        """
+        try:
+            query = """
+            UPDATE embedding_jobs
+            SET status = 'failed', claim_token = NULL, error_message = '处理超时次数达到上限'
+            WHERE status = 'running' AND updated_at < NOW() - INTERVAL %s SECOND AND attempts >= %s
+            """
+            self.execute_query(query, (job_timeout, max_attempts), fetch=False)
+            
+            query = """
+            UPDATE embedding_jobs
+            SET status = 'running', claim_token = %s, attempts = attempts + 1
+            WHERE status = 'pending'
+               OR (status = 'running' AND updated_at < NOW() - INTERVAL %s SECOND AND attempts < %s)
+            ORDER BY updated_at
+            LIMIT %s
+            """
+            claimed = self.execute_query(query, (claim_token, job_timeout, max_attempts, limit), fetch=False)
+            if not claimed:
+                return []
+            
+            query = """
+            SELECT ej.knowledge_id, kb.title, kb.content
+            FROM embedding_jobs ej
+            JOIN knowledge_base kb ON kb.id = ej.knowledge_id
+            WHERE ej.claim_token = %s
+            """
+            return self.execute_query(query, (claim_token,), dictionary=True)
+            
+        except Error as e:
+            logger.error(f"领取向量嵌入任务失败: {e}")
+            return []
+    
+    def complete_embedding_jobs(self, claim_token, embeddings):
+        """回写向量和段落并把任务标记为完成；领取后又被重新提交的任务不回写。返回完成的条目ID
+
+        embeddings 为 [(条目ID, 标题向量, 内容向量, [(start, end, 段落向量), ...]), ...]。
+        """
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection()
+            cursor = connection.cursor()
+            
+            query = """
+            UPDATE knowledge_base kb
+            JOIN embedding_jobs ej ON ej.knowledge_id = kb.id
+            SET kb.embedding = %s
+            WHERE kb.id = %s AND ej.claim_token = %s
+            """
+            cursor.executemany(query, [
+                (encode_embedding(title_embedding, content_embedding), knowledge_id, claim_token)
+                for knowledge_id, title_embedding, content_embedding, _ in embeddings
+            ])
+            
+            cursor.execute("SELECT knowledge_id FROM embedding_jobs WHERE claim_token = %s", (claim_token,))
+            done_ids = [row[0] for row in cursor.fetchall()]
+            done = set(done_ids)
+            self.save_knowledge_chunks({
+                knowledge_id: passages for knowledge_id, _, _, passages in embeddings if knowledge_id in done
+            }, cursor=cursor)
+            cursor.execute(
+                "UPDATE embedding_jobs SET status = 'done', claim_token = NULL, error_message = NULL WHERE claim_token = %s",
+                (claim_token,)
+            )
+            connection.commit()
+            return done_ids
+            
+        except Error as e:
+            logger.error(f"回写向量嵌入失败: {e}")
+            if connection:
+                connection.rollback()
+            self.fail_embedding_jobs(claim_token, str(e), Config.EMBEDDING_JOB_MAX_ATTEMPTS)
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+    
+    def fail_embedding_jobs(self, claim_token, error_message, max_attempts):
+        """任务失败：未超过最大重试次数的重新排队，否则标记为 failed"""
+        try:
+            query = """
+            UPDATE embedding_jobs
+            SET status = IF(attempts >= %s, 'failed', 'pending'), claim_token = NULL, error_message = %s
+            WHERE claim_token = %s
+            """
+            self.execute_query(query, (max_attempts, error_message[:1000], claim_token), fetch=False)
+        except Error as e:
+            logger.error(f"更新向量嵌入任务状态失败: {e}")
+    
+    def save_knowledge_chunks(self, passages_by_id, cursor=None):
+        """替换知识条目的段落，passages_by_id 为 {条目ID: [(start, end, 段落向量), ...]}
+
+        传入 cursor 时在调用方的事务中执行（由调用方提交），否则单独提交。
+        """
+        if not passages_by_id:
+            return
+        
+        connection = None
+        own_cursor = cursor is None
+        try:
+            if own_cursor:
+                connection = self.get_connection()
+                cursor = connection.cursor()
+            
+            knowledge_ids = list(passages_by_id.keys())
+            placeholders = ', '.join(['%s'] * len(knowledge_ids))
+            cursor.execute(f"DELETE FROM knowledge_chunks WHERE knowledge_id IN ({placeholders})", tuple(knowledge_ids))
+            
+            params = [
+                (knowledge_id, chunk_index, start, end, encode_vector(vector))
+                for knowledge_id, passages in passages_by_id.items()
+                for chunk_index, (start, end, vector) in enumerate(passages)
+            ]
+            if params:
+                query = """
+                INSERT INTO knowledge_chunks (knowledge_id, chunk_index, start_offset, end_offset, embedding)
+                VALUES (%s, %s, %s, %s, %s)
+                """
+                cursor.executemany(query, params)
+            
+            if own_cursor:
+                connection.commit()
+                
+        except Error as e:
+            logger.error(f"保存知识段落失败: {e}")
+            if not own_cursor:
+                raise
+        finally:
+            if own_cursor:
+                if cursor:
+                    cursor.close()
+                if connection:
+                    connection.close()
+    
+    def get_knowledge_chunks(self, knowledge_ids):
+        """批量获取知识条目的段落，返回 {条目ID: [段落, ...]}（按段落顺序）"""
+        if not knowledge_ids:
+            return {}
+        try:
+            placeholders = ', '.join(['%s'] * len(knowledge_ids))
+            query = f"""
+            SELECT knowledge_id, chunk_index, start_offset, end_offset, embedding
+            FROM knowledge_chunks
+            WHERE knowledge_id IN ({placeholders})
+            ORDER BY knowledge_id, chunk_index
+            """
+            results = self.execute_query(query, tuple(knowledge_ids), dictionary=True)
+            
+            chunk_map = {}
+            for row in results:
+                chunk_map.setdefault(row['knowledge_id'], []).append(row)
+            return chunk_map
+            
+        except Error as e:
+            logger.error(f"获取知识段落失败: {e}")
+            return {}
+    
+    def get_knowledge_by_ids(self, knowledge_ids):
+        """根据ID列表批量获取知识条目，返回 {id: 条目} 字典"""
+        if not knowledge_ids:
+            return {}
+        try:
+            placeholders = ', '.join(['%s'] * len(knowledge_ids))
+            query = f"SELECT id, title, content, category FROM knowledge_base WHERE id IN ({placeholders})"
+            results = self.execute_query(query, tuple(knowledge_ids), dictionary=True)
+            
+            return {row['id']: row for row in results}
+            
+        except Error as e:
+            logger.error(f"批量获取知识条目失败: {e}")
+            return {}
+    
+    def get_kb_version(self):
+        """获取知识库版本号（知识条目每次增删改后递增）"""
+        try:
+            result = self.execute_query("SELECT meta_value FROM kb_meta WHERE meta_key = 'kb_version'")
+            return int(result[0][0]) if result else 0
+        except Error as e:
+            logger.error(f"获取知识库版本号失败: {e}")
+            return 0
+    
+    def bump_kb_version(self):
+        """递增知识库版本号"""
+        try:
+            query = """
+            INSERT INTO kb_meta (meta_key, meta_value) VALUES ('kb_version', 1)
+            ON DUPLICATE KEY UPDATE meta_value = meta_value + 1
+            """
+            self.execute_query(query, fetch=False)
+        except Error as e:
+            logger.error(f"更新知识库版本号失败: {e}")
+    
+    def record_knowledge_changes(self, knowledge_ids, action):
+        """记录知识条目变更（action: upsert / delete）"""
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection()
+            cursor = connection.cursor()
+            query = "INSERT INTO kb_change_log (knowledge_id, action) VALUES (%s, %s)"
+            cursor.executemany(query, [(knowledge_id, action) for knowledge_id in knowledge_ids])
+            connection.commit()
+        except Error as e:
+            logger.error(f"记录知识库变更失败: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+    
+    def get_knowledge_changes(self, since_change_id):
+        """获取指定变更ID之后的知识库变更，附带条目当前的标题、内容、向量及向量任务状态（条目已删除时为空）"""
+        try:
+            query = """
+            SELECT c.id, c.knowledge_id, c.action, kb.title, kb.content, kb.embedding,
+                   ej.status AS embedding_status
+            FROM kb_change_log c
+            LEFT JOIN knowledge_base kb ON kb.id = c.knowledge_id
+            LEFT JOIN embedding_jobs ej ON ej.knowledge_id = c.knowledge_id
+            WHERE c.id > %s
+            ORDER BY c.id
+            """
+            return self.execute_query(query, (since_change_id,), dictionary=True)
+        except Error as e:
+            logger.error(f"获取知识库变更失败: {e}")
+            raise
+    
+    def get_latest_knowledge_change_id(self):
+        """获取最新的知识库变更ID"""
+        try:
+            result = self.execute_query("SELECT COALESCE(MAX(id), 0) FROM kb_change_log")
+            return int(result[0][0]) if result else 0
+        except Error as e:
+            logger.error(f"获取最新知识库变更ID失败: {e}")
+            raise
+    
+    def prune_knowledge_changes(self, up_to_change_id):
+        """删除已合并进向量索引快照的变更记录"""
+        try:
+            query = "DELETE FROM kb_change_log WHERE id <= %s"
+            return self.execute_query(query, (up_to_change_id,), fetch=False)
+        except Error as e:
+            logger.error(f"清理知识库变更记录失败: {e}")
+            return 0
+    
+    def get_problem_type_candidates(self, kb_version, taxonomy_version):
+        """读取指定知识库版本、词表版本的问题类型候选条目
+
+        返回 {(search_mode, problem_type): [(knowledge_id, base_score), ...]}；尚未生成时返回 None。
+        """
+        try:
+            marker = self.execute_query(
+                "SELECT meta_value FROM kb_meta WHERE meta_key = %s", (f'candidates_taxonomy_{taxonomy_version}',)
+            )
+            if not marker or int(marker[0][0]) != kb_version:
+                return None
+            
+            query = """
+            SELECT search_mode, problem_type, knowledge_id, base_score
+            FROM problem_type_candidates
+            WHERE kb_version = %s AND taxonomy_version = %s
+            ORDER BY search_mode, problem_type, candidate_rank
+            """
+            candidates = {}
+            for search_mode, problem_type, knowledge_id, base_score in self.execute_query(query, (kb_version, taxonomy_version)):
+                candidates.setdefault((search_mode, problem_type), []).append((knowledge_id, base_score))
+            return candidates
+        except Error as e:
+            logger.error(f"读取问题类型候选条目失败: {e}")
+            raise
+    
+    def save_problem_type_candidates(self, kb_version, taxonomy_version, candidates):
+        """保存问题类型候选条目（格式同 get_problem_type_candidates），并删除旧版本的记录"""
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection()
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM problem_type_candidates WHERE kb_version < %s", (kb_version,))
+            rows = [
+                (kb_version, taxonomy_version, search_mode, problem_type, rank, knowledge_id, base_score)
+                for (search_mode, problem_type), items in candidates.items()
+                for rank, (knowledge_id, base_score) in enumerate(items)
+            ]
+            if rows:
+                # 多个工作进程可能同时生成同一版本，内容相同，重复的行忽略
+                cursor.executemany("""
+                INSERT IGNORE INTO problem_type_candidates
+                (kb_version, taxonomy_version, search_mode, problem_type, candidate_rank, knowledge_id, base_score)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, rows)
+            cursor.execute("""
+            INSERT INTO kb_meta (meta_key, meta_value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE meta_value = GREATEST(meta_value, VALUES(meta_value))
+            """, (f'candidates_taxonomy_{taxonomy_version}', kb_version))
+            connection.commit()
+        except Error as e:
+            logger.error(f"保存问题类型候选条目失败: {e}")
+            if connection:
+                connection.rollback()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+    
+    def _notify_knowledge_changed(self, knowledge_ids, action='upsert'):
+        """知识库内容变更：记录变更、递增版本号，并让本进程的向量索引立即应用变更
+
+        knowledge_ids 可以是单个ID或ID列表（批量导入时整批只递增一次版本号）。
+        """
+        if not isinstance(knowledge_ids, (list, tuple)):
+            knowledge_ids = [knowledge_ids]
+        self.record_knowledge_changes(knowledge_ids, action)
+        self.bump_kb_version()
+        self.search_cache.invalidate()
+        try:
+            from enhanced_rag_engine import enhanced_rag_engine
+            enhanced_rag_engine.invalidate_vector_index()
+        except Exception as e:
+            logger.warning(f"通知向量索引更新失败: {e}")
+    
     def get_knowledge_by_id(self, knowledge_id):
         """根据ID获取知识条目"""
         try:
@@ -748,12 +1312,13 @@ class DatabaseManager:
             params = (title, category, content, tags, knowledge_id)
             row_count = self.execute_query(query, params, fetch=False)
             
-            # 重新生成向量嵌入
+            # 重新生成向量嵌入（异步模式下交给后台任务）
             if row_count > 0:
-                self._generate_embedding_for_knowledge(knowledge_id, content)
+                self._schedule_embedding(knowledge_id, title, content)
                 
                 # 重新提取和添加关键词
                 self._extract_and_add_keywords(knowledge_id, title, content)
+                self._notify_knowledge_changed(knowledge_id)
             
             return row_count > 0
             
@@ -767,7 +1332,12 @@ class DatabaseManager:
             query = "DELETE FROM knowledge_base WHERE id = %s"
             params = (knowledge_id,)
             row_count = self.execute_query(query, params, fetch=False)
-            
+            self.execute_query("DELETE FROM embedding_jobs WHERE knowledge_id = %s", params, fetch=False)
+            self.execute_query("DELETE FROM knowledge_chunks WHERE knowledge_id = %s", params, fetch=False)
+
+            if row_count > 0:
+                self._notify_knowledge_changed(knowledge_id, 'delete')
+
             return row_count > 0
             
         except Error as e:
@@ -775,27 +1345,89 @@ class DatabaseManager:
             raise
     
     def import_knowledge_batch(self, knowledge_data):
-        """批量导入知识库"""
+        """批量导入知识库
+
+        按 IMPORT_BATCH_SIZE 分块处理，整块只提交一次。异步模式下每块在同一事务中提交向量嵌入任务，
+        由后台任务生成向量；否则每块的标题、内容和段落一次批量编码，连同向量一起写入。
+        """
+        items = []
+        for item in knowledge_data:
+            title = item.get('title', '').strip()
+            category = item.get('category', '').strip()
+            content = item.get('content', '').strip()
+            tags = item.get('tags', '').strip()
+            
+            if title and category and content:
+                items.append((title, category, content, tags))
+        
+        if not items:
+            return 0
+        
+        imported_ids = []
+        start_time = time.time()
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        
         try:
-            imported_count = 0
-            
-            for item in knowledge_data:
-                title = item.get('title', '').strip()
-                category = item.get('category', '').strip()
-                content = item.get('content', '').strip()
-                tags = item.get('tags', '').strip()
+            for offset in range(0, len(items), Config.IMPORT_BATCH_SIZE):
+                chunk = items[offset:offset + Config.IMPORT_BATCH_SIZE]
                 
-                if title and category and content:
-                    # 使用add_knowledge方法，它会自动生成向量嵌入
-                    knowledge_id = self.add_knowledge(title, category, content, tags)
-                    if knowledge_id:
-                        imported_count += 1
-            
-            return imported_count
+                embeddings = None
+                if not Config.EMBEDDING_ASYNC:
+                    # 标题、内容和段落一起批量编码
+                    from enhanced_rag_engine import enhanced_rag_engine
+                    embeddings = enhanced_rag_engine.encode_knowledge_items(
+                        [(title, content) for title, _, content, _ in chunk]
+                    )
+                
+                query = """
+                INSERT INTO knowledge_base (title, category, content, tags, embedding, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+                """
+                # 逐行插入以取得每行的自增ID：多行INSERT生成的ID在 innodb_autoinc_lock_mode=2 等配置下不保证连续
+                chunk_ids = []
+                for i, (title, category, content, tags) in enumerate(chunk):
+                    embedding = encode_embedding(embeddings[i][0], embeddings[i][1]) if embeddings is not None else None
+                    cursor.execute(query, (title, category, content, tags, embedding))
+                    chunk_ids.append(cursor.lastrowid)
+                
+                if embeddings is not None:
+                    self.save_knowledge_chunks(
+                        {knowledge_id: embeddings[i][2] for i, knowledge_id in enumerate(chunk_ids)}, cursor=cursor
+                    )
+                else:
+                    cursor.executemany(
+                        "INSERT INTO embedding_jobs (knowledge_id, status) VALUES (%s, 'pending') "
+                        "ON DUPLICATE KEY UPDATE status = 'pending', attempts = 0, claim_token = NULL, error_message = NULL",
+                        [(knowledge_id,) for knowledge_id in chunk_ids]
+                    )
+                connection.commit()
+                imported_ids.extend(chunk_ids)
+                
+                elapsed = time.time() - start_time
+                logger.info(f"批量导入进度: {len(imported_ids)}/{len(items)}，"
+                            f"速度: {len(imported_ids) / max(elapsed, 1e-6):.1f} 条/秒")
             
         except Error as e:
             logger.error(f"批量导入知识库失败: {e}")
             raise
+        finally:
+            cursor.close()
+            connection.close()
+            if imported_ids:
+                # 关键词关联会影响检索结果，建立关联后再递增版本号
+                self._link_knowledge_keywords(
+                    [(knowledge_id, title, content) for knowledge_id, (title, _, content, _) in zip(imported_ids, items)]
+                )
+                self._notify_knowledge_changed(imported_ids)
+                if Config.EMBEDDING_ASYNC:
+                    from embedding_worker import embedding_worker
+                    embedding_worker.notify()
+        
+        elapsed = time.time() - start_time
+        logger.info(f"批量导入完成，共 {len(imported_ids)} 条，耗时: {elapsed:.2f}秒，"
+                    f"平均 {len(imported_ids) / max(elapsed, 1e-6):.1f} 条/秒")
+        return len(imported_ids)
     
     def get_all_categories(self):
         """获取所有分类列表"""
@@ -825,7 +1457,8 @@ class DatabaseManager:
             
             if knowledge_id:
                 # 生成并存储向量嵌入
-                self.update_knowledge_embedding(knowledge_id, content)
+                self.update_knowledge_embedding(knowledge_id, title, content)
+                self._notify_knowledge_changed(knowledge_id)
                 logger.info(f"知识条目添加成功，ID: {knowledge_id}")
                 return knowledge_id
             else:
@@ -838,120 +1471,79 @@ class DatabaseManager:
 
     def _extract_and_add_keywords(self, knowledge_id, title, content):
         """自动提取和添加关键词"""
+        self._link_knowledge_keywords([(knowledge_id, title, content)])
+    
+    def _link_knowledge_keywords(self, items):
+        """为知识条目提取关键词并建立关联（items 为 [(知识ID, 标题, 内容)]），所有写入在一个事务内完成
+
+        每个条目取文本中出现的前10个关键词；关联已存在时权重加0.1，同时累加关键词的使用频率。
+        """
+        connection = None
+        cursor = None
         try:
-            # 提取关键词
-            extracted_keywords = self._extract_keywords_from_text(title + " " + content)
-            
-            if not extracted_keywords:
+            links = []  # (知识ID, 关键词ID)
+            for knowledge_id, title, content in items:
+                extracted = self._extract_keywords_from_text(title + " " + content)
+                links.extend((knowledge_id, keyword_id) for keyword_id, _ in extracted)
+                if extracted and len(items) == 1:
+                    logger.info(f"知识条目 {knowledge_id} 自动添加了 {len(extracted)} 个关键词: {[keyword for _, keyword in extracted]}")
+            if not links:
                 return
             
-            # 添加关键词到数据库并建立关联
-            for keyword in extracted_keywords:
-                self._add_keyword_to_knowledge(knowledge_id, keyword)
+            connection = self.get_connection()
+            cursor = connection.cursor()
+            for offset in range(0, len(links), KEYWORD_LINK_BATCH_SIZE):
+                chunk = links[offset:offset + KEYWORD_LINK_BATCH_SIZE]
+                cursor.execute(f"""
+                INSERT INTO knowledge_keywords (knowledge_id, keyword_id, weight)
+                VALUES {', '.join(['(%s, %s, 1.0)'] * len(chunk))}
+                ON DUPLICATE KEY UPDATE weight = weight + 0.1
+                """, [value for link in chunk for value in link])
+            
+            frequencies = list(Counter(keyword_id for _, keyword_id in links).items())
+            for offset in range(0, len(frequencies), KEYWORD_LINK_BATCH_SIZE):
+                chunk = frequencies[offset:offset + KEYWORD_LINK_BATCH_SIZE]
+                cursor.execute(f"""
+                UPDATE keywords SET frequency = frequency + CASE id {' '.join(['WHEN %s THEN %s'] * len(chunk))} END
+                WHERE id IN ({', '.join(['%s'] * len(chunk))})
+                """, [value for item in chunk for value in item] + [keyword_id for keyword_id, _ in chunk])
+            connection.commit()
             
-            logger.info(f"知识条目 {knowledge_id} 自动添加了 {len(extracted_keywords)} 个关键词: {extracted_keywords}")
+            if len(items) > 1:
+                logger.info(f"{len(items)} 个知识条目共添加了 {len(links)} 个关键词关联")
             
         except Exception as e:
             logger.error(f"自动提取关键词失败: {e}")
             # 不抛出异常，避免影响知识条目的添加
+            if connection:
+                try:
+                    connection.rollback()
+                except Exception:
+                    pass
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
     
     def _extract_keywords_from_text(self, text):
-        """从文本中提取关键词"""
-        try:
-            # 获取所有关键词
-            all_keywords = self.get_all_keywords()
-            if not all_keywords:
-                return []
-            
-            # 转换为小写进行匹配
-            text_lower = text.lower()
-            extracted_keywords = []
-            
-            # 检查每个关键词是否在文本中出现
-            for keyword_info in all_keywords:
-                keyword = keyword_info['keyword'].lower()
-                if keyword in text_lower:
-                    extracted_keywords.append(keyword_info['keyword'])
-            
-            # 限制关键词数量，避免过多
-            return extracted_keywords[:10]
-            
-        except Exception as e:
-            logger.error(f"提取关键词失败: {e}")
-            return []
+        """从文本中提取关键词，返回 [(关键词ID, 关键词)]（限制10个，避免过多）"""
+        return self._get_keyword_extractor().extract(text, limit=10)
     
-    def _add_keyword_to_knowledge(self, knowledge_id, keyword):
-        """将关键词添加到知识条目"""
-        try:
-            # 首先检查关键词是否存在，不存在则创建
-            keyword_id = self._get_or_create_keyword(keyword)
-            if not keyword_id:
-                return
-            
-            # 检查是否已经存在关联
-            existing = self.execute_query(
-                "SELECT id FROM knowledge_keywords WHERE knowledge_id = %s AND keyword_id = %s",
-                (knowledge_id, keyword_id),
-                dictionary=True
-            )
-            
-            if existing:
-                # 已存在关联，更新权重
-                self.execute_query(
-                    "UPDATE knowledge_keywords SET weight = weight + 0.1 WHERE knowledge_id = %s AND keyword_id = %s",
-                    (knowledge_id, keyword_id),
-                    fetch=False
-                )
-            else:
-                # 创建新关联
-                self.execute_query(
-                    "INSERT INTO knowledge_keywords (knowledge_id, keyword_id, weight) VALUES (%s, %s, 1.0)",
-                    (knowledge_id, keyword_id),
-                    fetch=False
-                )
-            
-            # 更新关键词频率
-            self.execute_query(
-                "UPDATE keywords SET frequency = frequency + 1 WHERE id = %s",
-                (keyword_id,),
-                fetch=False
-            )
-            
-        except Exception as e:
-            logger.error(f"添加关键词到知识条目失败: {e}")
-    
-    def _get_or_create_keyword(self, keyword):
-        """获取或创建关键词"""
-        try:
-            # 检查关键词是否存在
-            result = self.execute_query(
-                "SELECT id FROM keywords WHERE keyword = %s",
-                (keyword,),
-                dictionary=True
-            )
-            
-            if result:
-                return result[0]['id']
-            
-            # 关键词不存在，创建新关键词
-            self.execute_query(
-                "INSERT INTO keywords (keyword, category) VALUES (%s, 'general')",
-                (keyword,),
-                fetch=False
-            )
-            
-            # 获取新创建的关键词ID
-            result = self.execute_query(
-                "SELECT id FROM keywords WHERE keyword = %s",
-                (keyword,),
-                dictionary=True
-            )
-            
-            return result[0]['id'] if result else None
-            
-        except Exception as e:
-            logger.error(f"获取或创建关键词失败: {e}")
-            return None
+    def _get_keyword_extractor(self):
+        """keywords 表编译成的关键词提取器，每隔 KEYWORD_EXTRACTOR_REFRESH_INTERVAL 秒重新加载
+
+        只按时间失效：应用内不会新增或修改关键词（关键词表由数据库脚本维护），
+        脚本修改后最多经过该间隔生效；保存条目时累加的使用频率只影响排序，到期重新加载时才体现。
+        """
+        cached = self._keyword_extractor
+        if cached is not None and time.time() - cached[1] < Config.KEYWORD_EXTRACTOR_REFRESH_INTERVAL:
+            return cached[0]
+        
+        extractor = KeywordExtractor([(row['id'], row['keyword']) for row in self.get_all_keywords()])
+        if len(extractor):
+            self._keyword_extractor = (extractor, time.time())
+        return extractor
     
     def get_all_keywords(self):
         """获取所有关键词"""
@@ -963,39 +1555,126 @@ class DatabaseManager:
             return []
     
     def search_knowledge_by_keyword(self, keyword):
-        """根据关键词搜索知识库 - 优化版本"""
+        """根据关键词搜索知识库 - 优化版本（结果按知识库版本缓存）"""
         try:
-            # 首先尝试关键词关联搜索
-            query1 = """
-            SELECT DISTINCT kb.id, kb.title, kb.content, kb.category, kb.tags
-            FROM knowledge_base kb
-            JOIN knowledge_keywords kk ON kb.id = kk.knowledge_id
-            JOIN keywords k ON kk.keyword_id = k.id
-            WHERE k.keyword LIKE %s AND kb.title LIKE %s
-            ORDER BY kk.weight DESC, kb.created_at DESC
-            """
-            search_term = f"%{keyword}%"
-            params1 = (search_term, search_term)
-            results1 = self.execute_query(query1, params1, dictionary=True)
-            
-            if results1:
-                return results1
-            
-            # 如果关键词关联搜索没有结果，尝试直接标题搜索
-            query2 = """
-            SELECT DISTINCT kb.id, kb.title, kb.content, kb.category, kb.tags
-            FROM knowledge_base kb
-            WHERE kb.title LIKE %s OR kb.content LIKE %s
-            ORDER BY kb.created_at DESC
-            """
-            params2 = (search_term, search_term)
-            results2 = self.execute_query(query2, params2, dictionary=True)
-            
-            return results2
+            results = self.search_cache.get_or_compute(
+                ('keyword', keyword.lower()), lambda: self._query_knowledge_by_keyword(keyword)
+            )
+            return [dict(row) for row in results]
             
         except Error as e:
             logger.error(f"关键词搜索失败: {e}")
             return []
+    
+    def _query_knowledge_by_keyword(self, keyword):
+        """执行关键词搜索（不经过缓存，数据库错误时抛出异常）"""
+        # 首先尝试关键词关联搜索
+        query1 = """
+        SELECT DISTINCT kb.id, kb.title, kb.content, kb.category, kb.tags
+        FROM knowledge_base kb
+        JOIN knowledge_keywords kk ON kb.id = kk.knowledge_id
+        JOIN keywords k ON kk.keyword_id = k.id
+        WHERE k.keyword LIKE %s AND kb.title LIKE %s
+        ORDER BY kk.weight DESC, kb.created_at DESC
+        """
+        search_term = f"%{keyword}%"
+        params1 = (search_term, search_term)
+        results1 = self.execute_query(query1, params1, dictionary=True)
+        
+        if results1:
+            return results1
+        
+        # 如果关键词关联搜索没有结果，尝试直接标题搜索（有全文索引时先用 MATCH 缩小范围）
+        fulltext_sql, fulltext_param = self._fulltext_filter('knowledge_base', [keyword], alias='kb')
+        fulltext_clause = f"{fulltext_sql} AND " if fulltext_sql else ""
+        query2 = f"""
+        SELECT DISTINCT kb.id, kb.title, kb.content, kb.category, kb.tags
+        FROM knowledge_base kb
+        WHERE {fulltext_clause}(kb.title LIKE %s OR kb.content LIKE %s)
+        ORDER BY kb.created_at DESC
+        """
+        params2 = ((fulltext_param,) if fulltext_sql else ()) + (search_term, search_term)
+        results2 = self.execute_query(query2, params2, dictionary=True)
+        
+        return results2
+
+    def search_knowledge_by_keywords(self, keywords):
+        """一次查询搜索多个关键词，结果与逐个调用 search_knowledge_by_keyword 再按ID去重相同
+
+        每个关键词的命中规则不变：有关键词关联且标题包含该词的条目时只取这些条目（按关联权重排序），
+        否则取标题或内容包含该词的条目。返回去重后的条目（按关键词顺序、关键词内按原排序），
+        每条的 matched_keywords 为命中该条目的关键词列表。
+        """
+        return self.search_knowledge_by_keywords_versioned(keywords)[0]
+    
+    def search_knowledge_by_keywords_versioned(self, keywords):
+        """同 search_knowledge_by_keywords，另外返回读取这些条目时的知识库版本号（未知时为 None）"""
+        keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        if not keywords:
+            return [], None
+        
+        try:
+            results, kb_version = self.search_cache.get_or_compute_versioned(
+                ('keywords', tuple(keyword.lower() for keyword in keywords)),
+                lambda: self.query_knowledge_by_keywords(keywords)
+            )
+            return [dict(row, matched_keywords=list(row['matched_keywords'])) for row in results], kb_version
+            
+        except Error as e:
+            logger.error(f"多关键词搜索失败: {e}")
+            return [], None
+    
+    def query_knowledge_by_keywords(self, keywords):
+        """执行多关键词搜索（不经过缓存，数据库错误时抛出异常），返回格式同 search_knowledge_by_keywords"""
+        patterns = [f"%{keyword}%" for keyword in keywords]
+        columns = []
+        conditions = []
+        params = []
+        for i, pattern in enumerate(patterns):
+            columns.append(f"""(SELECT MAX(kk.weight) FROM knowledge_keywords kk JOIN keywords k ON kk.keyword_id = k.id
+             WHERE kk.knowledge_id = kb.id AND k.keyword LIKE %s) AS link_weight_{i},
+            kb.title LIKE %s AS title_hit_{i}, kb.content LIKE %s AS content_hit_{i}""")
+            params += [pattern, pattern, pattern]
+            conditions.append("kb.title LIKE %s OR kb.content LIKE %s")
+        
+        # 有全文索引时先用 MATCH 缩小范围（多个词为"或"的关系）
+        fulltext_sql, fulltext_param = self._fulltext_filter('knowledge_base', keywords, alias='kb')
+        fulltext_clause = f"{fulltext_sql} AND " if fulltext_sql else ""
+        if fulltext_sql:
+            params.append(fulltext_param)
+        for pattern in patterns:
+            params += [pattern, pattern]
+        
+        query = f"""
+        SELECT kb.id, kb.title, kb.content, kb.category, kb.tags, {', '.join(columns)}
+        FROM knowledge_base kb
+        WHERE {fulltext_clause}({' OR '.join(conditions)})
+        ORDER BY kb.created_at DESC
+        """
+        rows = self.execute_query(query, tuple(params), dictionary=True)
+        
+        merged = {}  # 知识ID -> 条目，保持首次出现的顺序
+        for i, keyword in enumerate(keywords):
+            weight_column = f'link_weight_{i}'
+            hits = [row for row in rows if row[weight_column] is not None and row[f'title_hit_{i}']]
+            if hits:
+                hits.sort(key=lambda row: row[weight_column], reverse=True)
+            else:
+                hits = [row for row in rows if row[f'title_hit_{i}'] or row[f'content_hit_{i}']]
+            for row in hits:
+                item = merged.get(row['id'])
+                if item is None:
+                    item = merged[row['id']] = {
+                        'id': row['id'],
+                        'title': row['title'],
+                        'content': row['content'],
+                        'category': row['category'],
+                        'tags': row['tags'],
+                        'matched_keywords': []
+                    }
+                item['matched_keywords'].append(keyword)
+        
+        return list(merged.values())
 
     def find_interaction_by_content_and_time(self, question, timestamp, conversation_id=None):
         """根据问题内容和时间戳查找对应的交互记录"""
@@ -1054,9 +1733,24 @@ class DatabaseManager:
             where_conditions = []
             params = []
             
+            from_clause = "interactions i"
+            from_params = []
+            
             if search:
-                where_conditions.append("(i.question LIKE %s OR i.ai_response LIKE %s OR i.user_id LIKE %s)")
-                params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+                fulltext_sql, fulltext_param = self._fulltext_filter('interactions', [search])
+                if fulltext_sql:
+                    # 问题/回答用全文索引定位，用户名只扫描 idx_user 索引，两路结果合并后再关联
+                    from_clause = f"""interactions i
+                JOIN (
+                    SELECT id FROM interactions
+                    WHERE {fulltext_sql} AND (question LIKE %s OR ai_response LIKE %s)
+                    UNION
+                    SELECT id FROM interactions WHERE user_id LIKE %s
+                ) matched ON matched.id = i.id"""
+                    from_params = [fulltext_param, f'%{search}%', f'%{search}%', f'%{search}%']
+                else:
+                    where_conditions.append("(i.question LIKE %s OR i.ai_response LIKE %s OR i.user_id LIKE %s)")
+                    params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
             
             if user_filter:
                 where_conditions.append("i.user_id = %s")
@@ -1082,10 +1776,10 @@ class DatabaseManager:
             # 获取总数
             count_query = f"""
                 SELECT COUNT(*) as total
-                FROM interactions i
+                FROM {from_clause}
                 {where_clause}
             """
-            cursor.execute(count_query, params)
+            cursor.execute(count_query, from_params + params)
             total = cursor.fetchone()['total']
             
             # 计算分页
@@ -1102,12 +1796,12 @@ class DatabaseManager:
                     i.timestamp as created_at,
                     i.user_id as username,
                     (SELECT COUNT(*) FROM revisions r WHERE r.interaction_id = i.id) as revision_count
-                FROM interactions i
+                FROM {from_clause}
                 {where_clause}
                 {order_clause}
                 LIMIT %s OFFSET %s
             """
-            cursor.execute(query, params + [page_size, offset])
+            cursor.execute(query, from_params + params + [page_size, offset])
             interactions = cursor.fetchall()
             
             cursor.close()
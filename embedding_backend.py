@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量模型推理后端
+
+- torch:      SentenceTransformer 默认的 PyTorch fp32 推理
+- torch_int8: 对模型中的 Linear 层做 PyTorch 动态 int8 量化
+- onnx:       sentence-transformers 的 ONNX Runtime 后端（需要 sentence-transformers>=3.2 及 onnxruntime）
+
+非 torch 后端加载后会用一组参考句子做自检：与 fp32 模型的参考向量逐条比较余弦相似度，
+低于 EMBEDDING_BACKEND_MIN_COSINE 时退回 torch 后端。参考向量首次计算后保存到磁盘。
+
+    python embedding_backend.py          # 对比各后端的精度与速度
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import zipfile
+from typing import Tuple
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = 'torch'
+BACKEND_TORCH_INT8 = 'torch_int8'
+BACKEND_ONNX = 'onnx'
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX)
+
+# 自检用的参考句子，覆盖常见的IT支持问题及知识条目写法
+REFERENCE_SENTENCES = [
+    "鼠标失灵怎么办",
+    "打印机无法打印，显示脱机状态",
+    "电脑连不上公司Wi-Fi网络",
+    "如何重置邮箱密码",
+    "Outlook启动后一直卡在加载配置文件",
+    "VPN连接失败，提示证书错误",
+    "请检查USB接口是否松动，并尝试更换接口后重启电脑。",
+    "How do I install the printer driver on Windows 11?",
+]
+
+
+def _load_torch(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device='cpu')
+
+
+def _load_torch_int8(model_name: str):
+    import torch
+    model = _load_torch(model_name)
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def _load_onnx(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    model_kwargs = {'file_name': Config.EMBEDDING_ONNX_FILE} if Config.EMBEDDING_ONNX_FILE else None
+    try:
+        return SentenceTransformer(model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+    except TypeError:
+        raise RuntimeError("ONNX 后端需要 sentence-transformers>=3.2，请执行 pip install \"sentence-transformers[onnx]>=3.2\"")
+
+
+_LOADERS = {
+    BACKEND_TORCH: _load_torch,
+    BACKEND_TORCH_INT8: _load_torch_int8,
+    BACKEND_ONNX: _load_onnx,
+}
+
+
+def _encode(model, texts) -> np.ndarray:
+    return model.encode(texts, convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+
+
+def _reference_path(model_name: str) -> str:
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+    return os.path.join(Config.VECTOR_INDEX_DIR, f'embedding_reference_{safe_name}.npz')
+
+
+def get_reference_embeddings(model_name: str) -> np.ndarray:
+    """获取 fp32 torch 模型对参考句子的向量（首次计算后缓存到磁盘）"""
+    path = _reference_path(model_name)
+    try:
+        with np.load(path) as data:
+            if list(data['sentences']) == REFERENCE_SENTENCES:
+                return data['embeddings']
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    logger.info("计算向量模型自检参考向量（仅首次）")
+    embeddings = _encode(_load_torch(model_name), REFERENCE_SENTENCES)
+    # 先写临时文件再原子替换，其他进程不会读到写了一半的文件
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, sentences=np.array(REFERENCE_SENTENCES), embeddings=embeddings)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"保存自检参考向量失败: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return embeddings
+
+
+def self_check(model, model_name: str) -> Tuple[float, float]:
+    """用参考句子检查模型输出，返回 (与参考向量的最小余弦相似度, 单句平均编码耗时毫秒)"""
+    reference = get_reference_embeddings(model_name)
+
+    _encode(model, REFERENCE_SENTENCES[:1])  # 预热
+    start_time = time.time()
+    embeddings = np.vstack([_encode(model, [sentence]) for sentence in REFERENCE_SENTENCES])
+    latency_ms = (time.time() - start_time) * 1000 / len(REFERENCE_SENTENCES)
+
+    if embeddings.shape != reference.shape:
+        return 0.0, latency_ms
+    cosines = np.sum(embeddings * reference, axis=1) / (
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1) + 1e-12
+    )
+    return float(cosines.min()), latency_ms
+
+
+def load_embedding_model(model_name: str, backend: str = BACKEND_TORCH):
+    """按配置的推理后端加载向量模型；非 torch 后端加载失败或自检不通过时退回 torch"""
+    if backend not in _LOADERS:
+        logger.warning(f"未知的向量模型推理后端: {backend}，使用 {BACKEND_TORCH}")
+        backend = BACKEND_TORCH
+
+    start_time = time.time()
+    if backend != BACKEND_TORCH:
+        try:
+            model = _LOADERS[backend](model_name)
+            min_cosine, latency_ms = self_check(model, model_name)
+            if min_cosine >= Config.EMBEDDING_BACKEND_MIN_COSINE:
+                logger.info(f"向量模型推理后端: {backend}，自检最小余弦相似度 {min_cosine:.4f}，"
+                            f"单句编码 {latency_ms:.1f}ms，加载耗时: {time.time() - start_time:.2f}秒")
+                return model
+            logger.error(f"向量模型推理后端 {backend} 自检未通过（最小余弦相似度 {min_cosine:.4f} < "
+                         f"{Config.EMBEDDING_BACKEND_MIN_COSINE}），退回 {BACKEND_TORCH}")
+        except Exception as e:
+            logger.error(f"加载向量模型推理后端 {backend} 失败: {e}，退回 {BACKEND_TORCH}")
+
+    model = _load_torch(model_name)
+    logger.info(f"向量模型推理后端: {BACKEND_TORCH}，加载耗时: {time.time() - start_time:.2f}秒")
+    return model
+
+
+def main():
+    """对比各推理后端与 fp32 参考向量的精度和单句编码耗时"""
+    logging.basicConfig(level=logging.WARNING)
+    model_name = Config.EMBEDDING_MODEL_NAME
+    print(f"🔍 向量模型: {model_name}，通过阈值: 最小余弦相似度 >= {Config.EMBEDDING_BACKEND_MIN_COSINE}")
+
+    failed = False
+    for backend in BACKENDS:
+        try:
+            model = _LOADERS[backend](model_name)
+            min_cosine, latency_ms = self_check(model, model_name)
+        except Exception as e:
+            print(f"⚠️  {backend:<10} 不可用: {e}")
+            continue
+        passed = min_cosine >= Config.EMBEDDING_BACKEND_MIN_COSINE
+        failed = failed or not passed
+        print(f"{'✅' if passed else '❌'} {backend:<10} 最小余弦相似度 {min_cosine:.4f}，单句编码 {latency_ms:.1f}ms")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
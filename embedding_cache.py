@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题向量缓存
+
+- 缓存键为规范化后的文本（NFKC 全角转半角、转小写、合并空白），并带上模型名称作为命名空间
+- 内存层为 LRU，同时限制条目数与字节数，条目超过 TTL 后失效
+- 可选的本地磁盘层（SQLite）由同一台机器上的所有工作进程共享
+- 统计内存命中、磁盘命中和未命中次数
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_FLOAT32_LE = np.dtype('<f4')
+
+# 每个缓存条目除向量外的大致内存开销（键、OrderedDict节点、元组等）
+_ENTRY_OVERHEAD = 200
+
+# 每写入多少次清理一次磁盘层中过期的条目
+_DISK_PRUNE_INTERVAL = 1000
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：全角转半角、转小写、合并连续空白并去掉首尾空白"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text).strip().lower()
+
+
+class _DiskStore:
+    """SQLite 磁盘缓存，每个线程一个连接，WAL 模式允许多进程并发读写"""
+
+    def __init__(self, path: str, namespace: str, ttl: int):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                namespace TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, cache_key)
+            )
+        """)
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._connection().execute(
+            "SELECT vector FROM embedding_cache WHERE namespace = ? AND cache_key = ? AND created_at >= ?",
+            (self.namespace, key, time.time() - self.ttl)
+        ).fetchone()
+        return np.frombuffer(row[0], dtype=_FLOAT32_LE) if row else None
+
+    def put(self, key: str, vector: np.ndarray):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO embedding_cache (namespace, cache_key, vector, created_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, vector.astype(_FLOAT32_LE).tobytes(), time.time())
+        )
+        self._writes += 1
+        if self._writes % _DISK_PRUNE_INTERVAL == 0:
+            connection.execute("DELETE FROM embedding_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        connection.commit()
+
+
+class EmbeddingCache:
+    """按字节数和条目数限制的 TTL LRU 向量缓存，可选共享磁盘层"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl: int = 3600,
+                 disk_path: str = '', namespace: str = ''):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (vector, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        self._disk = None
+        if disk_path:
+            try:
+                self._disk = _DiskStore(disk_path, namespace, ttl)
+            except Exception as e:
+                logger.error(f"初始化向量磁盘缓存失败: {e}")
+
+    def get_or_compute(self, text: str, compute_fn: Callable[[str], Any]) -> np.ndarray:
+        """获取文本的向量；未命中时用规范化后的文本调用 compute_fn 计算并写入缓存
+
+        用规范化后的文本编码，保证同一个键对应的向量与首次出现的写法无关。
+        返回的向量为只读数组，调用方不要修改。
+        """
+        key = normalize_text(text)
+
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+
+        if self._disk is not None:
+            try:
+                vector = self._disk.get(key)
+            except Exception as e:
+                logger.warning(f"读取向量磁盘缓存失败: {e}")
+            if vector is not None:
+                with self._lock:
+                    self._disk_hits += 1
+                self._put_memory(key, vector)
+                return vector
+
+        with self._lock:
+            self._misses += 1
+        vector = np.asarray(compute_fn(key), dtype=np.float32)
+        vector.setflags(write=False)
+        self._put_memory(key, vector)
+        if self._disk is not None:
+            try:
+                self._disk.put(key, vector)
+            except Exception as e:
+                logger.warning(f"写入向量磁盘缓存失败: {e}")
+        return vector
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires_at, size = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def _put_memory(self, key: str, vector: np.ndarray):
+        size = vector.nbytes + len(key) * 4 + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (vector, time.time() + self.ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        """清空内存层"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                'disk_enabled': self._disk is not None
+            }
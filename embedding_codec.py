@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库向量嵌入的二进制存储格式
+
+格式（版本1，全部小端序）：
+    4字节  魔数 b'KBEM'
+    1字节  格式版本号
+    1字节  向量个数（知识条目为2：标题向量、内容向量；段落为1）
+    2字节  向量维度 (uint16)
+    N字节  向量个数 * 维度 个 float32
+
+解码使用 numpy.frombuffer，直接引用原始字节，不做拷贝。
+旧数据为 pickle.dumps(list_of_floats)，只包含内容向量，解码时兼容处理。
+"""
+
+import pickle
+import struct
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MAGIC = b'KBEM'
+EMBEDDING_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sBBH')
+HEADER_SIZE = _HEADER.size
+_FLOAT32_LE = np.dtype('<f4')
+
+
+def encode_embedding(title_embedding, content_embedding) -> bytes:
+    """将标题向量和内容向量编码为二进制格式"""
+    title_vec = np.asarray(title_embedding, dtype=_FLOAT32_LE).ravel()
+    content_vec = np.asarray(content_embedding, dtype=_FLOAT32_LE).ravel()
+    if title_vec.shape != content_vec.shape:
+        raise ValueError(f"标题向量与内容向量维度不一致: {title_vec.shape} != {content_vec.shape}")
+
+    header = _HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, 2, title_vec.shape[0])
+    return header + title_vec.tobytes() + content_vec.tobytes()
+
+
+def encode_vector(embedding) -> bytes:
+    """将单个向量（如段落向量）编码为二进制格式"""
+    vec = np.asarray(embedding, dtype=_FLOAT32_LE).ravel()
+    return _HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, 1, vec.shape[0]) + vec.tobytes()
+
+
+def decode_vector(blob) -> Optional[np.ndarray]:
+    """解码 encode_vector 生成的单个向量，无法解码时返回None"""
+    if not is_binary_embedding(blob):
+        return None
+    magic, version, count, dim = _HEADER.unpack_from(blob, 0)
+    if version != EMBEDDING_FORMAT_VERSION or count != 1 or len(blob) != HEADER_SIZE + dim * _FLOAT32_LE.itemsize:
+        return None
+    return np.frombuffer(blob, dtype=_FLOAT32_LE, count=dim, offset=HEADER_SIZE)
+
+
+def is_binary_embedding(blob) -> bool:
+    """判断是否为当前二进制格式"""
+    return blob is not None and len(blob) >= HEADER_SIZE and bytes(blob[:4]) == EMBEDDING_MAGIC
+
+
+def decode_embedding(blob, expected_dim: Optional[int] = None) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """解码向量嵌入，返回 (标题向量, 内容向量)
+
+    二进制格式返回只读的零拷贝视图；旧的pickle格式只有内容向量，标题向量为None。
+    无法解码或维度不符时返回 (None, None)。
+    """
+    if not blob:
+        return None, None
+
+    if is_binary_embedding(blob):
+        magic, version, count, dim = _HEADER.unpack_from(blob, 0)
+        if version != EMBEDDING_FORMAT_VERSION or count != 2:
+            logger.warning(f"不支持的向量嵌入格式: 版本 {version}, 向量个数 {count}")
+            return None, None
+        if expected_dim is not None and dim != expected_dim:
+            return None, None
+        if len(blob) != HEADER_SIZE + count * dim * _FLOAT32_LE.itemsize:
+            logger.warning("向量嵌入数据长度异常")
+            return None, None
+
+        vectors = np.frombuffer(blob, dtype=_FLOAT32_LE, count=count * dim, offset=HEADER_SIZE)
+        return vectors[:dim], vectors[dim:]
+
+    # 兼容旧格式：pickle序列化的浮点数列表（仅内容向量）
+    try:
+        content_vec = np.asarray(pickle.loads(blob), dtype=np.float32)
+    except Exception as e:
+        logger.warning(f"无法解码旧格式向量嵌入: {e}")
+        return None, None
+    if expected_dim is not None and content_vec.shape[0] != expected_dim:
+        return None, None
+    return None, content_vec
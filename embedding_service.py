@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地向量嵌入服务
+
+单独的进程加载一份 SentenceTransformer 模型，通过 Unix socket 为所有 Web 工作进程
+提供编码服务，并把并发到达的请求合并成批次编码。客户端把大批量文本拆成不超过
+EMBEDDING_SERVICE_MAX_BATCH 条的请求；服务端每批最多编码 max_batch 条，单条问题优先于批量请求，
+用户提问不会排在知识库导入等批量编码之后。启用方式：
+
+    python embedding_service.py            # 启动服务
+    EMBEDDING_SERVICE_ENABLED=true         # Web 进程改为通过 socket 调用
+
+协议：每个消息为 4 字节大端长度 + 内容。
+    请求: JSON {"texts": [...]}
+    响应: 1 字节状态 (0 成功 / 1 失败)
+          成功时为 '<II'(条数, 维度) + 小端 float32 向量；失败时为 UTF-8 错误信息
+"""
+
+import os
+import sys
+import json
+import socket
+import struct
+import logging
+import threading
+import time
+import socketserver
+from collections import deque
+from typing import List, Union
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct('>I')
+_SHAPE = struct.Struct('<II')
+_FLOAT32_LE = np.dtype('<f4')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def _send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+class _EncodeRequest:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EncodeBatcher:
+    """把并发的编码请求合并成批次：凑满 max_batch 条或等待 max_wait 秒后统一编码
+
+    单条文本的请求（用户问题）优先组批，剩余名额再放入批量请求；每批最多 max_batch 条，
+    超过 max_batch 条的请求拆开分批编码。
+    """
+
+    def __init__(self, model, max_batch: int = 64, max_wait: float = 0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._interactive = deque()
+        self._bulk = deque()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='encode-batcher', daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if len(texts) > self.max_batch:
+            return np.concatenate([self.encode(texts[i:i + self.max_batch])
+                                   for i in range(0, len(texts), self.max_batch)])
+
+        request = _EncodeRequest(texts)
+        with self._condition:
+            (self._interactive if len(texts) == 1 else self._bulk).append(request)
+            self._condition.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self) -> List[_EncodeRequest]:
+        """取下一批请求：先取单条请求（等待至多 max_wait 秒凑批），再用批量请求补足剩余名额"""
+        with self._condition:
+            while not self._interactive and not self._bulk:
+                self._condition.wait()
+
+            requests = []
+            total = 0
+            deadline = time.time() + self.max_wait
+            while True:
+                while self._interactive and total < self.max_batch:
+                    requests.append(self._interactive.popleft())
+                    total += 1
+                remaining = deadline - time.time()
+                if total >= self.max_batch or self._bulk or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            while self._bulk and (not requests or total + len(self._bulk[0].texts) <= self.max_batch):
+                request = self._bulk.popleft()
+                requests.append(request)
+                total += len(request.texts)
+            return requests
+
+    def _run(self):
+        while True:
+            requests = self._next_batch()
+            texts = [text for request in requests for text in request.texts]
+            try:
+                embeddings = self.model.encode(
+                    texts,
+                    batch_size=Config.EMBEDDING_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                ).astype(np.float32)
+                offset = 0
+                for request in requests:
+                    request.result = embeddings[offset:offset + len(request.texts)]
+                    offset += len(request.texts)
+            except Exception as e:
+                logger.error(f"批量编码失败: {e}")
+                for request in requests:
+                    request.error = e
+            finally:
+                for request in requests:
+                    request.done.set()
+
+            logger.debug(f"合并编码 {len(requests)} 个请求，共 {len(texts)} 条文本")
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """每个连接一个线程，连接可复用发送多个请求"""
+
+    def handle(self):
+        while True:
+            try:
+                payload = _recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                texts = json.loads(payload.decode('utf-8'))['texts']
+                embeddings = self.server.batcher.encode(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+                rows, dim = embeddings.shape if embeddings.ndim == 2 else (0, 0)
+                response = bytes([STATUS_OK]) + _SHAPE.pack(rows, dim) + embeddings.astype(_FLOAT32_LE).tobytes()
+            except Exception as e:
+                response = bytes([STATUS_ERROR]) + str(e).encode('utf-8')
+
+            try:
+                _send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # 所有工作进程的所有线程可能同时建立连接
+
+    def __init__(self, socket_path: str, batcher: EncodeBatcher):
+        self.batcher = batcher
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+
+
+class EmbeddingServiceClient:
+    """向量嵌入服务客户端，encode 接口与 SentenceTransformer.encode 兼容
+
+    每个线程复用一条连接；连接断开时自动重连一次，超时的请求不重试（服务端可能仍在编码）。
+    大批量文本拆成每次不超过 max_batch 条的请求，每个请求单独计算超时。
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 10.0, max_batch: int = 64):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_batch = max(1, max_batch)
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+            self._local.sock = None
+
+    def _request(self, texts: List[str]) -> bytes:
+        payload = json.dumps({'texts': texts}, ensure_ascii=False).encode('utf-8')
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                _send_frame(sock, payload)
+                return _recv_frame(sock)
+            except socket.timeout as e:
+                # 连接上可能还会收到这次请求的响应，关闭连接；重发只会再次超时
+                self._close()
+                raise TimeoutError(f"向量嵌入服务响应超时（{self.timeout}秒，{len(texts)} 条文本）: {e}")
+            except (ConnectionError, OSError) as e:
+                self._close()
+                if attempt == 1:
+                    raise ConnectionError(f"无法连接向量嵌入服务 {self.socket_path}: {e}")
+
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """编码文本，单个字符串返回一维向量，列表返回二维矩阵（其余参数由服务端决定，忽略）"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if len(texts) > self.max_batch:
+            return np.concatenate([self.encode(texts[i:i + self.max_batch])
+                                   for i in range(0, len(texts), self.max_batch)])
+
+        response = self._request(texts)
+        if response[0] != STATUS_OK:
+            raise RuntimeError(f"向量嵌入服务返回错误: {response[1:].decode('utf-8', 'replace')}")
+
+        rows, dim = _SHAPE.unpack_from(response, 1)
+        embeddings = np.frombuffer(response, dtype=_FLOAT32_LE, count=rows * dim, offset=1 + _SHAPE.size)
+        embeddings = embeddings.reshape(rows, dim)
+        return embeddings[0] if single else embeddings
+
+
+def main():
+    """启动向量嵌入服务"""
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    socket_path = Config.EMBEDDING_SERVICE_SOCKET
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir:
+        os.makedirs(socket_dir, exist_ok=True)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    from model_registry import get_embedding_model
+
+    model = get_embedding_model()
+
+    batcher = EncodeBatcher(model, Config.EMBEDDING_SERVICE_MAX_BATCH, Config.EMBEDDING_SERVICE_MAX_WAIT_MS / 1000.0)
+    server = EmbeddingServer(socket_path, batcher)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"向量嵌入服务已启动: {socket_path}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("向量嵌入服务已停止")
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
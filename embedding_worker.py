@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库向量嵌入后台任务
+
+管理员新增/修改知识条目时只写入 embedding_jobs 表（pending），由后台线程批量编码
+并回写向量，HTTP 请求无需等待模型推理。任务状态保存在数据库中，多个工作进程
+通过 claim_token 原子地领取任务，进程崩溃后超时的 running 任务会被重新领取。
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import List, Dict, Any
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingWorker:
+    """后台向量嵌入工作线程"""
+
+    def __init__(self, batch_size: int = 32, poll_interval: float = 2.0,
+                 max_attempts: int = 3, job_timeout: int = 300):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.job_timeout = job_timeout
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动后台线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='embedding-worker', daemon=True)
+            self._thread.start()
+            logger.info("向量嵌入后台任务已启动")
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台线程"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """有新任务入队，立即唤醒后台线程"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"处理向量嵌入任务失败: {e}")
+                processed = 0
+
+            # 队列中还有任务时连续处理，否则等待新任务或轮询间隔
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def process_batch(self) -> int:
+        """领取并处理一批任务，返回处理的任务数"""
+        from db_utils import db_manager
+
+        claim_token = uuid.uuid4().hex
+        jobs = db_manager.claim_embedding_jobs(claim_token, self.batch_size, self.job_timeout, self.max_attempts)
+        if not jobs:
+            return 0
+
+        start_time = time.time()
+        try:
+            embeddings = self._encode(jobs)
+        except Exception as e:
+            logger.error(f"批量生成向量嵌入失败: {e}")
+            db_manager.fail_embedding_jobs(claim_token, str(e), self.max_attempts)
+            return len(jobs)
+
+        done_ids = db_manager.complete_embedding_jobs(claim_token, [
+            (job['knowledge_id'], title_embedding, content_embedding, passages)
+            for job, (title_embedding, content_embedding, passages) in zip(jobs, embeddings)
+        ])
+        if done_ids:
+            db_manager._notify_knowledge_changed(done_ids)
+
+        logger.info(f"向量嵌入任务完成 {len(done_ids)}/{len(jobs)} 条，耗时: {time.time() - start_time:.2f}秒")
+        return len(jobs)
+
+    def _encode(self, jobs: List[Dict[str, Any]]):
+        from enhanced_rag_engine import enhanced_rag_engine
+
+        return enhanced_rag_engine.encode_knowledge_items([(job['title'], job['content']) for job in jobs])
+
+
+# 全局工作线程实例
+embedding_worker = EmbeddingWorker(
+    batch_size=Config.EMBEDDING_JOB_BATCH_SIZE,
+    poll_interval=Config.EMBEDDING_WORKER_POLL_INTERVAL,
+    max_attempts=Config.EMBEDDING_JOB_MAX_ATTEMPTS,
+    job_timeout=Config.EMBEDDING_JOB_TIMEOUT
+)
@@ -9,20 +9,74 @@ import logging
 import requests
 import json
 import time
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional
+import numpy as np
 from dotenv import load_dotenv
-from functools import lru_cache
+from config import Config
+from vector_index import KnowledgeVectorIndex, SharedVectorIndexHolder, BACKEND_IVF, normalize_rows
+from embedding_codec import decode_vector
+from text_chunker import split_passages
+from embedding_cache import EmbeddingCache, normalize_text
+from answer_cache import AnswerCache
+from semantic_cache import SemanticAnswerCache, context_key
+from model_registry import model_registry, LazyModel, EMBEDDING_MODEL
+from problem_taxonomy import TaxonomyHolder
+from knowledge_features import KnowledgeFeatureCache
+from candidate_lists import CandidateLists, CandidateListHolder, MODE_HYBRID, MODE_STRICT
+from bm25_index import BM25Index, LexicalIndexHolder, fuse_scores, FIELD_TITLE, FIELD_CONTENT, FIELD_TAGS
 
 # 加载环境变量
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 大模型调用失败时 generate_ai_response 返回的提示（以此判断回答是否可以缓存）
+_AI_FAILURE_MARKERS = ('AI响应超时', 'AI模型调用失败', 'API调用失败', 'API调用异常', 'API返回格式异常')
+
+# 没有历史问答（如新部署）时预热的常见问题
+DEFAULT_WARMUP_QUESTIONS = (
+    "鼠标失灵怎么办",
+    "打印机故障",
+    "网络连接问题",
+    "密码设置",
+    "软件安装",
+    "系统故障",
+    "数据备份",
+    "病毒防护"
+)
+
 class EnhancedRAGEngine:
     def __init__(self):
         """初始化增强版RAG引擎"""
-        self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        if Config.EMBEDDING_SERVICE_ENABLED:
+            # 通过本地向量嵌入服务编码，本进程不加载模型
+            from embedding_service import EmbeddingServiceClient
+            self.embedding_model = EmbeddingServiceClient(
+                Config.EMBEDDING_SERVICE_SOCKET, Config.EMBEDDING_SERVICE_TIMEOUT, Config.EMBEDDING_SERVICE_MAX_BATCH
+            )
+            logger.info(f"使用向量嵌入服务: {Config.EMBEDDING_SERVICE_SOCKET}")
+        else:
+            # 模型在首次编码时才加载，同一进程内所有调用方共享一个实例
+            self.embedding_model = LazyModel(model_registry, EMBEDDING_MODEL)
+        
+        # 问题向量缓存（规范化文本为键，按字节数/条目数限制，可选多进程共享的磁盘层）
+        self.embedding_cache = EmbeddingCache(
+            max_entries=Config.CACHE_SIZE,
+            max_bytes=Config.EMBEDDING_CACHE_MAX_BYTES,
+            ttl=Config.CACHE_TTL,
+            disk_path=Config.EMBEDDING_CACHE_DISK_PATH,
+            namespace=f"{Config.EMBEDDING_MODEL_NAME}:{Config.EMBEDDING_BACKEND}"
+        )
+        
+        # 问答结果缓存（相同问题、回答模式、AI模型和知识库版本直接返回）
+        self.answer_cache = AnswerCache(max_entries=Config.CACHE_SIZE, ttl=Config.CACHE_TTL)
+        
+        # 大模型回答语义缓存（相近的问题在相同知识上下文下复用回答）
+        self.semantic_cache = SemanticAnswerCache(
+            threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=Config.SEMANTIC_CACHE_SIZE,
+            ttl=Config.CACHE_TTL
+        )
         
         # 初始化数据库管理器
         try:
@@ -70,165 +124,340 @@ class EnhancedRAGEngine:
             logger.info(f"AI大模型已启用: {self.active_ai_model}")
         else:
             logger.info("AI大模型未启用，将使用基础RAG模式")
-        
-        # 性能优化：预加载常用问题的向量
-        self._preload_common_embeddings()
-    
-    def _preload_common_embeddings(self):
-        """预加载常用问题的向量嵌入"""
-        common_questions = [
-            "鼠标失灵怎么办",
-            "打印机故障",
-            "网络连接问题",
-            "密码设置",
-            "软件安装",
-            "系统故障",
-            "数据备份",
-            "病毒防护"
-        ]
-        
-        for question in common_questions:
-            self._get_cached_embedding(question)
-        
-        logger.info(f"预加载了 {len(common_questions)} 个常用问题的向量嵌入")
-    
-    @lru_cache(maxsize=1000)
-    def _get_cached_embedding(self, text: str) -> List[float]:
-        """获取缓存的向量嵌入"""
-        return self.embedding_model.encode(text).tolist()
+
+        # 知识库向量索引（磁盘文件mmap映射，所有工作进程共享一份）
+        self.vector_index = SharedVectorIndexHolder(
+            Config.VECTOR_INDEX_DIR,
+            version_fn=self._get_kb_version,
+            builder=self._build_vector_index,
+            changes_fn=self._load_vector_index_changes,
+            check_interval=Config.VECTOR_INDEX_CHECK_INTERVAL,
+            backend=Config.VECTOR_INDEX_BACKEND,
+            quantize=Config.VECTOR_INDEX_QUANTIZE,
+            compact_threshold=Config.VECTOR_INDEX_COMPACT_THRESHOLD,
+            on_snapshot=self._on_vector_index_snapshot,
+            retry_interval=Config.VECTOR_INDEX_RETRY_INTERVAL
+        )
+
+        # 问题类型词表（JSON文件，修改后自动重新加载并编译为单次扫描的匹配器）
+        self.taxonomy = TaxonomyHolder(Config.PROBLEM_TAXONOMY_FILE, Config.PROBLEM_TAXONOMY_CHECK_INTERVAL)
+
+        # 知识条目打分特征（小写标题、词集合、问题类型位掩码等），条目内容变化后才重新计算
+        self.knowledge_features = KnowledgeFeatureCache(Config.KNOWLEDGE_FEATURE_CACHE_SIZE)
+
+        # 各问题类型的候选知识条目（知识库或词表变化后在后台重新生成）
+        self.candidate_lists = CandidateListHolder(
+            self._build_candidate_lists,
+            version_fn=self._get_kb_version,
+            taxonomy_fn=self.taxonomy.get,
+            check_interval=Config.VECTOR_INDEX_CHECK_INTERVAL
+        )
+
+        # 知识库BM25倒排索引（LEXICAL_SEARCH_BACKEND=bm25 时首次检索才构建）
+        self.lexical_index = LexicalIndexHolder(
+            self._build_lexical_index,
+            version_fn=self._get_kb_version,
+            check_interval=Config.VECTOR_INDEX_CHECK_INTERVAL
+        )
+
+    def warm_up(self):
+        """预热：加载向量模型，按历史问答中的高频问题预计算向量并预先检索（由应用启动时在后台线程调用）
+
+        总耗时受 WARMUP_TIME_BUDGET 限制，超时后停止，剩余问题在首次被问到时再计算。
+        """
+        start_time = time.time()
+        if not Config.EMBEDDING_SERVICE_ENABLED and not all(model_registry.warm_up(EMBEDDING_MODEL).values()):
+            return
+
+        try:
+            self.vector_index.get()  # 没有快照时在后台线程构建
+            if Config.LEXICAL_SEARCH_BACKEND == 'bm25':
+                self.lexical_index.get()
+            if self.db_manager:
+                self.candidate_lists.get()  # 在后台线程生成问题类型候选列表
+        except Exception as e:
+            logger.error(f"预热检索索引失败: {e}")
+
+        questions = self._get_warmup_questions()
+        warmed = 0
+        for question in questions:
+            if time.time() - start_time > Config.WARMUP_TIME_BUDGET:
+                logger.info(f"预热超出时间预算 {Config.WARMUP_TIME_BUDGET} 秒，已停止")
+                break
+            try:
+                self._warm_up_question(question)
+                warmed += 1
+            except Exception as e:
+                logger.error(f"预热问题失败: {e}")
+                break
+
+        logger.info(f"预热完成：{warmed}/{len(questions)} 个高频问题，耗时: {time.time() - start_time:.2f}秒")
+
+    def _get_warmup_questions(self) -> List[str]:
+        """最近高频问题（规范化后合并同一问题的不同写法），没有历史问答时使用内置的常见问题"""
+        from db_utils import db_manager
+
+        counts = {}
+        questions = {}
+        for question, ask_count in db_manager.get_frequent_questions(Config.WARMUP_HISTORY_DAYS,
+                                                                     Config.WARMUP_QUESTION_COUNT):
+            key = normalize_text(question)
+            if key:
+                counts[key] = counts.get(key, 0) + ask_count
+                questions.setdefault(key, question)
+
+        if not counts:
+            return list(DEFAULT_WARMUP_QUESTIONS)
+        ranked = sorted(counts, key=counts.get, reverse=True)
+        return [questions[key] for key in ranked[:Config.WARMUP_QUESTION_COUNT]]
+
+    def _warm_up_question(self, question: str):
+        """按 process_question 的检索路径预先执行一次：问题向量、关键词检索、段落向量"""
+        self._get_cached_embedding(question)
+        keywords = self._extract_keywords(question)
+        if not keywords or keywords[0] in ('greeting', 'identity'):
+            return
+        knowledge_results = self._search_knowledge(keywords, question)
+        if knowledge_results:
+            self._build_passage_context(question, knowledge_results)
+
+    def _get_cached_embedding(self, text: str) -> np.ndarray:
+        """获取缓存的向量嵌入（只读float32数组）"""
+        return self.embedding_cache.get_or_compute(text, self.embedding_model.encode)
     
     def generate_embedding(self, text: str) -> List[float]:
         """生成向量嵌入（公共方法）"""
-        return self._get_cached_embedding(text)
-    
+        return self._get_cached_embedding(text).tolist()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取各级缓存的命中率统计"""
+        stats = {'answers': self.answer_cache.stats(), 'semantic_answers': self.semantic_cache.stats(),
+                 'embedding': self.embedding_cache.stats(), 'knowledge_features': self.knowledge_features.stats(),
+                 'models': model_registry.metrics()}
+        if self.db_manager:
+            stats['search'] = self.db_manager.search_cache.stats()
+        return stats
+
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """批量生成向量嵌入，返回float32矩阵"""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=Config.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+    def encode_knowledge_items(self, items: List[tuple]) -> List[tuple]:
+        """批量编码知识条目的标题、全文和各段落
+
+        items 为 [(标题, 内容), ...]，返回 [(标题向量, 内容向量, [(start, end, 段落向量), ...]), ...]。
+        所有文本一次批量编码；只有一个段落且与全文相同时直接复用内容向量。
+        """
+        spans = [split_passages(content, Config.CHUNK_MAX_CHARS) for _, content in items]
+        texts = [title for title, _ in items] + [content for _, content in items]
+        for (_, content), passage_spans in zip(items, spans):
+            if passage_spans != [(0, len(content))]:
+                texts.extend(content[start:end] for start, end in passage_spans)
+
+        embeddings = self.generate_embeddings(texts)
+
+        results = []
+        next_passage = 2 * len(items)
+        for i, ((_, content), passage_spans) in enumerate(zip(items, spans)):
+            content_embedding = embeddings[len(items) + i]
+            if passage_spans == [(0, len(content))]:
+                passages = [(0, len(content), content_embedding)]
+            else:
+                passages = []
+                for start, end in passage_spans:
+                    passages.append((start, end, embeddings[next_passage]))
+                    next_passage += 1
+            results.append((embeddings[i], content_embedding, passages))
+        return results
+
+    def _get_kb_version(self) -> int:
+        """获取知识库版本号"""
+        from db_utils import db_manager
+        return db_manager.get_kb_version()
+
+    def _build_vector_index(self, version: int) -> KnowledgeVectorIndex:
+        """从知识库构建指定版本的向量索引"""
+        from db_utils import db_manager
+
+        # 先记下变更位置再读取条目，构建期间发生的变更会在之后重放（重放是幂等的）
+        change_id = db_manager.get_latest_knowledge_change_id()
+
+        # 直接使用数据库中存储的向量，只对缺失向量的条目重新编码
+        rows = db_manager.get_all_knowledge_embeddings()
+        index = KnowledgeVectorIndex.build_from_rows(rows, self.generate_embeddings, version)
+        index.change_id = change_id
+
+        # 知识库较大时训练IVF倒排列表
+        if Config.VECTOR_INDEX_BACKEND == BACKEND_IVF and len(index) >= Config.IVF_MIN_ENTRIES:
+            index = index.build_ivf(Config.IVF_NLIST)
+        if Config.VECTOR_INDEX_QUANTIZE:
+            index.quantize()
+
+        # 以全量精确扫描为基准抽样估算召回率
+        if index.centroids is not None or index.quantized is not None:
+            recall = index.evaluate_recall(Config.IVF_NPROBE, top_k=Config.TOP_K_SEARCH,
+                                           rescore_factor=Config.VECTOR_INDEX_RESCORE_FACTOR)
+            logger.info(f"向量索引 nprobe={Config.IVF_NPROBE}, rescore_factor={Config.VECTOR_INDEX_RESCORE_FACTOR} "
+                        f"抽样召回率: {recall:.3f}")
+        return index
+
+    def _load_vector_index_changes(self, since_change_id: int):
+        """读取指定位置之后的知识库变更，返回 (最新变更ID, 新增/修改条目的索引, 删除的条目ID)"""
+        from db_utils import db_manager
+
+        changes = db_manager.get_knowledge_changes(since_change_id)
+        if not changes:
+            return None
+
+        # 同一条目多次变更只保留最后一次；条目已不存在或向量尚未生成完成时按删除处理
+        latest = {}
+        for change in changes:
+            latest[change['knowledge_id']] = change
+        searchable = {knowledge_id for knowledge_id, change in latest.items()
+                      if change['action'] == 'upsert' and change['title'] is not None
+                      and change['embedding_status'] in (None, 'done')}
+        upserts = [latest[knowledge_id] for knowledge_id in searchable]
+        deleted_ids = [knowledge_id for knowledge_id in latest if knowledge_id not in searchable]
+
+        rows = [{'id': change['knowledge_id'], 'title': change['title'],
+                 'content': change['content'], 'embedding': change['embedding']} for change in upserts]
+        upsert_index = KnowledgeVectorIndex.build_from_rows(rows, self.generate_embeddings)
+        return changes[-1]['id'], upsert_index, deleted_ids
+
+    def _on_vector_index_snapshot(self, change_id: int):
+        """新快照写出后，清理已合并进快照的变更记录"""
+        from db_utils import db_manager
+        db_manager.prune_knowledge_changes(change_id)
+
+    def invalidate_vector_index(self):
+        """知识库变更后使向量索引、BM25索引、候选列表和检索结果缓存失效"""
+        self.vector_index.invalidate()
+        self.lexical_index.invalidate()
+        self.candidate_lists.invalidate()
+        if self.db_manager:
+            self.db_manager.search_cache.invalidate()
+
+    def _build_lexical_index(self, version: int) -> BM25Index:
+        """从知识库构建指定版本的BM25索引"""
+        from db_utils import db_manager
+
+        rows = db_manager.get_all_knowledge_texts()
+        documents = ((row['id'], {FIELD_TITLE: row['title'], FIELD_CONTENT: row['content'], FIELD_TAGS: row['tags']})
+                     for row in rows)
+        field_boosts = {FIELD_TITLE: Config.BM25_TITLE_BOOST, FIELD_CONTENT: Config.BM25_CONTENT_BOOST,
+                        FIELD_TAGS: Config.BM25_TAGS_BOOST}
+        return BM25Index.build(documents, field_boosts, k1=Config.BM25_K1, b=Config.BM25_B, version=version)
+
+    def _bm25_search(self, question: str, keyword: str, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """BM25检索：只返回标题、内容或标签包含关键词的条目，按问题全文的BM25分数与向量相似度融合排序
+
+        BM25索引不可用时返回None，由调用方退回MySQL检索。
+        """
+        index = self.lexical_index.get()
+        if index is None:
+            return None
+
+        lexical_hits = index.search(f"{keyword} {question}", top_k * 4, required=keyword)
+        if not lexical_hits:
+            return []
+
+        vector_scores = {}
+        if Config.BM25_VECTOR_WEIGHT > 0:
+            try:
+                vector_index = self.vector_index.get()
+                if vector_index is not None and len(vector_index) > 0:
+                    hits = vector_index.search(self._get_cached_embedding(question), top_k * 4, threshold=0.0,
+                                               nprobe=Config.IVF_NPROBE, rescore_factor=Config.VECTOR_INDEX_RESCORE_FACTOR)
+                    vector_scores = {hit['id']: hit['similarity'] for hit in hits}
+            except Exception as e:
+                logger.warning(f"BM25融合向量分数失败: {e}")
+
+        fused = fuse_scores(lexical_hits, vector_scores, Config.BM25_VECTOR_WEIGHT)[:top_k]
+
+        # 索引只保存ID，标题和内容按需读取
+        from db_utils import db_manager
+        knowledge_map = db_manager.get_knowledge_by_ids([knowledge_id for knowledge_id, _ in fused])
+        results = []
+        for knowledge_id, score in fused:
+            knowledge_item = knowledge_map.get(knowledge_id)
+            if knowledge_item:
+                results.append(dict(knowledge_item, similarity=score))
+        return results
+
+    def _build_candidate_lists(self, version: int, taxonomy) -> CandidateLists:
+        """生成各问题类型的候选条目：优先读取其他工作进程已写入数据库的结果，没有时按检索词搜索并过滤"""
+        stored = self.db_manager.get_problem_type_candidates(version, taxonomy.version)
+        if stored is not None:
+            knowledge_ids = {knowledge_id for items in stored.values() for knowledge_id, _ in items}
+            knowledge_map = self.db_manager.get_knowledge_by_ids(list(knowledge_ids))
+            if len(knowledge_map) != len(knowledge_ids):
+                raise RuntimeError(f"候选条目不完整: {len(knowledge_map)}/{len(knowledge_ids)}")
+            lists = {
+                key: [{'id': knowledge_id, 'title': knowledge_map[knowledge_id]['title'],
+                       'content': knowledge_map[knowledge_id]['content'], 'base_score': base_score}
+                      for knowledge_id, base_score in items]
+                for key, items in stored.items()
+            }
+            return CandidateLists(version, taxonomy, lists)
+
+        lists = {}
+        for problem_type in taxonomy.type_bits:
+            rows = self.db_manager.query_knowledge_by_keywords(list(taxonomy.get_search_terms(problem_type)))
+            # 行按 version 读取，特征也按该版本查找（不用本进程检索缓存记录的版本号）
+            features = [self._get_knowledge_features(row, version, taxonomy) for row in rows]
+            for mode, relevant_fn, base_fn in (
+                (MODE_HYBRID, self._is_title_relevant, self._base_relevance),
+                (MODE_STRICT, self._is_title_relevant_strict, self._base_relevance_strict)
+            ):
+                # 相关性过滤与问题无关；base_score 为不计问题词匹配时的分数，列表按其降序排列
+                items = [
+                    {'id': row['id'], 'title': row['title'], 'content': row['content'],
+                     'base_score': base_fn(row_features, problem_type)}
+                    for row, row_features in zip(rows, features) if relevant_fn(row_features, problem_type)
+                ]
+                items.sort(key=lambda item: item['base_score'], reverse=True)
+                lists[(mode, problem_type)] = items
+        self.db_manager.save_problem_type_candidates(version, taxonomy.version, {
+            key: [(item['id'], item['base_score']) for item in items] for key, items in lists.items()
+        })
+        return CandidateLists(version, taxonomy, lists)
+
+    def _get_keyword_candidates(self, mode: str, keyword: str, relevant_fn, base_fn) -> tuple:
+        """关键词检索阶段的候选条目（含 base_score，按其降序排列）及读取这些条目时的知识库版本号
+
+        有物化列表时直接取出，否则一次查询所有检索词后按相关性过滤并计算 base_score。
+        版本号未知时为 None（查找条目特征时总是比较内容摘要）。
+        """
+        candidate_lists = self.candidate_lists.get()
+        candidates = candidate_lists.get(mode, keyword) if candidate_lists is not None else None
+        if candidates is not None:
+            return candidates, candidate_lists.kb_version
+        search_terms = self._get_search_terms_for_problem_type(keyword)
+        results, kb_version = self.db_manager.search_knowledge_by_keywords_versioned(search_terms)
+        candidates = []
+        for result in results:
+            features = self._get_knowledge_features(result, kb_version)
+            if relevant_fn(features, keyword):
+                candidates.append(dict(result, base_score=base_fn(features, keyword)))
+        candidates.sort(key=lambda item: item['base_score'], reverse=True)
+        return candidates, kb_version
+
     def _extract_keywords(self, question: str) -> List[str]:
-        """从问题中提取关键词 - 完全自动化的精准版本"""
-        logger.info(f"开始提取关键词，问题: '{question}'")
-        keywords = []
-        question_lower = question.lower()
-        logger.info(f"问题转小写: '{question_lower}'")
-        
-        # 首先检查是否是问候语 - 使用完整匹配，避免误识别
-        greeting_keywords = ['你好', '您好', 'hi', 'hello', '早上好', '下午好', '晚上好', '在吗', '在么']
-        logger.info(f"检查问候语关键词: {greeting_keywords}")
-        for greeting_keyword in greeting_keywords:
-            logger.info(f"比较: '{greeting_keyword}' == '{question_lower}' -> {greeting_keyword == question_lower}")
-            if greeting_keyword == question_lower:  # 完全匹配，不是包含关系
-                logger.info(f"识别到问候语: {greeting_keyword}")
-                return ['greeting']  # 返回特殊标识，表示这是问候语
-        
-        logger.info("未识别到问候语，继续检查身份询问")
-        
-        # 检查是否是身份询问类问题 - 使用完整匹配
-        identity_keywords = ['你是谁', '你是什么', '你的名字', '你叫什么', '你是什么人', '你是什么助手', '你是什么系统']
-        for identity_keyword in identity_keywords:
-            if identity_keyword == question_lower:  # 完全匹配，不是包含关系
-                logger.info(f"识别到身份询问问题: {identity_keyword}")
-                return ['identity']  # 返回特殊标识，表示这是身份询问
-        
-        logger.info("未识别到身份询问，开始问题类型检测")
-        
-        # 如果不是问候语或身份询问，才进行问题类型检测
-        # 动态问题类型映射表 - 支持自动扩展
-        problem_type_mapping = {
-            # 硬件设备问题
-            '打印机': ['打印机', 'printer', '打印', '打印不了', '打印故障', '打印问题', '打印设备'],
-            '鼠标': ['鼠标', 'mouse', '鼠标失灵', '鼠标不动', '鼠标故障', '鼠标问题', '鼠标设备'],
-            '键盘': ['键盘', 'keyboard', '键盘失灵', '键盘故障', '键盘问题', '键盘设备'],
-            '显示器': ['显示器', 'monitor', '屏幕', '显示器故障', '屏幕问题', '显示设备'],
-            '网络': ['网络', 'network', 'wifi', '网络连接', '网络故障', '网络问题', '网络设备'],
-            '蓝牙': ['蓝牙', 'bluetooth', '蓝牙连接', '蓝牙故障', '蓝牙问题'],
-            
-            # 系统问题
-            '系统重置': ['重装', '重置', '重装电脑', '重置电脑', '系统重置', '重装系统', 'reset', '重装windows', '重置windows', '系统重装'],
-            '蓝屏': ['蓝屏', '蓝屏死机', '蓝屏错误', '系统蓝屏', '蓝屏问题'],
-            '死机': ['死机', '卡死', '系统死机', '电脑死机', '死机问题'],
-            '卡顿': ['卡顿', '慢', '系统慢', '电脑慢', '卡', '卡顿问题', '性能问题'],
-            
-            # 安全认证问题
-            '密码': ['密码', 'password', '修改密码', '更改密码', '重置密码', '忘记密码', '密码问题'],
-            '登录': ['登录', 'login', '无法登录', '登录失败', '登录问题', '登入'],
-            '账户': ['账户', 'account', '账户问题', '账号', '账号问题'],
-            
-            # 软件问题
-            '软件': ['软件', '软件安装', '软件卸载', '软件问题', '程序', '应用程序'],
-            'outlook': ['outlook', '邮件', '邮箱', '邮件客户端', '邮件软件'],
-            'office': ['office', 'word', 'excel', 'powerpoint', '办公软件'],
-            '驱动': ['驱动', '驱动程序', '驱动安装', '驱动问题', '驱动更新'],
-            '系统更新': ['系统更新', 'windows更新', '更新问题', '补丁', '系统补丁'],
-            
-            # 数据问题
-            '数据': ['数据', '数据备份', '数据恢复', '文件', '文件丢失', '数据问题'],
-            '病毒': ['病毒', '杀毒', '病毒防护', '安全软件', '恶意软件', '木马'],
-            
-            # 连接问题
-            '连接': ['连接', '连接问题', '连接失败', '无法连接', '连接故障'],
-            'USB': ['usb', 'usb连接', 'usb设备', 'usb问题'],
-            
-            # 性能问题
-            '性能': ['性能', '性能问题', '速度慢', '运行慢', '响应慢'],
-            '内存': ['内存', '内存不足', '内存问题', 'ram'],
-            '硬盘': ['硬盘', '硬盘问题', '存储', '存储问题', '磁盘'],
-            
-            # 音频视频问题
-            '音频': ['音频', '声音', '声音问题', '音频问题', '麦克风', '扬声器'],
-            '视频': ['视频', '视频问题', '摄像头', '摄像头问题', '视频通话'],
-            
-            # 电源问题
-            '电源': ['电源', '电源问题', '电池', '电池问题', '充电', '充电问题'],
-            '开机': ['开机', '开机问题', '启动', '启动问题', '无法开机'],
-            '关机': ['关机', '关机问题', '无法关机', '自动关机']
-        }
-        
-        # 优先级排序的问题类型 - 系统级问题优先级最高
-        priority_order = [
-            # 系统级问题（最高优先级）
-            '系统重置', '蓝屏', '死机', '开机', '关机',
-            
-            # 硬件设备问题
-            '打印机', '鼠标', '键盘', '显示器', '网络', '蓝牙', 'USB',
-            
-            # 安全认证问题
-            '密码', '登录', '账户',
-            
-            # 软件问题
-            'outlook', 'office', '软件', '驱动', '系统更新',
-            
-            # 数据和安全问题
-            '数据', '病毒',
-            
-            # 连接问题
-            '连接',
-            
-            # 性能问题
-            '性能', '内存', '硬盘', '卡顿',
-            
-            # 多媒体问题
-            '音频', '视频',
-            
-            # 电源问题
-            '电源'
-        ]
-        
-        # 按优先级顺序检查问题类型
-        for problem_type in priority_order:
-            if problem_type in problem_type_mapping:
-                for keyword in problem_type_mapping[problem_type]:
-                    if keyword in question_lower:
-                        logger.info(f"识别到问题类型: {problem_type} (关键词: {keyword})")
-                        keywords.append(problem_type)  # 使用问题类型作为关键词
-                        break  # 找到一个匹配就跳出内层循环，避免重复添加
-        
-        # 如果没有找到明确的问题类型，尝试通用关键词
-        generic_keywords = ['电脑', '系统', '问题', '故障', '错误', '设备']
-        for keyword in generic_keywords:
-            if keyword in question_lower:
-                logger.info(f"识别到通用关键词: {keyword}")
-                keywords.append(keyword)
-                break
-        
-        logger.info(f"最终提取的关键词: {keywords}")
-        return keywords[:1]  # 只返回1个关键词，确保最高精准度
+        """从问题中提取关键词：问候语/身份询问返回特殊标识，否则返回优先级最高的问题类型或通用关键词
+
+        词表加载时编译为 Aho-Corasick 自动机，一次扫描完成匹配。只返回1个关键词，确保最高精准度。
+        """
+        result = self.taxonomy.get().matcher.match(question)
+        if result is None:
+            logger.debug(f"未识别到问题类型: '{question}'")
+            return []
+        logger.debug(f"识别到问题类型: {result.problem_type} (命中: {result.positions})")
+        return [result.problem_type]
     
     def search_knowledge(self, question: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """搜索知识库 - 完全自动化的精准搜索策略"""
@@ -305,32 +534,22 @@ class EnhancedRAGEngine:
                 logger.warning("数据库管理器不可用")
                 return []
             
-            # 构建严格的搜索条件
-            search_terms = self._get_search_terms_for_problem_type(keyword)
-            
-            # 执行严格搜索
+            # 通过严格相关性检查的候选条目（与问题无关，优先使用物化列表），只需再加上问题词匹配的分数
             all_results = []
-            for term in search_terms:
-                try:
-                    results = self.db_manager.search_knowledge_by_keyword(term)
-                    for result in results:
-                        # 检查是否已存在
-                        if not any(r['id'] == result['id'] for r in all_results):
-                            # 更严格的相关性检查
-                            if self._is_strictly_relevant(result, keyword, question):
-                                relevance_score = self._calculate_strict_relevance(result, keyword, question)
-                                if relevance_score > 0.7:  # 进一步提高阈值到0.7，确保更高精准度
-                                    all_results.append({
-                                        'id': result['id'],
-                                        'title': result['title'],
-                                        'content': result['content'],
-                                        'similarity': relevance_score
-                                    })
-                except Exception as e:
-                    logger.warning(f"搜索关键词 '{term}' 失败: {e}")
-                    continue
+            candidates, kb_version = self._get_keyword_candidates(MODE_HYBRID, keyword, self._is_title_relevant,
+                                                                  self._base_relevance)
+            for result in candidates:
+                relevance_score = self._question_relevance(
+                    self._get_knowledge_features(result, kb_version), question, result['base_score'])
+                if relevance_score > 0.7:  # 进一步提高阈值到0.7，确保更高精准度
+                    all_results.append({
+                        'id': result['id'],
+                        'title': result['title'],
+                        'content': result['content'],
+                        'similarity': relevance_score
+                    })
             
-            # 按相关性排序
+            # 按相关性排序（稳定排序，同分时保持候选列表的顺序）
             all_results.sort(key=lambda x: x['similarity'], reverse=True)
             return all_results
             
@@ -345,30 +564,20 @@ class EnhancedRAGEngine:
                 logger.warning("数据库管理器不可用")
                 return []
             
-            # 构建严格的搜索条件
-            search_terms = self._get_search_terms_for_problem_type(keyword)
-            
-            # 执行严格搜索
+            # 通过严格相关性检查的候选条目（与问题无关，优先使用物化列表），只需再加上问题词匹配的分数
             all_results = []
-            for term in search_terms:
-                try:
-                    results = self.db_manager.search_knowledge_by_keyword(term)
-                    for result in results:
-                        # 检查是否已存在
-                        if not any(r['id'] == result['id'] for r in all_results):
-                            # 更严格的相关性检查
-                            if self._is_strictly_relevant_strict(result, keyword, question):
-                                relevance_score = self._calculate_strict_relevance_strict(result, keyword, question)
-                                if relevance_score >= 0.6:  # 降低阈值到0.6，确保能找到相关结果
-                                    all_results.append({
-                                        'id': result['id'],
-                                        'title': result['title'],
-                                        'content': result['content'],
-                                        'similarity': relevance_score
-                                    })
-                except Exception as e:
-                    logger.warning(f"搜索关键词 '{term}' 失败: {e}")
-                    continue
+            candidates, kb_version = self._get_keyword_candidates(MODE_STRICT, keyword, self._is_title_relevant_strict,
+                                                                  self._base_relevance_strict)
+            for result in candidates:
+                relevance_score = self._question_relevance_strict(
+                    self._get_knowledge_features(result, kb_version), question, result['base_score'])
+                if relevance_score >= 0.6:  # 降低阈值到0.6，确保能找到相关结果
+                    all_results.append({
+                        'id': result['id'],
+                        'title': result['title'],
+                        'content': result['content'],
+                        'similarity': relevance_score
+                    })
             
             # 按相关性排序
             all_results.sort(key=lambda x: x['similarity'], reverse=True)
@@ -380,157 +589,62 @@ class EnhancedRAGEngine:
 
     def _get_search_terms_for_problem_type(self, problem_type: str) -> List[str]:
         """根据问题类型获取搜索词汇"""
-        search_terms_mapping = {
-            '系统重置': ['重置', '重装', 'reset', 'windows重置', '系统重置', '重装电脑', '重置电脑'],
-            '打印机': ['打印机', 'printer', '打印故障', '打印问题'],
-            '鼠标': ['鼠标', 'mouse', '鼠标故障', '鼠标问题'],
-            '键盘': ['键盘', 'keyboard', '键盘故障', '键盘问题'],
-            '显示器': ['显示器', 'monitor', '屏幕', '显示器故障', '屏幕问题'],
-            '网络': ['网络', 'network', '网络故障', '网络问题', 'wifi'],
-            '蓝牙': ['蓝牙', 'bluetooth', '蓝牙故障', '蓝牙问题'],
-            '密码': ['密码', 'password', '修改密码', '密码问题'],
-            '登录': ['登录', 'login', '登录问题', '登入'],
-            '账户': ['账户', 'account', '账户问题', '账号'],
-            '软件': ['软件', '软件安装', '软件问题', '程序'],
-            'outlook': ['outlook', '邮件', '邮箱', '邮件客户端'],
-            'office': ['office', 'word', 'excel', 'powerpoint', '办公软件'],
-            '驱动': ['驱动', '驱动程序', '驱动问题'],
-            '系统更新': ['系统更新', 'windows更新', '更新问题'],
-            '数据': ['数据', '数据备份', '数据问题', '文件'],
-            '病毒': ['病毒', '杀毒', '病毒防护', '安全软件'],
-            '连接': ['连接', '连接问题', '连接故障'],
-            'USB': ['usb', 'usb连接', 'usb问题'],
-            '性能': ['性能', '性能问题', '速度慢'],
-            '内存': ['内存', '内存不足', '内存问题'],
-            '硬盘': ['硬盘', '硬盘问题', '存储问题'],
-            '音频': ['音频', '声音', '声音问题', '麦克风'],
-            '视频': ['视频', '视频问题', '摄像头'],
-            '电源': ['电源', '电源问题', '电池'],
-            '开机': ['开机', '开机问题', '启动'],
-            '关机': ['关机', '关机问题'],
-            '蓝屏': ['蓝屏', '蓝屏死机', '蓝屏错误'],
-            '死机': ['死机', '卡死', '系统死机'],
-            '卡顿': ['卡顿', '慢', '系统慢', '卡顿问题']
-        }
-        
-        return search_terms_mapping.get(problem_type, [problem_type])
+        return list(self.taxonomy.get().get_search_terms(problem_type))
     
+    def _get_knowledge_features(self, result: Dict[str, Any], kb_version: Optional[int] = None, taxonomy=None):
+        """检索结果对应条目的预计算特征
+
+        kb_version 须为读取 result 时的知识库版本号；不确定时传 None，按标题和内容的摘要校验缓存。
+        """
+        return self.knowledge_features.get(result, taxonomy or self.taxonomy.get(), kb_version)
+
     def _is_strictly_relevant(self, result: Dict[str, Any], keyword: str, question: str) -> bool:
-        """检查结果是否严格相关 - 更严格的检查"""
-        title_lower = result['title'].lower()
-        content_lower = result['content'].lower()
-        question_lower = question.lower()
-        
-        # 标题必须包含关键词或相关词汇
-        search_terms = self._get_search_terms_for_problem_type(keyword)
-        
-        # 检查标题是否包含任何相关搜索词汇
-        title_relevant = any(term in title_lower for term in search_terms)
-        
-        if not title_relevant:
-            return False
-        
-        # 进一步检查问题类型匹配
-        if keyword == '系统重置':
-            return any(term in title_lower for term in ['重置', '重装', 'reset', 'windows'])
-        elif keyword == '打印机':
-            return any(term in title_lower for term in ['打印机', 'printer', '打印'])
-        elif keyword == '鼠标':
-            return any(term in title_lower for term in ['鼠标', 'mouse'])
-        elif keyword == '键盘':
-            return any(term in title_lower for term in ['键盘', 'keyboard'])
-        elif keyword == '网络':
-            return any(term in title_lower for term in ['网络', 'network', 'wifi'])
-        elif keyword == '密码':
-            return any(term in title_lower for term in ['密码', 'password'])
-        elif keyword == '登录':
-            return any(term in title_lower for term in ['登录', 'login'])
-        elif keyword == '蓝屏':
-            return '蓝屏' in title_lower
-        elif keyword == '死机':
-            return '死机' in title_lower
-        elif keyword == '卡顿':
-            return any(term in title_lower for term in ['卡顿', '慢'])
-        elif keyword == '病毒':
-            return any(term in title_lower for term in ['病毒', '杀毒', '安全'])
-        elif keyword == '数据':
-            return any(term in title_lower for term in ['数据', '文件', '备份'])
-        elif keyword == '软件':
-            return any(term in title_lower for term in ['软件', '程序', '应用'])
-        elif keyword == 'outlook':
-            return any(term in title_lower for term in ['outlook', '邮件', '邮箱'])
-        elif keyword == 'office':
-            return any(term in title_lower for term in ['office', 'word', 'excel', 'powerpoint', '办公'])
-        elif keyword == '驱动':
-            return any(term in title_lower for term in ['驱动', '驱动程序'])
-        elif keyword == '音频':
-            return any(term in title_lower for term in ['音频', '声音', '麦克风'])
-        elif keyword == '视频':
-            return any(term in title_lower for term in ['视频', '摄像头'])
-        elif keyword == '电源':
-            return any(term in title_lower for term in ['电源', '电池', '充电'])
-        elif keyword == '开机':
-            return any(term in title_lower for term in ['开机', '启动'])
-        elif keyword == '关机':
-            return any(term in title_lower for term in ['关机'])
-        elif keyword == 'USB':
-            return 'usb' in title_lower
-        elif keyword == '蓝牙':
-            return any(term in title_lower for term in ['蓝牙', 'bluetooth'])
-        elif keyword == '显示器':
-            return any(term in title_lower for term in ['显示器', '屏幕', 'monitor'])
-        elif keyword == '内存':
-            return any(term in title_lower for term in ['内存', 'ram'])
-        elif keyword == '硬盘':
-            return any(term in title_lower for term in ['硬盘', '存储', '磁盘'])
-        elif keyword == '性能':
-            return any(term in title_lower for term in ['性能', '速度'])
-        elif keyword == '连接':
-            return any(term in title_lower for term in ['连接', '连接问题'])
-        elif keyword == '系统更新':
-            return any(term in title_lower for term in ['更新', '补丁', '系统更新'])
-        elif keyword == '账户':
-            return any(term in title_lower for term in ['账户', '账号', 'account'])
-        
-        return True
+        """检查结果是否严格相关：标题须包含该问题类型的检索词，以及词表中配置的标题词"""
+        return self._is_title_relevant(self._get_knowledge_features(result), keyword)
     
     def _is_strictly_relevant_strict(self, result: Dict[str, Any], keyword: str, question: str) -> bool:
         """更严格的相关性检查 - 专门用于知识库模式"""
         try:
-            title = result['title'].lower()
-            content = result['content'].lower()
-            question_lower = question.lower()
-            
-            # 检查标题是否包含关键词
-            if keyword.lower() not in title:
-                return False
-            
-            # 简化检查：只要标题包含关键词就认为相关
-            return True
+            return self._is_title_relevant_strict(self._get_knowledge_features(result), keyword)
             
         except Exception as e:
             logger.error(f"严格相关性检查失败: {e}")
             return False
+
+    @staticmethod
+    def _is_title_relevant(features, keyword: str) -> bool:
+        """严格相关性检查（按条目特征）"""
+        return features.is_title_relevant(keyword)
+
+    @staticmethod
+    def _is_title_relevant_strict(features, keyword: str) -> bool:
+        """更严格的相关性检查（按条目特征）"""
+        # 简化检查：只要标题包含关键词就认为相关
+        return keyword.lower() in features.title_lower
     
     def _calculate_strict_relevance(self, result: Dict[str, Any], keyword: str, question: str) -> float:
         """计算严格的相关性分数 - 更严格的评分"""
-        title_lower = result['title'].lower()
-        content_lower = result['content'].lower()
-        question_lower = question.lower()
-        
+        features = self._get_knowledge_features(result)
+        return self._question_relevance(features, question, self._base_relevance(features, keyword))
+
+    @staticmethod
+    def _base_relevance(features, keyword: str) -> float:
+        """严格相关性分数中与问题无关的部分"""
         score = 0.0
         
         # 标题匹配权重最高
-        search_terms = self._get_search_terms_for_problem_type(keyword)
-        title_match_count = sum(1 for term in search_terms if term in title_lower)
-        
-        if title_match_count > 0:
+        if features.has_search_term(keyword):
             score += 0.8  # 标题匹配给高分
         
+        return score
+
+    @staticmethod
+    def _question_relevance(features, question: str, base_score: float) -> float:
+        """在 base_score 上加上问题词汇匹配的分数"""
+        score = base_score
+        
         # 问题词汇匹配
-        question_words = set(question_lower.split())
-        title_words = set(title_lower.split())
-        overlap = len(question_words.intersection(title_words))
+        overlap = len(features.title_words.intersection(question.lower().split()))
         if overlap > 0:
             score += min(0.2, overlap * 0.1)
         
@@ -539,26 +653,42 @@ class EnhancedRAGEngine:
     def _calculate_strict_relevance_strict(self, result: Dict[str, Any], keyword: str, question: str) -> float:
         """更严格的相关性评分 - 专门用于知识库模式"""
         try:
-            title = result['title'].lower()
-            content = result['content'].lower()
-            question_lower = question.lower()
+            features = self._get_knowledge_features(result)
+            return self._question_relevance_strict(features, question, self._base_relevance_strict(features, keyword))
             
-            score = 0.0
+        except Exception as e:
+            logger.error(f"严格相关性评分失败: {e}")
+            return 0.0
+
+    @staticmethod
+    def _base_relevance_strict(features, keyword: str) -> float:
+        """更严格的相关性分数中与问题无关的部分"""
+        score = 0.0
+        
+        # 标题匹配权重最高
+        if keyword.lower() in features.title_lower:
+            score += 0.6
+        
+        return score
+
+    @staticmethod
+    def _question_relevance_strict(features, question: str, base_score: float) -> float:
+        """在 base_score 上加上问题词汇在标题、内容中匹配的分数"""
+        try:
+            title = features.title_lower
             
-            # 标题匹配权重最高
-            if keyword.lower() in title:
-                score += 0.6
+            score = base_score
             
             # 问题词汇在标题中的匹配
-            question_words = question_lower.split()
+            question_words = question.lower().split()
             relevant_words = [word for word in question_words if len(word) > 2]
             
             title_match_count = sum(1 for word in relevant_words if word in title)
             if title_match_count > 0:
                 score += min(0.3, title_match_count * 0.1)
             
-            # 问题词汇在内容中的匹配
-            content_match_count = sum(1 for word in relevant_words if word in content)
+            # 问题词汇在内容中的匹配（先查内容的双字位图，多数不相关的词无需扫描内容）
+            content_match_count = sum(1 for word in relevant_words if features.content_contains(word))
             if content_match_count > 0:
                 score += min(0.1, content_match_count * 0.02)
             
@@ -583,46 +713,83 @@ class EnhancedRAGEngine:
     def _vector_search(self, question: str, top_k: int) -> List[Dict[str, Any]]:
         """向量搜索 - 更严格的阈值"""
         try:
-            from db_utils import db_manager
-            
+            index = self.vector_index.get()
+            if index is None or len(index) == 0:
+                return []
+
             question_embedding = self._get_cached_embedding(question)
-            all_knowledge = db_manager.get_all_knowledge()
-            
-            if not all_knowledge:
+
+            # 标题权重0.8、内容权重0.2已预先合并进索引矩阵，一次矩阵向量乘法完成打分
+            # 大幅提高向量搜索阈值，确保高相关性
+            hits = index.search(question_embedding, top_k, threshold=0.7, nprobe=Config.IVF_NPROBE,
+                                rescore_factor=Config.VECTOR_INDEX_RESCORE_FACTOR)  # 从0.4提高到0.7
+            if not hits:
                 return []
-            
+
+            # 索引只保存ID，标题和内容按需读取
+            from db_utils import db_manager
+            knowledge_map = db_manager.get_knowledge_by_ids([hit['id'] for hit in hits])
+
             similarities = []
-            for knowledge_item in all_knowledge:
-                knowledge_id = knowledge_item['id']
-                title = knowledge_item['title']
-                content = knowledge_item['content']
-                
-                # 计算相似度
-                title_embedding = self._get_cached_embedding(title)
-                title_similarity = self._cosine_similarity(question_embedding, title_embedding)
-                
-                content_embedding = self._get_cached_embedding(content)
-                content_similarity = self._cosine_similarity(question_embedding, content_embedding)
-                
-                # 标题权重更高
-                final_similarity = title_similarity * 0.8 + content_similarity * 0.2
-                
-                # 大幅提高向量搜索阈值，确保高相关性
-                if final_similarity > 0.7:  # 从0.4提高到0.7
+            for hit in hits:
+                knowledge_item = knowledge_map.get(hit['id'])
+                if knowledge_item:
                     similarities.append({
-                        'id': knowledge_id,
-                        'title': title,
-                        'content': content,
-                        'similarity': float(final_similarity)
+                        'id': hit['id'],
+                        'title': knowledge_item['title'],
+                        'content': knowledge_item['content'],
+                        'similarity': hit['similarity']
                     })
-            
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            return similarities[:top_k]
-            
+            return similarities
+
         except Exception as e:
             logger.error(f"向量搜索失败: {e}")
             return []
     
+    def _build_passage_context(self, question: str, knowledge_results: List[Dict[str, Any]]) -> str:
+        """为LLM提示词挑选与问题最相关的段落
+
+        各条目的段落向量与问题向量比较，全局取前 CONTEXT_MAX_PASSAGES 个段落，
+        按条目顺序和段落在原文中的位置拼接。尚未生成段落的条目退回截断的全文。
+        """
+        try:
+            chunk_map = self.db_manager.get_knowledge_chunks([result['id'] for result in knowledge_results]) \
+                if self.db_manager else {}
+
+            candidates = []
+            for result in knowledge_results:
+                for chunk in chunk_map.get(result['id'], []):
+                    vector = decode_vector(chunk['embedding'])
+                    if vector is not None:
+                        candidates.append((result['id'], chunk['start_offset'], chunk['end_offset'], vector))
+
+            selected = {}
+            if candidates:
+                query = normalize_rows(np.asarray(self._get_cached_embedding(question), dtype=np.float32))
+                scores = normalize_rows(np.vstack([vector for _, _, _, vector in candidates])) @ query
+                for row in np.argsort(-scores)[:Config.CONTEXT_MAX_PASSAGES]:
+                    knowledge_id, start, end, _ = candidates[row]
+                    selected.setdefault(knowledge_id, []).append((start, end))
+
+            parts = []
+            for result in knowledge_results:
+                content = result['content'] or ''
+                if result['id'] in selected:
+                    passages = [content[start:end] for start, end in sorted(selected[result['id']])]
+                elif result['id'] not in chunk_map:
+                    passages = [content[:Config.CHUNK_MAX_CHARS]]
+                else:
+                    continue
+                parts.append(f"【{result['title']}】\n" + "\n".join(passages))
+
+            context = "\n\n".join(parts)
+            full_length = sum(len(result['content'] or '') for result in knowledge_results)
+            logger.info(f"提示词知识上下文: {len(context)} 字（全文 {full_length} 字）")
+            return context
+        except Exception as e:
+            logger.error(f"挑选知识段落失败: {e}")
+            return "\n".join([result['content'] for result in knowledge_results])
+
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """计算余弦相似度"""
         try:
@@ -686,7 +853,32 @@ class EnhancedRAGEngine:
             return 0.0
     
     def generate_ai_response(self, question: str, context: str = "") -> str:
-        """使用AI大模型生成回答 - 大幅优化超时时间"""
+        """使用AI大模型生成回答；与已回答过的问题语义相近且知识上下文相同时复用该回答
+
+        没有知识上下文时不使用语义缓存：此时缓存键只剩AI模型，不同类型的问题
+        （如“打印机连不上”与“显示器连不上”）向量相近就会互相命中。
+        """
+        if not self.active_ai_model or self.semantic_cache.max_entries <= 0 or not context.strip():
+            return self._call_ai_model(question, context)
+        
+        embedding = None
+        cache_key = context_key(self.active_ai_model, context)
+        try:
+            embedding = self._get_cached_embedding(question)
+            answer = self.semantic_cache.lookup(embedding, cache_key)
+            if answer is not None:
+                logger.info(f"语义缓存命中，跳过大模型调用: {question}")
+                return answer
+        except Exception as e:
+            logger.warning(f"查询语义缓存失败: {e}")
+        
+        answer = self._call_ai_model(question, context)
+        if embedding is not None and not any(marker in answer for marker in _AI_FAILURE_MARKERS):
+            self.semantic_cache.add(embedding, cache_key, answer)
+        return answer
+    
+    def _call_ai_model(self, question: str, context: str = "") -> str:
+        """调用当前启用的AI大模型 - 大幅优化超时时间"""
         try:
             if not self.active_ai_model:
                 return "AI大模型未启用"
@@ -951,10 +1143,85 @@ class EnhancedRAGEngine:
                 return model_name
         return None
     
-    def process_question(self, question: str, answer_mode: str = 'hybrid', session_id: str = None, user_id: str = 'anonymous') -> Dict[str, Any]:
+    def _search_knowledge(self, keywords: List[str], question: str = '') -> List[Dict[str, Any]]:
+        """按关键词搜索知识库，去重后最多返回5条"""
+        knowledge_results = []
+        
+        if Config.LEXICAL_SEARCH_BACKEND == 'bm25' and keywords:
+            try:
+                results = self._bm25_search(question, keywords[0], 5)
+                if results is not None:
+                    return results
+            except Exception as e:
+                logger.warning(f"BM25检索失败，退回数据库检索: {e}")
+        
+        # 只搜索标题，不使用向量相似度
+        if self.db_manager and keywords:
+            for keyword in keywords:
+                if keyword not in ['greeting', 'identity']:  # 跳过特殊关键词
+                    try:
+                        results = self.db_manager.search_knowledge_by_keyword(keyword)
+                        knowledge_results.extend(results)
+                    except Exception as e:
+                        logger.warning(f"搜索知识库失败: {e}")
+                        continue
+        else:
+            logger.warning("数据库管理器不可用或没有有效关键词")
+        
+        # 去重
+        seen_ids = set()
+        unique_results = []
+        for result in knowledge_results:
+            if result['id'] not in seen_ids:
+                seen_ids.add(result['id'])
+                unique_results.append(result)
+        
+        return unique_results[:5]  # 限制结果数量
+
+    def process_question(self, question: str, answer_mode: str = 'hybrid', session_id: str = None, user_id: str = 'anonymous',
+                         use_cache: bool = True) -> Dict[str, Any]:
+        """处理用户问题，相同的问题优先返回缓存的回答
+
+        use_cache=False 时（如用户要求重新回答）不读缓存，重新生成后替换缓存中的回答。
+        """
+        start_time = time.time()
+        cache_key = self._answer_cache_key(question, answer_mode)
+        if use_cache:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                cached['response_time'] = time.time() - start_time
+                logger.info(f"问答缓存命中: {question}, 模式: {answer_mode}，耗时: {cached['response_time']:.3f}秒")
+                return cached
+        
+        response = self._process_question(question, answer_mode, start_time)
+        if self._is_cacheable_response(response):
+            self.answer_cache.put(cache_key, response)
+        return response
+    
+    def _answer_cache_key(self, question: str, answer_mode: str) -> tuple:
+        """问答缓存键：规范化后的问题、回答模式、AI模型、知识库版本号"""
+        return normalize_text(question), answer_mode, self.active_ai_model, self._current_kb_version()
+    
+    def _current_kb_version(self) -> Optional[int]:
+        """检索结果缓存所对应的知识库版本号（最多每隔几秒读取一次数据库），不可用时返回 None"""
+        if not self.db_manager:
+            return None
+        try:
+            return self.db_manager.search_cache.current_version()
+        except Exception as e:
+            logger.warning(f"获取知识库版本号失败: {e}")
+            return None
+    
+    def _is_cacheable_response(self, response: Dict[str, Any]) -> bool:
+        """出错、转人工或大模型调用失败的回答不缓存"""
+        if response['answer_type'] == '错误' or response['escalated'] or response['ticket_id']:
+            return False
+        ai_answer = response.get('ai_answer')
+        return not (ai_answer and any(marker in ai_answer for marker in _AI_FAILURE_MARKERS))
+    
+    def _process_question(self, question: str, answer_mode: str, start_time: float) -> Dict[str, Any]:
         """处理用户问题 - 优化响应策略"""
         try:
-            start_time = time.time()
             logger.info(f"开始处理问题: {question}, 模式: {answer_mode}")
             
             # 首先检查是否是问候语 - 使用原始问题，不包含上下文
@@ -1024,30 +1291,7 @@ class EnhancedRAGEngine:
             
             # 如果不是问候语或身份询问，则进行知识库搜索
             # 重新提取关键词（排除问候语和身份询问）
-            knowledge_results = []
-            
-            # 只搜索标题，不使用向量相似度
-            if self.db_manager and keywords:
-                for keyword in keywords:
-                    if keyword not in ['greeting', 'identity']:  # 跳过特殊关键词
-                        try:
-                            results = self.db_manager.search_knowledge_by_keyword(keyword)
-                            knowledge_results.extend(results)
-                        except Exception as e:
-                            logger.warning(f"搜索知识库失败: {e}")
-                            continue
-            else:
-                logger.warning("数据库管理器不可用或没有有效关键词")
-            
-            # 去重
-            seen_ids = set()
-            unique_results = []
-            for result in knowledge_results:
-                if result['id'] not in seen_ids:
-                    seen_ids.add(result['id'])
-                    unique_results.append(result)
-            
-            knowledge_results = unique_results[:5]  # 限制结果数量
+            knowledge_results = self._search_knowledge(keywords, question)
             knowledge_confidence = self._calculate_confidence(knowledge_results)
             
             logger.info(f"知识库搜索结果: {len(knowledge_results)} 条，置信度: {knowledge_confidence}")
@@ -1103,7 +1347,8 @@ class EnhancedRAGEngine:
                 if knowledge_results and knowledge_confidence > 0.05:  # 降低阈值
                     # 有相关知识，生成混合回答
                     knowledge_context = "\n".join([result['content'] for result in knowledge_results])
-                    ai_answer = self.generate_ai_response(question, knowledge_context)
+                    # 提示词只带最相关的段落，减少token数量
+                    ai_answer = self.generate_ai_response(question, self._build_passage_context(question, knowledge_results))
                     
                     # 组合知识库和AI回答
                     combined_answer = f"""基于知识库信息：
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题类型关键词匹配
+
+把问题类型词表编译成 Aho-Corasick 自动机，一次扫描问题文本即可找出所有命中的词，
+再按问题类型的优先级选出结果；问候语和身份询问使用集合做完全匹配。
+知识库 keywords 表同样编译成自动机，保存知识条目时一次扫描提取其中出现的关键词。
+"""
+
+import logging
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+GREETING = 'greeting'
+IDENTITY = 'identity'
+
+
+class AhoCorasick:
+    """多模式串匹配自动机，构建后只读，可在多线程间共享"""
+
+    def __init__(self, terms: Iterable[str]):
+        self._goto = [{}]    # 节点 -> {字符: 子节点}
+        self._fail = [0]     # 节点 -> 失败指针
+        self._output = [()]  # 节点 -> 在该节点结束的所有词
+        for term in terms:
+            if term:
+                self._add(term)
+        self._build()
+
+    def _add(self, term: str):
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        if term not in self._output[node]:
+            self._output[node] = self._output[node] + (term,)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """扫描文本，依次产出 (起始位置, 结束位置, 命中的词)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term in output[node]:
+                yield end - len(term), end, term
+
+
+class KeywordMatch(NamedTuple):
+    """匹配结果：问题类型（或通用关键词、greeting、identity）及其在问题中的命中位置"""
+    problem_type: str
+    positions: List[Tuple[int, int, str]]
+
+
+class ProblemTypeMatcher:
+    """问题类型匹配器
+
+    规则与原来逐个比较的实现一致：
+    1. 问题（转小写后）与问候语/身份询问完全相同时返回 greeting/identity；
+    2. 否则在命中任一词的问题类型中取优先级最高的一个；
+    3. 没有命中问题类型时，取通用关键词列表中最靠前的命中词。
+    """
+
+    def __init__(self, type_terms: Dict[str, Sequence[str]], priority_order: Sequence[str],
+                 generic_keywords: Sequence[str] = (), greeting_keywords: Sequence[str] = (),
+                 identity_keywords: Sequence[str] = ()):
+        self.greeting_keywords = frozenset(greeting_keywords)
+        self.identity_keywords = frozenset(identity_keywords)
+
+        # 词 -> [(排序键, 结果)]，问题类型排在所有通用关键词之前
+        self._term_targets = {}
+        for rank, problem_type in enumerate(priority_order):
+            for term in type_terms.get(problem_type, ()):
+                self._term_targets.setdefault(term, []).append((rank, problem_type))
+        offset = len(priority_order)
+        for rank, keyword in enumerate(generic_keywords):
+            self._term_targets.setdefault(keyword, []).append((offset + rank, keyword))
+
+        self._automaton = AhoCorasick(self._term_targets)
+
+    def match(self, question: str) -> Optional[KeywordMatch]:
+        """匹配问题，返回优先级最高的结果；没有命中时返回 None"""
+        question_lower = question.lower()
+        if question_lower in self.greeting_keywords:
+            return KeywordMatch(GREETING, [(0, len(question_lower), question_lower)])
+        if question_lower in self.identity_keywords:
+            return KeywordMatch(IDENTITY, [(0, len(question_lower), question_lower)])
+
+        best_rank = None
+        best_target = None
+        positions = {}
+        for start, end, term in self._automaton.iter_matches(question_lower):
+            for rank, target in self._term_targets[term]:
+                positions.setdefault(target, []).append((start, end, term))
+                if best_rank is None or rank < best_rank:
+                    best_rank, best_target = rank, target
+
+        if best_target is None:
+            return None
+        return KeywordMatch(best_target, positions[best_target])
+
+    def extract_keywords(self, question: str) -> List[str]:
+        """返回 [问题类型] 或空列表，与 EnhancedRAGEngine._extract_keywords 的返回格式一致"""
+        result = self.match(question)
+        return [result.problem_type] if result else []
+
+
+class KeywordExtractor:
+    """知识条目关键词提取：文本（转小写后）中出现的关键词，按关键词表的顺序取前 limit 个"""
+
+    def __init__(self, keywords: Sequence[Tuple[int, str]]):
+        """keywords 为按优先级（使用频率）降序排列的 [(关键词ID, 关键词)]"""
+        self._entries = {}  # 小写关键词 -> [(排序, 关键词ID, 关键词)]
+        for rank, (keyword_id, keyword) in enumerate(keywords):
+            self._entries.setdefault(keyword.lower(), []).append((rank, keyword_id, keyword))
+        self._automaton = AhoCorasick(self._entries)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def extract(self, text: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """返回 [(关键词ID, 关键词)]"""
+        found = {term for _, _, term in self._automaton.iter_matches(text.lower())}
+        if '' in self._entries:
+            found.add('')  # 空字符串出现在任何文本中
+        entries = sorted(entry for term in found for entry in self._entries[term])
+        return [(keyword_id, keyword) for _, keyword_id, keyword in entries[:limit]]
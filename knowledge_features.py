@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识条目特征缓存
+
+关键词检索的候选条目按以下特征打分，每个条目只在内容变化后计算一次
+（缓存条目记录知识库版本号，版本号不变时直接命中；版本变化后比较标题和内容的摘要）：
+- 转小写的标题、内容，标题的词集合（按空白切分）
+- 内容的字集合和双字位图：判断问题词是否出现在内容中时先查位图，
+  位图排除的词不再扫描内容，打分耗时与内容长度基本无关
+- 问题类型位掩码：标题包含哪些问题类型的检索词、与哪些问题类型严格相关，
+  相关性判断只需一次位运算；词表热加载后按新词表重新计算
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from problem_taxonomy import ProblemTaxonomy
+
+logger = logging.getLogger(__name__)
+
+# 内容双字位图的位数（2 的整数次幂）
+_BIGRAM_BITS = 4096
+_BIGRAM_MASK = _BIGRAM_BITS - 1
+
+
+def _bigram_bitmap(text: str) -> bytes:
+    bitmap = bytearray(_BIGRAM_BITS // 8)
+    for bigram in {text[i:i + 2] for i in range(len(text) - 1)}:
+        bit = hash(bigram) & _BIGRAM_MASK
+        bitmap[bit >> 3] |= 1 << (bit & 7)
+    return bytes(bitmap)
+
+
+class KnowledgeFeatures:
+    """单个知识条目的预计算特征（只读）"""
+
+    __slots__ = ('title', 'content', 'title_lower', 'content_lower', 'title_words',
+                 'content_chars', 'content_bigrams', 'taxonomy', 'search_mask', 'relevant_mask')
+
+    def __init__(self, title: str, content: str, taxonomy: ProblemTaxonomy):
+        self.title = title
+        self.content = content
+        self.title_lower = title.lower()
+        self.content_lower = content.lower()
+        self.title_words = frozenset(self.title_lower.split())
+        self.content_chars = frozenset(self.content_lower)
+        self.content_bigrams = _bigram_bitmap(self.content_lower)
+        self.taxonomy = taxonomy
+        self.search_mask, self.relevant_mask = taxonomy.title_masks(title)
+
+    def with_taxonomy(self, taxonomy: ProblemTaxonomy) -> 'KnowledgeFeatures':
+        """词表更新后重新计算问题类型位掩码，其余特征沿用"""
+        features = object.__new__(KnowledgeFeatures)
+        for name in self.__slots__:
+            setattr(features, name, getattr(self, name))
+        features.taxonomy = taxonomy
+        features.search_mask, features.relevant_mask = taxonomy.title_masks(self.title)
+        return features
+
+    def has_search_term(self, problem_type: str) -> bool:
+        """标题是否包含该问题类型的任一检索词，与 ProblemTaxonomy.has_search_term 一致"""
+        bit = self.taxonomy.type_bits.get(problem_type)
+        if bit is None:
+            return problem_type in self.title_lower
+        return bool(self.search_mask >> bit & 1)
+
+    def is_title_relevant(self, problem_type: str) -> bool:
+        """标题是否与该问题类型严格相关，与 ProblemTaxonomy.is_title_relevant 一致"""
+        bit = self.taxonomy.type_bits.get(problem_type)
+        if bit is None:
+            return problem_type in self.title_lower
+        return bool(self.relevant_mask >> bit & 1)
+
+    def content_contains(self, word: str) -> bool:
+        """word（已转小写）是否出现在内容中"""
+        if len(word) < 2:
+            return not word or word in self.content_chars
+        bigrams = self.content_bigrams
+        for i in range(len(word) - 1):
+            bit = hash(word[i:i + 2]) & _BIGRAM_MASK
+            if not bigrams[bit >> 3] & (1 << (bit & 7)):
+                return False
+        # 位图可能误判为存在，再精确查找一次
+        return word in self.content_lower
+
+
+def _text_digest(title: str, content: str) -> bytes:
+    """标题和内容的摘要，用于判断缓存的特征是否仍对应当前文本"""
+    title_bytes = title.encode('utf-8')
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(len(title_bytes).to_bytes(8, 'little'))
+    digest.update(title_bytes)
+    digest.update(content.encode('utf-8'))
+    return digest.digest()
+
+
+class KnowledgeFeatureCache:
+    """按知识ID缓存条目特征的 LRU；标题或内容变化后自动重新计算"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 知识ID -> (KnowledgeFeatures, 知识库版本号, 标题和内容的摘要)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, result: Dict[str, Any], taxonomy: ProblemTaxonomy,
+            kb_version: Optional[int] = None) -> KnowledgeFeatures:
+        """获取检索结果（含 id、title、content）对应条目的特征
+
+        kb_version 为 result 所属的知识库版本号：与缓存条目记录的版本相同时直接命中，不读取标题和内容；
+        不同（或为 None）时比较标题和内容的摘要，内容未变则沿用已算好的特征并记录新版本号。
+        """
+        knowledge_id = result['id']
+        with self._lock:
+            entry = self._entries.get(knowledge_id)
+            if entry is not None and kb_version is not None and entry[1] == kb_version \
+                    and entry[0].taxonomy is taxonomy:
+                self._entries.move_to_end(knowledge_id)
+                self._hits += 1
+                return entry[0]
+
+        title = result['title'] or ''
+        content = result['content'] or ''
+        digest = _text_digest(title, content)
+        hit = entry is not None and entry[2] == digest
+        if hit:
+            features = entry[0] if entry[0].taxonomy is taxonomy else entry[0].with_taxonomy(taxonomy)
+        else:
+            features = KnowledgeFeatures(title, content, taxonomy)
+
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            self._entries[knowledge_id] = (features, kb_version, digest)
+            self._entries.move_to_end(knowledge_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return features
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
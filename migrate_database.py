@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI-IT 智能客服系统数据库迁移脚本
+"""
+
+import sys
+import time
+
+BATCH_SIZE = 200
+
+
+def migrate_schema():
+    """创建新版本新增的数据表（已存在的表不受影响）"""
+    print("🔄 开始同步数据表结构...")
+
+    from db_utils import db_manager
+
+    db_manager.create_tables()
+    print("✅ 数据表结构同步完成")
+
+
+def migrate_embeddings(dry_run=False):
+    """将知识库中pickle格式的向量嵌入转换为float32二进制格式（标题/内容分别存储）"""
+    print("🔄 开始迁移知识库向量嵌入...")
+
+    from db_utils import db_manager
+    from embedding_codec import decode_embedding, encode_embedding, is_binary_embedding
+
+    rows = db_manager.execute_query("SELECT id, title, content, embedding FROM knowledge_base ORDER BY id", dictionary=True)
+    pending = [row for row in rows if not is_binary_embedding(row['embedding'])]
+
+    print(f"📊 共 {len(rows)} 条知识条目，需要迁移 {len(pending)} 条")
+    if dry_run or not pending:
+        return len(pending)
+
+    from enhanced_rag_engine import enhanced_rag_engine
+
+    start_time = time.time()
+    migrated = 0
+    for offset in range(0, len(pending), BATCH_SIZE):
+        batch = pending[offset:offset + BATCH_SIZE]
+
+        # 旧数据只有内容向量，标题向量需要补齐；没有向量的条目两者都要编码
+        decoded = [decode_embedding(row['embedding'])[1] for row in batch]
+        texts = [row['title'] for row in batch]
+        texts += [row['content'] for row, content_vec in zip(batch, decoded) if content_vec is None]
+        encoded = enhanced_rag_engine.generate_embeddings(texts)
+
+        params = []
+        next_content = len(batch)
+        for i, (row, content_vec) in enumerate(zip(batch, decoded)):
+            if content_vec is None:
+                content_vec = encoded[next_content]
+                next_content += 1
+            params.append((encode_embedding(encoded[i], content_vec), row['id']))
+
+        connection = db_manager.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.executemany("UPDATE knowledge_base SET embedding = %s WHERE id = %s", params)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+
+        migrated += len(batch)
+        print(f"  已迁移 {migrated}/{len(pending)} 条")
+
+    print(f"✅ 向量嵌入迁移完成，共 {migrated} 条，耗时 {time.time() - start_time:.1f} 秒")
+    return migrated
+
+
+def migrate_chunks(dry_run=False):
+    """为还没有段落的知识条目生成段落及段落向量"""
+    print("🔄 开始生成知识段落...")
+
+    from db_utils import db_manager
+
+    query = """
+    SELECT kb.id, kb.title, kb.content
+    FROM knowledge_base kb
+    WHERE NOT EXISTS (SELECT 1 FROM knowledge_chunks c WHERE c.knowledge_id = kb.id)
+    ORDER BY kb.id
+    """
+    pending = db_manager.execute_query(query, dictionary=True)
+
+    print(f"📊 需要生成段落的知识条目: {len(pending)} 条")
+    if dry_run or not pending:
+        return len(pending)
+
+    from enhanced_rag_engine import enhanced_rag_engine
+
+    start_time = time.time()
+    migrated = 0
+    for offset in range(0, len(pending), BATCH_SIZE):
+        batch = pending[offset:offset + BATCH_SIZE]
+        encoded = enhanced_rag_engine.encode_knowledge_items([(row['title'], row['content']) for row in batch])
+        db_manager.save_knowledge_chunks({row['id']: passages for row, (_, _, passages) in zip(batch, encoded)})
+
+        migrated += len(batch)
+        print(f"  已处理 {migrated}/{len(pending)} 条")
+
+    print(f"✅ 知识段落生成完成，共 {migrated} 条，耗时 {time.time() - start_time:.1f} 秒")
+    return migrated
+
+
+def migrate_fulltext(dry_run=False):
+    """为知识库和问答记录创建 ngram 全文索引（大表上耗时较长，建议在低峰期执行）"""
+    print("🔄 开始创建全文索引...")
+
+    from db_utils import db_manager, FULLTEXT_INDEXES
+
+    missing = [(table, index_name) for table, (index_name, _) in FULLTEXT_INDEXES.items()
+               if not db_manager.has_fulltext_index(table)]
+    for table, index_name in missing:
+        count = db_manager.execute_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+        print(f"📊 {table} 缺少全文索引 {index_name}，共 {count} 行")
+    if dry_run or not missing:
+        if not missing:
+            print("✅ 全文索引均已存在")
+        return len(missing)
+
+    start_time = time.time()
+    created = db_manager.create_fulltext_indexes()
+    print(f"✅ 全文索引创建完成: {', '.join(created) or '无'}，耗时 {time.time() - start_time:.1f} 秒")
+    return len(created)
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("使用方法:")
+        print("  python migrate_database.py schema                  # 创建新增的数据表")
+        print("  python migrate_database.py embeddings [--dry-run]  # 迁移向量嵌入存储格式")
+        print("  python migrate_database.py chunks [--dry-run]      # 为已有知识条目生成段落向量")
+        print("  python migrate_database.py fulltext [--dry-run]    # 创建 ngram 全文索引")
+        return
+
+    action = sys.argv[1]
+    dry_run = '--dry-run' in sys.argv[2:]
+
+    if action == "schema":
+        migrate_schema()
+    elif action == "embeddings":
+        migrate_embeddings(dry_run=dry_run)
+    elif action == "chunks":
+        migrate_chunks(dry_run=dry_run)
+    elif action == "fulltext":
+        migrate_fulltext(dry_run=dry_run)
+    else:
+        print(f"❌ 未知操作: {action}")
+
+
+if __name__ == "__main__":
+    main()
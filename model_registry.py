@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内模型注册表
+
+模型按名称注册加载函数，首次使用时才加载，同一进程内只加载一次、所有调用方共享同一个实例。
+导入本模块不会加载任何模型；需要提前加载时调用 warm_up()。
+每个模型记录加载次数、加载耗时和加载时间，供监控接口查看。
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'embedding'
+
+
+class ModelRegistry:
+    """线程安全的懒加载模型注册表"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._metrics = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """注册模型加载函数（已加载的模型不受影响）"""
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+            self._metrics.setdefault(name, {'loaded': False, 'load_count': 0, 'load_seconds': None,
+                                            'loaded_at': None, 'last_error': None})
+
+    def get(self, name: str):
+        """获取模型实例，未加载时加载（并发调用只会加载一次）"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"未注册的模型: {name}")
+            lock = self._locks[name]
+
+        with lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            metrics = self._metrics[name]
+            start_time = time.time()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                metrics['last_error'] = str(e)
+                logger.error(f"加载模型 {name} 失败: {e}")
+                raise
+
+            metrics.update(loaded=True, load_count=metrics['load_count'] + 1,
+                           load_seconds=round(time.time() - start_time, 3),
+                           loaded_at=time.strftime('%Y-%m-%d %H:%M:%S'), last_error=None)
+            self._models[name] = model
+            logger.info(f"模型 {name} 加载完成，耗时: {metrics['load_seconds']:.2f}秒")
+            return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warm_up(self, *names: str) -> Dict[str, bool]:
+        """提前加载指定的模型（不指定时加载全部已注册的模型），返回各模型是否加载成功"""
+        results = {}
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+                results[name] = True
+            except Exception:
+                results[name] = False
+        return results
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各模型的加载统计"""
+        with self._lock:
+            return {name: dict(metrics) for name, metrics in self._metrics.items()}
+
+
+class LazyModel:
+    """模型代理：调用 encode 时才从注册表获取模型，接口与 SentenceTransformer.encode 兼容"""
+
+    def __init__(self, registry: ModelRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def encode(self, *args, **kwargs):
+        return self._registry.get(self._name).encode(*args, **kwargs)
+
+
+def _load_embedding_model():
+    from embedding_backend import load_embedding_model
+    return load_embedding_model(Config.EMBEDDING_MODEL_NAME, Config.EMBEDDING_BACKEND)
+
+
+# 全局模型注册表
+model_registry = ModelRegistry()
+model_registry.register(EMBEDDING_MODEL, _load_embedding_model)
+
+
+def get_embedding_model():
+    """获取本进程共享的向量模型实例"""
+    return model_registry.get(EMBEDDING_MODEL)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题类型词表（数据驱动，支持热加载）
+
+词表保存在 JSON 文件中（默认 problem_taxonomy.json），problem_types 数组的顺序即优先级：
+    name:         问题类型
+    match_terms:  问题中出现任一词即识别为该类型
+    search_terms: 按该类型检索知识库时使用的词，知识标题须包含其中之一
+    title_terms:  （可选）知识标题还须包含其中之一才算严格相关
+
+加载时编译成匹配器和各类型的 frozenset；工作进程定期检查文件修改时间，
+文件变化后自动重新加载，无需重启。新文件格式错误时继续使用旧词表。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from keyword_matcher import AhoCorasick, ProblemTypeMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class ProblemTaxonomy:
+    """编译后的只读词表"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version = data.get('version', 0)
+        problem_types = data.get('problem_types', [])
+
+        priority_order = []
+        match_terms = {}
+        self.type_bits = {}  # 问题类型 -> 位序号（用于知识条目的问题类型位掩码）
+        self._search_terms = {}
+        self._search_term_sets = {}
+        self._title_term_sets = {}
+        for problem_type in problem_types:
+            name = problem_type['name']
+            self.type_bits.setdefault(name, len(self.type_bits))
+            priority_order.append(name)
+            match_terms[name] = tuple(problem_type.get('match_terms', ()))
+            search_terms = tuple(problem_type.get('search_terms') or (name,))
+            self._search_terms[name] = search_terms
+            self._search_term_sets[name] = frozenset(term.lower() for term in search_terms)
+            if problem_type.get('title_terms'):
+                self._title_term_sets[name] = frozenset(term.lower() for term in problem_type['title_terms'])
+
+        self.matcher = ProblemTypeMatcher(
+            match_terms, priority_order,
+            generic_keywords=data.get('generic_keywords', ()),
+            greeting_keywords=data.get('greeting_keywords', ()),
+            identity_keywords=data.get('identity_keywords', ())
+        )
+
+        # 标题中出现的检索词/标题词一次扫描得到，相关性判断只需集合运算
+        title_vocabulary = set().union(*self._search_term_sets.values(), *self._title_term_sets.values())
+        self._title_automaton = AhoCorasick(title_vocabulary)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'ProblemTaxonomy':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self._search_terms)
+
+    def get_search_terms(self, problem_type: str) -> Tuple[str, ...]:
+        """按问题类型检索知识库时使用的词；未知类型（如通用关键词）只用其本身"""
+        return self._search_terms.get(problem_type, (problem_type,))
+
+    def terms_in(self, text: str) -> FrozenSet[str]:
+        """文本（转小写后）中出现的所有检索词/标题词"""
+        return frozenset(term for _, _, term in self._title_automaton.iter_matches(text.lower()))
+
+    def has_search_term(self, problem_type: str, title: str, title_terms: Optional[FrozenSet[str]] = None) -> bool:
+        """标题是否包含该问题类型的任一检索词（title_terms 为已算好的 terms_in(title)）"""
+        search_terms = self._search_term_sets.get(problem_type)
+        if search_terms is None:
+            return problem_type in title.lower()
+        if title_terms is None:
+            title_terms = self.terms_in(title)
+        return not search_terms.isdisjoint(title_terms)
+
+    def title_masks(self, title: str) -> Tuple[int, int]:
+        """标题的问题类型位掩码 (包含检索词的类型, 严格相关的类型)，第 type_bits[类型] 位为1表示命中"""
+        title_terms = self.terms_in(title)
+        search_mask = 0
+        relevant_mask = 0
+        for name, bit in self.type_bits.items():
+            if self._search_term_sets[name].isdisjoint(title_terms):
+                continue
+            search_mask |= 1 << bit
+            required_terms = self._title_term_sets.get(name)
+            if required_terms is None or not required_terms.isdisjoint(title_terms):
+                relevant_mask |= 1 << bit
+        return search_mask, relevant_mask
+
+    def is_title_relevant(self, problem_type: str, title: str) -> bool:
+        """知识标题是否与问题类型严格相关：包含任一检索词，且（配置了 title_terms 时）包含任一标题词"""
+        title_terms = self.terms_in(title)
+        if not self.has_search_term(problem_type, title, title_terms):
+            return False
+        required_terms = self._title_term_sets.get(problem_type)
+        return required_terms is None or not required_terms.isdisjoint(title_terms)
+
+
+class TaxonomyHolder:
+    """按文件修改时间热加载的词表"""
+
+    def __init__(self, path: str, check_interval: float = 10.0):
+        self.path = path
+        self._check_interval = check_interval
+        self._taxonomy = ProblemTaxonomy({})
+        self._mtime = None
+        self._failed_mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reload()
+
+    def get(self) -> ProblemTaxonomy:
+        if time.time() - self._last_check >= self._check_interval:
+            with self._lock:
+                if time.time() - self._last_check >= self._check_interval:
+                    self._reload()
+        return self._taxonomy
+
+    def _reload(self):
+        self._last_check = time.time()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            if self._mtime is None and self._failed_mtime is None:
+                logger.error(f"加载问题类型词表失败: {e}")
+                self._failed_mtime = 0.0
+            return
+        if mtime in (self._mtime, self._failed_mtime):
+            return
+
+        try:
+            taxonomy = ProblemTaxonomy.from_file(self.path)
+        except Exception as e:
+            # 同一份错误文件只报一次，文件再次修改后重试
+            self._failed_mtime = mtime
+            logger.error(f"加载问题类型词表失败，继续使用版本 {self._taxonomy.version}: {e}")
+            return
+
+        self._taxonomy = taxonomy
+        self._mtime = mtime
+        self._failed_mtime = None
+        logger.info(f"问题类型词表已加载: {self.path}，版本 {taxonomy.version}，{len(taxonomy)} 个问题类型")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库检索结果缓存（按知识库版本号失效）
+
+- 缓存键为 (查询类型, 规范化后的检索词)，空结果同样缓存
+- 每隔 check_interval 秒读取一次知识库版本号，版本变化时清空；本进程修改知识库后立即清空
+- 计算期间缓存被清空的，计算结果不写入，避免把旧版本的结果缓存下来
+- get_or_compute_versioned 同时返回结果计算时的版本号，供按版本号校验的下游缓存使用
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedResultCache:
+    """按版本号整体失效的 LRU 结果缓存"""
+
+    def __init__(self, version_fn: Callable[[], int], max_entries: int = 1000, check_interval: float = 5.0):
+        self.max_entries = max_entries
+        self._version_fn = version_fn
+        self._check_interval = check_interval
+        self._entries = OrderedDict()  # key -> (结果, 计算时的版本号)
+        self._version = None
+        self._generation = 0  # 每次清空时递增
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get_or_compute(self, key: Hashable, compute_fn: Callable[[], Any]) -> Any:
+        """获取缓存的结果；未命中时调用 compute_fn 计算并写入缓存（compute_fn 抛出异常时不缓存）"""
+        return self._get_or_compute(key, compute_fn, read_version=False)[0]
+
+    def get_or_compute_versioned(self, key: Hashable, compute_fn: Callable[[], Any]) -> Tuple[Any, Optional[int]]:
+        """同 get_or_compute，另外返回结果所属的知识库版本号
+
+        未命中时在计算前后各读取一次数据库中的版本号，两次相同时结果属于该版本；
+        读取失败或计算期间版本变化（结果可能属于任一版本）时为 None。
+        本进程记录的版本号最多滞后 check_interval 秒，不能作为结果所属的版本。
+        """
+        return self._get_or_compute(key, compute_fn, read_version=True)
+
+    def _get_or_compute(self, key: Hashable, compute_fn: Callable[[], Any],
+                        read_version: bool) -> Tuple[Any, Optional[int]]:
+        if self.max_entries > 0:
+            self._check_version()
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return self._entries[key]
+                self._misses += 1
+                generation = self._generation
+
+        version = self._read_version() if read_version else None
+        value = compute_fn()
+        if version is not None and self._read_version() != version:
+            version = None
+        if self.max_entries <= 0:
+            return value, version
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, version)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value, version
+
+    def _read_version(self) -> Optional[int]:
+        try:
+            return self._version_fn()
+        except Exception as e:
+            logger.warning(f"读取知识库版本号失败: {e}")
+            return None
+
+    def current_version(self):
+        """当前的知识库版本号（最多每隔 check_interval 秒读取一次数据库）"""
+        self._check_version()
+        return self._version
+
+    def _check_version(self):
+        if time.time() - self._last_check < self._check_interval:
+            return
+        with self._check_lock:
+            if time.time() - self._last_check < self._check_interval:
+                return
+            try:
+                version = self._version_fn()
+            except Exception as e:
+                logger.warning(f"检查知识库版本号失败: {e}")
+                return
+            finally:
+                self._last_check = time.time()
+            if version != self._version:
+                self._version = version
+                self.clear()
+
+    def invalidate(self):
+        """本进程修改了知识库：立即清空，并在下次查询时重新读取版本号"""
+        self.clear()
+        self._last_check = 0.0
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'version': self._version,
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
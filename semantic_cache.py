@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型回答的语义缓存
+
+保存每次生成回答时的问题向量、知识上下文的摘要和回答。新问题与某个已缓存问题的余弦相似度
+达到阈值、且知识上下文（及AI模型）相同时，直接复用该回答，不再调用大模型。
+没有知识上下文的问题不经过本缓存（由调用方跳过），避免仅凭问题向量相近就复用回答。
+向量保存在固定大小的矩阵中（环形覆盖最早的条目），查询为一次矩阵向量乘法。
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def context_key(*parts: str) -> int:
+    """知识上下文等文本的摘要（63位整数）"""
+    digest = hashlib.sha1('\0'.join(parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') >> 1
+
+
+class SemanticAnswerCache:
+    """按问题向量相似度查找的回答缓存"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 2000, ttl: int = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors = None  # (max_entries, dim) 归一化后的问题向量，首次写入时按维度分配
+        self._context_keys = np.zeros(max(max_entries, 0), dtype=np.int64)
+        self._expires_at = np.zeros(max(max_entries, 0), dtype=np.float64)  # 0 表示空位
+        self._answers = [None] * max(max_entries, 0)
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def lookup(self, vector: np.ndarray, key: int) -> Optional[str]:
+        """查找相同上下文下与问题最相似的已缓存回答，相似度低于阈值时返回 None"""
+        if self.max_entries <= 0:
+            return None
+        query = self._normalize(vector)
+        with self._lock:
+            if query is None or self._vectors is None or len(query) != self._vectors.shape[1]:
+                self._misses += 1
+                return None
+            slots = np.flatnonzero((self._context_keys == key) & (self._expires_at > time.time()))
+            if len(slots):
+                similarities = self._vectors[slots] @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._hits += 1
+                    logger.debug(f"语义缓存命中，相似度: {similarities[best]:.4f}")
+                    return self._answers[slots[best]]
+            self._misses += 1
+            return None
+
+    def add(self, vector: np.ndarray, key: int, answer: str):
+        if self.max_entries <= 0:
+            return
+        vector = self._normalize(vector)
+        if vector is None:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                # 首次写入或向量模型维度变化时重新分配
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._expires_at[:] = 0
+                self._answers = [None] * self.max_entries
+                self._next_slot = 0
+            slot = self._next_slot
+            self._vectors[slot] = vector
+            self._context_keys[slot] = key
+            self._expires_at[slot] = time.time() + self.ttl
+            self._answers[slot] = answer
+            self._next_slot = (slot + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._expires_at[:] = 0
+            self._answers = [None] * max(self.max_entries, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': int(np.count_nonzero(self._expires_at > time.time())),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推理后端自检测试：用桩模型代替真实的向量模型，检查余弦相似度阈值判断、
+参考向量文件的缓存与损坏后的重新生成
+"""
+
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+import embedding_backend
+from config import Config
+from embedding_backend import BACKEND_ONNX, BACKEND_TORCH, REFERENCE_SENTENCES
+
+DIM = 32
+
+
+def reference_vector(sentence):
+    rng = np.random.default_rng(zlib.crc32(sentence.encode('utf-8')))
+    return rng.standard_normal(DIM).astype(np.float32)
+
+
+class StubModel:
+    """按句子生成固定向量的桩模型，noise 为叠加的扰动幅度"""
+
+    def __init__(self, backend, noise=0.0):
+        self.backend = backend
+        self.noise = noise
+        self.encoded = 0
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        self.encoded += len(texts)
+        vectors = np.vstack([reference_vector(text) for text in texts])
+        if self.noise:
+            rng = np.random.default_rng(len(texts))
+            vectors = vectors + self.noise * rng.standard_normal(vectors.shape).astype(np.float32)
+        return vectors
+
+
+@pytest.fixture
+def stub_backends(tmp_path, monkeypatch):
+    """替换各后端的加载函数，记录加载次数；参考向量写到临时目录"""
+    loads = []
+
+    def make_loader(backend, noise=0.0):
+        def loader(model_name):
+            loads.append(backend)
+            return StubModel(backend, noise)
+        return loader
+
+    def set_onnx(noise=0.0, error=None):
+        def loader(model_name):
+            loads.append(BACKEND_ONNX)
+            if error:
+                raise error
+            return StubModel(BACKEND_ONNX, noise)
+        monkeypatch.setitem(embedding_backend._LOADERS, BACKEND_ONNX, loader)
+
+    torch_loader = make_loader(BACKEND_TORCH)
+    monkeypatch.setattr(embedding_backend, '_load_torch', torch_loader)
+    monkeypatch.setitem(embedding_backend._LOADERS, BACKEND_TORCH, torch_loader)
+    monkeypatch.setattr(Config, 'VECTOR_INDEX_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'EMBEDDING_BACKEND_MIN_COSINE', 0.99)
+    set_onnx()
+    return loads, set_onnx
+
+
+def test_backend_within_tolerance_is_used(stub_backends):
+    loads, set_onnx = stub_backends
+    set_onnx(noise=0.01)
+    model = embedding_backend.load_embedding_model('stub-model', BACKEND_ONNX)
+    assert model.backend == BACKEND_ONNX
+    min_cosine, _ = embedding_backend.self_check(model, 'stub-model')
+    assert Config.EMBEDDING_BACKEND_MIN_COSINE <= min_cosine < 1.0
+
+
+def test_backend_below_tolerance_falls_back_to_torch(stub_backends):
+    loads, set_onnx = stub_backends
+    set_onnx(noise=1.0)
+    model = embedding_backend.load_embedding_model('stub-model', BACKEND_ONNX)
+    assert model.backend == BACKEND_TORCH
+
+
+def test_backend_load_failure_falls_back_to_torch(stub_backends):
+    loads, set_onnx = stub_backends
+    set_onnx(error=RuntimeError('onnxruntime 未安装'))
+    model = embedding_backend.load_embedding_model('stub-model', BACKEND_ONNX)
+    assert model.backend == BACKEND_TORCH
+
+
+def test_reference_embeddings_are_cached(stub_backends):
+    loads, _ = stub_backends
+    first = embedding_backend.get_reference_embeddings('stub-model')
+    second = embedding_backend.get_reference_embeddings('stub-model')
+    assert loads == [BACKEND_TORCH]
+    np.testing.assert_array_equal(first, second)
+    assert first.shape == (len(REFERENCE_SENTENCES), DIM)
+    # 只留下最终文件，没有残留的临时文件
+    assert os.listdir(Config.VECTOR_INDEX_DIR) == [os.path.basename(embedding_backend._reference_path('stub-model'))]
+
+
+@pytest.mark.parametrize('content', [b'', b'not a zip file', b'PK\x03\x04truncated'])
+def test_corrupt_reference_file_is_regenerated(stub_backends, content):
+    loads, _ = stub_backends
+    path = embedding_backend._reference_path('stub-model')
+    with open(path, 'wb') as f:
+        f.write(content)
+    embeddings = embedding_backend.get_reference_embeddings('stub-model')
+    assert loads == [BACKEND_TORCH]
+    np.testing.assert_array_equal(embeddings, np.vstack([reference_vector(s) for s in REFERENCE_SENTENCES]))
+    assert embedding_backend.get_reference_embeddings('stub-model').shape == embeddings.shape
+    assert loads == [BACKEND_TORCH]
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题类型匹配与原实现的一致性测试
+
+OLD_* 为改成词表驱动之前 EnhancedRAGEngine 中硬编码的映射表、优先级列表和相关性判断（冻结副本），
+problem_taxonomy.json 的编译结果须与之逐一一致。
+"""
+
+import os
+import itertools
+
+import pytest
+
+from keyword_matcher import AhoCorasick, KeywordExtractor
+from problem_taxonomy import ProblemTaxonomy
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'problem_taxonomy.json')
+
+OLD_GREETING_KEYWORDS = ['你好', '您好', 'hi', 'hello', '早上好', '下午好', '晚上好', '在吗', '在么']
+OLD_IDENTITY_KEYWORDS = ['你是谁', '你是什么', '你的名字', '你叫什么', '你是什么人', '你是什么助手', '你是什么系统']
+OLD_GENERIC_KEYWORDS = ['电脑', '系统', '问题', '故障', '错误', '设备']
+
+OLD_PROBLEM_TYPE_MAPPING = {
+    '打印机': ['打印机', 'printer', '打印', '打印不了', '打印故障', '打印问题', '打印设备'],
+    '鼠标': ['鼠标', 'mouse', '鼠标失灵', '鼠标不动', '鼠标故障', '鼠标问题', '鼠标设备'],
+    '键盘': ['键盘', 'keyboard', '键盘失灵', '键盘故障', '键盘问题', '键盘设备'],
+    '显示器': ['显示器', 'monitor', '屏幕', '显示器故障', '屏幕问题', '显示设备'],
+    '网络': ['网络', 'network', 'wifi', '网络连接', '网络故障', '网络问题', '网络设备'],
+    '蓝牙': ['蓝牙', 'bluetooth', '蓝牙连接', '蓝牙故障', '蓝牙问题'],
+    '系统重置': ['重装', '重置', '重装电脑', '重置电脑', '系统重置', '重装系统', 'reset', '重装windows', '重置windows', '系统重装'],
+    '蓝屏': ['蓝屏', '蓝屏死机', '蓝屏错误', '系统蓝屏', '蓝屏问题'],
+    '死机': ['死机', '卡死', '系统死机', '电脑死机', '死机问题'],
+    '卡顿': ['卡顿', '慢', '系统慢', '电脑慢', '卡', '卡顿问题', '性能问题'],
+    '密码': ['密码', 'password', '修改密码', '更改密码', '重置密码', '忘记密码', '密码问题'],
+    '登录': ['登录', 'login', '无法登录', '登录失败', '登录问题', '登入'],
+    '账户': ['账户', 'account', '账户问题', '账号', '账号问题'],
+    '软件': ['软件', '软件安装', '软件卸载', '软件问题', '程序', '应用程序'],
+    'outlook': ['outlook', '邮件', '邮箱', '邮件客户端', '邮件软件'],
+    'office': ['office', 'word', 'excel', 'powerpoint', '办公软件'],
+    '驱动': ['驱动', '驱动程序', '驱动安装', '驱动问题', '驱动更新'],
+    '系统更新': ['系统更新', 'windows更新', '更新问题', '补丁', '系统补丁'],
+    '数据': ['数据', '数据备份', '数据恢复', '文件', '文件丢失', '数据问题'],
+    '病毒': ['病毒', '杀毒', '病毒防护', '安全软件', '恶意软件', '木马'],
+    '连接': ['连接', '连接问题', '连接失败', '无法连接', '连接故障'],
+    'USB': ['usb', 'usb连接', 'usb设备', 'usb问题'],
+    '性能': ['性能', '性能问题', '速度慢', '运行慢', '响应慢'],
+    '内存': ['内存', '内存不足', '内存问题', 'ram'],
+    '硬盘': ['硬盘', '硬盘问题', '存储', '存储问题', '磁盘'],
+    '音频': ['音频', '声音', '声音问题', '音频问题', '麦克风', '扬声器'],
+    '视频': ['视频', '视频问题', '摄像头', '摄像头问题', '视频通话'],
+    '电源': ['电源', '电源问题', '电池', '电池问题', '充电', '充电问题'],
+    '开机': ['开机', '开机问题', '启动', '启动问题', '无法开机'],
+    '关机': ['关机', '关机问题', '无法关机', '自动关机'],
+}
+
+OLD_PRIORITY_ORDER = [
+    '系统重置', '蓝屏', '死机', '开机', '关机',
+    '打印机', '鼠标', '键盘', '显示器', '网络', '蓝牙', 'USB',
+    '密码', '登录', '账户',
+    'outlook', 'office', '软件', '驱动', '系统更新',
+    '数据', '病毒',
+    '连接',
+    '性能', '内存', '硬盘', '卡顿',
+    '音频', '视频',
+    '电源',
+]
+
+OLD_SEARCH_TERMS = {
+    '系统重置': ['重置', '重装', 'reset', 'windows重置', '系统重置', '重装电脑', '重置电脑'],
+    '打印机': ['打印机', 'printer', '打印故障', '打印问题'],
+    '鼠标': ['鼠标', 'mouse', '鼠标故障', '鼠标问题'],
+    '键盘': ['键盘', 'keyboard', '键盘故障', '键盘问题'],
+    '显示器': ['显示器', 'monitor', '屏幕', '显示器故障', '屏幕问题'],
+    '网络': ['网络', 'network', '网络故障', '网络问题', 'wifi'],
+    '蓝牙': ['蓝牙', 'bluetooth', '蓝牙故障', '蓝牙问题'],
+    '密码': ['密码', 'password', '修改密码', '密码问题'],
+    '登录': ['登录', 'login', '登录问题', '登入'],
+    '账户': ['账户', 'account', '账户问题', '账号'],
+    '软件': ['软件', '软件安装', '软件问题', '程序'],
+    'outlook': ['outlook', '邮件', '邮箱', '邮件客户端'],
+    'office': ['office', 'word', 'excel', 'powerpoint', '办公软件'],
+    '驱动': ['驱动', '驱动程序', '驱动问题'],
+    '系统更新': ['系统更新', 'windows更新', '更新问题'],
+    '数据': ['数据', '数据备份', '数据问题', '文件'],
+    '病毒': ['病毒', '杀毒', '病毒防护', '安全软件'],
+    '连接': ['连接', '连接问题', '连接故障'],
+    'USB': ['usb', 'usb连接', 'usb问题'],
+    '性能': ['性能', '性能问题', '速度慢'],
+    '内存': ['内存', '内存不足', '内存问题'],
+    '硬盘': ['硬盘', '硬盘问题', '存储问题'],
+    '音频': ['音频', '声音', '声音问题', '麦克风'],
+    '视频': ['视频', '视频问题', '摄像头'],
+    '电源': ['电源', '电源问题', '电池'],
+    '开机': ['开机', '开机问题', '启动'],
+    '关机': ['关机', '关机问题'],
+    '蓝屏': ['蓝屏', '蓝屏死机', '蓝屏错误'],
+    '死机': ['死机', '卡死', '系统死机'],
+    '卡顿': ['卡顿', '慢', '系统慢', '卡顿问题'],
+}
+
+OLD_TITLE_TERMS = {
+    '系统重置': ['重置', '重装', 'reset', 'windows'],
+    '打印机': ['打印机', 'printer', '打印'],
+    '鼠标': ['鼠标', 'mouse'],
+    '键盘': ['键盘', 'keyboard'],
+    '网络': ['网络', 'network', 'wifi'],
+    '密码': ['密码', 'password'],
+    '登录': ['登录', 'login'],
+    '蓝屏': ['蓝屏'],
+    '死机': ['死机'],
+    '卡顿': ['卡顿', '慢'],
+    '病毒': ['病毒', '杀毒', '安全'],
+    '数据': ['数据', '文件', '备份'],
+    '软件': ['软件', '程序', '应用'],
+    'outlook': ['outlook', '邮件', '邮箱'],
+    'office': ['office', 'word', 'excel', 'powerpoint', '办公'],
+    '驱动': ['驱动', '驱动程序'],
+    '音频': ['音频', '声音', '麦克风'],
+    '视频': ['视频', '摄像头'],
+    '电源': ['电源', '电池', '充电'],
+    '开机': ['开机', '启动'],
+    '关机': ['关机'],
+    'USB': ['usb'],
+    '蓝牙': ['蓝牙', 'bluetooth'],
+    '显示器': ['显示器', '屏幕', 'monitor'],
+    '内存': ['内存', 'ram'],
+    '硬盘': ['硬盘', '存储', '磁盘'],
+    '性能': ['性能', '速度'],
+    '连接': ['连接', '连接问题'],
+    '系统更新': ['更新', '补丁', '系统更新'],
+    '账户': ['账户', '账号', 'account'],
+}
+
+
+def old_extract_keywords(question):
+    """原 EnhancedRAGEngine._extract_keywords"""
+    keywords = []
+    question_lower = question.lower()
+    for greeting_keyword in OLD_GREETING_KEYWORDS:
+        if greeting_keyword == question_lower:
+            return ['greeting']
+    for identity_keyword in OLD_IDENTITY_KEYWORDS:
+        if identity_keyword == question_lower:
+            return ['identity']
+    for problem_type in OLD_PRIORITY_ORDER:
+        if problem_type in OLD_PROBLEM_TYPE_MAPPING:
+            for keyword in OLD_PROBLEM_TYPE_MAPPING[problem_type]:
+                if keyword in question_lower:
+                    keywords.append(problem_type)
+                    break
+    for keyword in OLD_GENERIC_KEYWORDS:
+        if keyword in question_lower:
+            keywords.append(keyword)
+            break
+    return keywords[:1]
+
+
+def old_search_terms(problem_type):
+    """原 EnhancedRAGEngine._get_search_terms_for_problem_type"""
+    return OLD_SEARCH_TERMS.get(problem_type, [problem_type])
+
+
+def old_is_strictly_relevant(title, keyword):
+    """原 EnhancedRAGEngine._is_strictly_relevant"""
+    title_lower = title.lower()
+    if not any(term in title_lower for term in old_search_terms(keyword)):
+        return False
+    if keyword in OLD_TITLE_TERMS:
+        return any(term in title_lower for term in OLD_TITLE_TERMS[keyword])
+    return True
+
+
+def old_is_strictly_relevant_strict(title, keyword):
+    """原 EnhancedRAGEngine._is_strictly_relevant_strict"""
+    return keyword.lower() in title.lower()
+
+
+@pytest.fixture(scope='module')
+def taxonomy():
+    return ProblemTaxonomy.from_file(TAXONOMY_PATH)
+
+
+def all_terms():
+    terms = set(OLD_GREETING_KEYWORDS) | set(OLD_IDENTITY_KEYWORDS) | set(OLD_GENERIC_KEYWORDS)
+    for mapping in (OLD_PROBLEM_TYPE_MAPPING, OLD_SEARCH_TERMS, OLD_TITLE_TERMS):
+        for problem_type, type_terms in mapping.items():
+            terms.add(problem_type)
+            terms.update(type_terms)
+    return sorted(terms)
+
+
+def sample_questions():
+    terms = all_terms()
+    questions = list(terms)
+    questions += [term.upper() for term in terms]
+    questions += [f'我的{term}怎么办' for term in terms]
+    # 同时命中多个问题类型（含通用关键词）的问题，两两组合覆盖所有优先级比较
+    questions += [f'{a}和{b}' for a, b in itertools.permutations(OLD_PRIORITY_ORDER + OLD_GENERIC_KEYWORDS, 2)]
+    questions += [
+        '', '   ', '你好啊', '你好，打印机坏了', 'Hello', 'HI', '你是谁？', '你是什么系统',
+        '电脑重装windows后蓝屏', 'Outlook 邮箱登录失败', '打开excel很慢', 'wifi连接不上',
+        '今天天气怎么样', 'usb设备不识别', '鼠标键盘都没反应', '系统更新后无法开机',
+    ]
+    return questions
+
+
+def test_extract_keywords_matches_old_implementation(taxonomy):
+    mismatches = [
+        (question, old_extract_keywords(question), taxonomy.matcher.extract_keywords(question))
+        for question in sample_questions()
+        if old_extract_keywords(question) != taxonomy.matcher.extract_keywords(question)
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('question, expected', [
+    ('你好', ['greeting']),
+    ('HELLO', ['greeting']),
+    ('你好啊', []),
+    ('你是谁', ['identity']),
+    ('你是什么系统', ['identity']),
+    ('这个系统是什么', ['系统']),
+    ('设备有问题', ['问题']),
+    ('今天天气怎么样', []),
+    ('重置密码', ['系统重置']),
+    ('打印机连不上网络', ['打印机']),
+])
+def test_extract_keywords_special_cases(taxonomy, question, expected):
+    assert taxonomy.matcher.extract_keywords(question) == expected
+
+
+def test_taxonomy_terms_match_old_tables(taxonomy):
+    assert list(taxonomy.type_bits) == OLD_PRIORITY_ORDER
+    for problem_type in OLD_PRIORITY_ORDER:
+        assert list(taxonomy.get_search_terms(problem_type)) == old_search_terms(problem_type)
+    assert list(taxonomy.get_search_terms('电脑')) == ['电脑']
+
+
+def sample_titles():
+    terms = all_terms()
+    titles = list(terms)
+    titles += [f'{term}常见问题处理' for term in terms]
+    # 任一词与各问题类型名称组合，覆盖"含检索词但缺少标题词"等情况
+    titles += [f'{a}{b}' for a, b in itertools.product(terms, OLD_PRIORITY_ORDER + ['windows', '安全', '备份'])]
+    titles += ['', 'Windows 11 安装指南', 'RESET 后无法启动', 'USB 接口供电不足', '公司 WIFI 使用说明']
+    return titles
+
+
+def test_title_relevance_matches_old_implementation(taxonomy):
+    keywords = OLD_PRIORITY_ORDER + OLD_GENERIC_KEYWORDS
+    mismatches = []
+    for title in sample_titles():
+        search_mask, relevant_mask = taxonomy.title_masks(title)
+        for keyword in keywords:
+            expected = old_is_strictly_relevant(title, keyword)
+            if taxonomy.is_title_relevant(keyword, title) != expected:
+                mismatches.append(('is_title_relevant', title, keyword))
+            bit = taxonomy.type_bits.get(keyword)
+            if bit is not None:
+                if bool(relevant_mask >> bit & 1) != expected:
+                    mismatches.append(('relevant_mask', title, keyword))
+                has_search_term = any(term in title.lower() for term in old_search_terms(keyword))
+                if bool(search_mask >> bit & 1) != has_search_term:
+                    mismatches.append(('search_mask', title, keyword))
+    assert mismatches == []
+
+
+def test_strict_title_relevance_matches_old_implementation():
+    from knowledge_features import KnowledgeFeatures
+
+    taxonomy = ProblemTaxonomy.from_file(TAXONOMY_PATH)
+    for title in sample_titles()[:2000]:
+        features = KnowledgeFeatures(title, '', taxonomy)
+        for keyword in OLD_PRIORITY_ORDER + OLD_GENERIC_KEYWORDS:
+            assert (keyword.lower() in features.title_lower) == old_is_strictly_relevant_strict(title, keyword)
+            assert features.is_title_relevant(keyword) == old_is_strictly_relevant(title, keyword)
+
+
+def test_aho_corasick_finds_all_occurrences():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+    text = 'ushers'
+    expected = sorted((i, i + len(term), term) for term in ['he', 'she', 'his', 'hers']
+                      for i in range(len(text)) if text.startswith(term, i))
+    assert sorted(automaton.iter_matches(text)) == expected
+
+
+def test_keyword_extractor_matches_substring_scan():
+    keywords = [(1, '打印机'), (2, '打印'), (3, 'wifi'), (4, '网络连接'), (5, '连接')]
+    extractor = KeywordExtractor(keywords)
+    text = '打印机无法通过wifi网络连接'
+    expected = [(keyword_id, keyword) for keyword_id, keyword in keywords if keyword in text.lower()]
+    assert sorted(extractor.extract(text, limit=10)) == sorted(expected)
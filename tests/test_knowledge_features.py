@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识条目特征缓存测试：按知识库版本号命中、内容变化后重新计算、双字位图查找与子串查找一致
+"""
+
+import os
+
+from knowledge_features import KnowledgeFeatureCache, KnowledgeFeatures
+from problem_taxonomy import ProblemTaxonomy
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'problem_taxonomy.json')
+
+
+class TrackedRow(dict):
+    """记录标题、内容是否被读取的检索结果"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.text_reads = 0
+
+    def __getitem__(self, key):
+        if key in ('title', 'content'):
+            self.text_reads += 1
+        return super().__getitem__(key)
+
+
+def test_same_version_hits_without_reading_text():
+    taxonomy = ProblemTaxonomy.from_file(TAXONOMY_PATH)
+    cache = KnowledgeFeatureCache()
+    first = cache.get(TrackedRow(id=1, title='打印机脱机', content='检查打印机电源'), taxonomy, kb_version=7)
+
+    row = TrackedRow(id=1, title='打印机脱机', content='检查打印机电源')
+    assert cache.get(row, taxonomy, kb_version=7) is first
+    assert row.text_reads == 0
+    assert cache.stats()['hits'] == 1
+
+
+def test_version_change_compares_content():
+    taxonomy = ProblemTaxonomy.from_file(TAXONOMY_PATH)
+    cache = KnowledgeFeatureCache()
+    first = cache.get({'id': 1, 'title': '打印机脱机', 'content': '检查电源'}, taxonomy, kb_version=7)
+
+    # 其他条目修改导致版本变化，本条内容未变：沿用特征
+    assert cache.get({'id': 1, 'title': '打印机脱机', 'content': '检查电源'}, taxonomy, kb_version=8) is first
+
+    # 内容变化：重新计算
+    changed = cache.get({'id': 1, 'title': '鼠标失灵', 'content': '更换电池'}, taxonomy, kb_version=9)
+    assert changed is not first
+    assert changed.title_lower == '鼠标失灵' and changed.content_contains('电池')
+    assert changed.is_title_relevant('鼠标') and not changed.is_title_relevant('打印机')
+
+    # 版本号未知时每次比较内容
+    assert cache.get({'id': 1, 'title': '鼠标失灵', 'content': '更换电池'}, taxonomy) is changed
+    assert cache.get({'id': 1, 'title': '键盘失灵', 'content': '更换电池'}, taxonomy) is not changed
+
+
+def test_version_moved_between_fetch_and_score():
+    taxonomy = ProblemTaxonomy.from_file(TAXONOMY_PATH)
+    cache = KnowledgeFeatureCache()
+    old_row = {'id': 1, 'title': '打印机脱机', 'content': '检查电源'}
+    new_row = {'id': 1, 'title': '鼠标失灵', 'content': '更换电池'}
+
+    # 行在版本 7 读取，打分前条目被修改、版本变为 8：特征按读取时的版本 7 记录
+    old = cache.get(old_row, taxonomy, kb_version=7)
+    # 版本 8 读取到的新内容不会命中版本 7 的特征
+    new = cache.get(new_row, taxonomy, kb_version=8)
+    assert new is not old and new.title_lower == '鼠标失灵'
+    assert cache.get(new_row, taxonomy, kb_version=8) is new
+
+    # 之后再用版本 7 读取的旧行打分，按摘要重新计算，不把旧特征记为版本 8
+    assert cache.get(old_row, taxonomy, kb_version=7).title_lower == '打印机脱机'
+    assert cache.get(new_row, taxonomy, kb_version=8).title_lower == '鼠标失灵'
+
+
+def test_taxonomy_change_recomputes_masks():
+    taxonomy = ProblemTaxonomy.from_file(TAXONOMY_PATH)
+    cache = KnowledgeFeatureCache()
+    row = {'id': 1, 'title': 'VPN 连接失败', 'content': ''}
+    assert not cache.get(row, taxonomy, kb_version=1).has_search_term('网络')
+
+    # 词表热加载后 "网络" 类型的检索词包含 vpn
+    reloaded = ProblemTaxonomy({'problem_types': [{'name': '网络', 'match_terms': ['vpn'], 'search_terms': ['vpn']}]})
+    features = cache.get(row, reloaded, kb_version=1)
+    assert features.taxonomy is reloaded and features.has_search_term('网络')
+
+
+def test_content_contains_matches_substring_search():
+    taxonomy = ProblemTaxonomy({})
+    content = '请检查USB接口是否松动，并尝试更换接口后重启电脑。Printer driver reinstall.'
+    features = KnowledgeFeatures('', content, taxonomy)
+    lowered = content.lower()
+    words = {lowered[i:j] for i in range(len(lowered)) for j in range(i, min(len(lowered), i + 6) + 1)}
+    words |= {'打印机', 'usb口', 'driverx', 'xyz', '接口后重启电脑。p'}
+    assert all(features.content_contains(word) == (word in lowered) for word in words)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索结果缓存测试：按版本号失效，以及返回结果所属的知识库版本号
+"""
+
+from search_cache import VersionedResultCache
+
+
+class FakeKnowledgeBase:
+    def __init__(self):
+        self.version = 1
+        self.queries = 0
+
+    def get_version(self):
+        return self.version
+
+
+def test_version_change_clears_entries():
+    kb = FakeKnowledgeBase()
+    cache = VersionedResultCache(kb.get_version, max_entries=10, check_interval=0)
+    assert cache.get_or_compute('q', lambda: 'v1') == 'v1'
+    assert cache.get_or_compute('q', lambda: 'other') == 'v1'
+    kb.version = 2
+    assert cache.get_or_compute('q', lambda: 'v2') == 'v2'
+
+
+def test_versioned_result_carries_fetch_version():
+    kb = FakeKnowledgeBase()
+    cache = VersionedResultCache(kb.get_version, max_entries=10, check_interval=60)
+    assert cache.get_or_compute_versioned('q', lambda: 'rows') == ('rows', 1)
+
+    # 读取之后版本号才变化：命中的结果仍标记为读取时的版本
+    kb.version = 2
+    assert cache.get_or_compute_versioned('q', lambda: 'new rows') == ('rows', 1)
+
+
+def test_versioned_result_uses_database_version_not_stale_copy():
+    kb = FakeKnowledgeBase()
+    cache = VersionedResultCache(kb.get_version, max_entries=10, check_interval=60)
+    assert cache.current_version() == 1
+
+    # 本进程记录的版本号仍为 1，数据库中已是 2：结果属于版本 2
+    kb.version = 2
+    assert cache.current_version() == 1
+    assert cache.get_or_compute_versioned('q', lambda: 'rows') == ('rows', 2)
+
+
+def test_version_moved_during_fetch_is_unknown():
+    kb = FakeKnowledgeBase()
+    cache = VersionedResultCache(kb.get_version, max_entries=10, check_interval=60)
+
+    def fetch():
+        kb.version += 1  # 读取期间知识库被修改
+        return 'rows'
+
+    assert cache.get_or_compute_versioned('q', fetch) == ('rows', None)
+    assert cache.get_or_compute_versioned('q', lambda: 'other') == ('rows', None)
+
+
+def test_disabled_cache_still_reports_version():
+    kb = FakeKnowledgeBase()
+    cache = VersionedResultCache(kb.get_version, max_entries=0)
+    assert cache.get_or_compute_versioned('q', lambda: 'rows') == ('rows', 1)
+    assert cache.get_or_compute('q', lambda: 'again') == 'again'
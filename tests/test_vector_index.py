@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量索引测试
+
+- IVF、int8 量化重打分在默认参数下的召回率（以全量精确扫描为基准）
+- 共享索引的后台构建与增量合并
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from config import Config
+from vector_index import KnowledgeVectorIndex, LiveVectorIndex, SharedVectorIndexHolder, normalize_rows
+
+DIM = 64
+CLUSTERS = 50
+COUNT = 10000
+TOP_K = 10
+MIN_RECALL = 0.9
+
+
+def clustered_vectors(rng, count, centers, noise):
+    labels = rng.integers(0, centers.shape[0], count)
+    return normalize_rows(centers[labels] + noise * rng.standard_normal((count, centers.shape[1])).astype(np.float32))
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(42)
+    centers = normalize_rows(rng.standard_normal((CLUSTERS, DIM)).astype(np.float32))
+    titles = clustered_vectors(rng, COUNT, centers, 0.15)
+    contents = normalize_rows(titles + 0.1 * rng.standard_normal((COUNT, DIM)).astype(np.float32))
+    queries = clustered_vectors(rng, 200, centers, 0.15)
+    index = KnowledgeVectorIndex.from_embeddings(np.arange(COUNT) + 1, titles, contents, version=1)
+    return index, queries
+
+
+def recall(index, queries, **search_kwargs):
+    hits = 0
+    total = 0
+    for query in queries:
+        exact = {r['id'] for r in index.search(query, TOP_K, threshold=-1.0, exact=True)}
+        approx = {r['id'] for r in index.search(query, TOP_K, threshold=-1.0, **search_kwargs)}
+        hits += len(exact & approx)
+        total += len(exact)
+    return hits / total
+
+
+def test_exact_search_matches_brute_force(data):
+    index, queries = data
+    for query in queries[:20]:
+        scores = index.matrix @ normalize_rows(query)
+        expected = [int(index.ids[i]) for i in np.argsort(-scores, kind='stable')[:TOP_K]]
+        assert [r['id'] for r in index.search(query, TOP_K, threshold=-1.0, exact=True)] == expected
+
+
+def test_ivf_recall_at_default_nprobe(data):
+    index, queries = data
+    ivf = index.build_ivf(Config.IVF_NLIST)
+    assert ivf.centroids.shape[0] > Config.IVF_NPROBE  # 确实只探测了部分列表
+    assert sorted(ivf.ids.tolist()) == sorted(index.ids.tolist())
+    assert recall(ivf, queries, nprobe=Config.IVF_NPROBE) >= MIN_RECALL
+    assert ivf.evaluate_recall(Config.IVF_NPROBE, top_k=TOP_K) >= MIN_RECALL
+
+
+def test_quantized_rescore_recall(data):
+    index, queries = data
+    quantized = KnowledgeVectorIndex(index.ids, index.matrix, index.version).quantize()
+    assert recall(quantized, queries, rescore_factor=Config.VECTOR_INDEX_RESCORE_FACTOR) >= MIN_RECALL
+
+
+def test_ivf_quantized_rescore_recall(data):
+    index, queries = data
+    ivf = index.build_ivf(Config.IVF_NLIST).quantize()
+    assert recall(ivf, queries, nprobe=Config.IVF_NPROBE,
+                  rescore_factor=Config.VECTOR_INDEX_RESCORE_FACTOR) >= MIN_RECALL
+
+
+def test_rescored_scores_are_exact(data):
+    index, queries = data
+    ivf = index.build_ivf(Config.IVF_NLIST).quantize()
+    matrix = {int(i): row for i, row in zip(ivf.ids, np.asarray(ivf.matrix))}
+    for query in queries[:20]:
+        for result in ivf.search(query, TOP_K, threshold=-1.0, nprobe=Config.IVF_NPROBE):
+            assert result['similarity'] == pytest.approx(float(matrix[result['id']] @ normalize_rows(query)), abs=1e-6)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, '等待超时'
+        time.sleep(0.01)
+
+
+class FakeKnowledgeBase:
+    """知识库桩：版本号、全量构建与增量变更，构建可阻塞以模拟耗时"""
+
+    def __init__(self, count=50):
+        rng = np.random.default_rng(0)
+        self.vectors = {i + 1: rng.standard_normal(8).astype(np.float32) for i in range(count)}
+        self.changes = []  # [(change_id, knowledge_id)]
+        self.version = 1
+        self.release = threading.Event()
+        self.builds = 0
+
+    def build(self, version):
+        self.builds += 1
+        assert self.release.wait(5)
+        ids = sorted(self.vectors)
+        matrix = np.vstack([self.vectors[i] for i in ids])
+        index = KnowledgeVectorIndex.from_embeddings(ids, matrix, matrix, version)
+        index.change_id = self.changes[-1][0] if self.changes else 0
+        return index
+
+    def changes_since(self, change_id):
+        changed = [knowledge_id for cid, knowledge_id in self.changes if cid > change_id]
+        if not changed:
+            return None
+        ids = sorted(set(changed))
+        matrix = np.vstack([self.vectors[i] for i in ids])
+        return self.changes[-1][0], KnowledgeVectorIndex.from_embeddings(ids, matrix, matrix), []
+
+    def update(self, knowledge_id):
+        self.vectors[knowledge_id] = -self.vectors[knowledge_id]
+        self.changes.append((len(self.changes) + 1, knowledge_id))
+        self.version += 1
+
+
+def make_holder(tmp_path, kb, **kwargs):
+    return SharedVectorIndexHolder(str(tmp_path), version_fn=lambda: kb.version, builder=kb.build,
+                                   changes_fn=kb.changes_since, check_interval=0, **kwargs)
+
+
+def test_shared_holder_builds_in_background(tmp_path):
+    kb = FakeKnowledgeBase()
+    holder = make_holder(tmp_path, kb)
+    assert holder.get() is None  # 构建中不阻塞
+    assert holder.get() is None
+    kb.release.set()
+    wait_for(lambda: holder.get() is not None)
+    assert len(holder.get()) == 50
+    assert kb.builds == 1
+
+    # 其他进程直接映射已写出的快照，不再构建
+    other = make_holder(tmp_path, kb)
+    assert len(other.get()) == 50
+    assert kb.builds == 1
+
+
+def test_shared_holder_serves_current_index_while_compacting(tmp_path, monkeypatch):
+    kb = FakeKnowledgeBase()
+    kb.release.set()
+    holder = make_holder(tmp_path, kb, compact_threshold=3)
+    wait_for(lambda: holder.get() is not None)
+    base = holder.get().base
+
+    compacting = threading.Event()
+    finish = threading.Event()
+    compacted = LiveVectorIndex.compacted
+
+    def slow_compacted(live, version):
+        compacting.set()
+        assert finish.wait(5)
+        return compacted(live, version)
+
+    monkeypatch.setattr(LiveVectorIndex, 'compacted', slow_compacted)
+    for knowledge_id in (1, 2, 3):
+        kb.update(knowledge_id)
+    live = holder.get()
+    assert compacting.wait(5)
+    assert live.base is base and live.pending == 3  # 合并期间继续使用快照 + 增量
+
+    kb.update(4)  # 合并期间的新变更
+    live = holder.get()
+    assert live.base is base and live.pending == 4
+    hit = live.search(kb.vectors[4], 1)[0]
+    assert hit['id'] == 4 and hit['similarity'] == pytest.approx(1.0, abs=1e-5)
+
+    finish.set()
+    wait_for(lambda: holder.get().base is not base)
+    live = holder.get()
+    assert live.base.change_id == 3 and live.pending == 1
+    for knowledge_id in (1, 2, 3, 4):
+        hit = live.search(kb.vectors[knowledge_id], 1)[0]
+        assert hit['id'] == knowledge_id and hit['similarity'] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_shared_holder_backs_off_after_failed_build(tmp_path):
+    kb = FakeKnowledgeBase()
+    kb.release.set()
+    build = kb.build
+    failures = [RuntimeError('数据库不可用')]
+
+    def flaky_build(version):
+        if failures:
+            kb.builds += 1
+            raise failures.pop()
+        return build(version)
+
+    holder = SharedVectorIndexHolder(str(tmp_path), version_fn=lambda: kb.version, builder=flaky_build,
+                                     changes_fn=kb.changes_since, check_interval=0, retry_interval=0.3)
+    assert holder.get() is None
+    wait_for(lambda: not holder._building)
+    assert holder.get() is None
+    assert kb.builds == 1  # 重试间隔内不再构建
+
+    time.sleep(0.35)
+    holder.get()
+    wait_for(lambda: holder.get() is not None)
+    assert kb.builds == 2 and len(holder.get()) == 50
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识内容分段
+
+按句子边界把知识内容切分为不超过 max_chars 个字符的段落，返回段落在原文中的
+[start, end) 偏移，段落文本由调用方按偏移从原文截取。
+"""
+
+import re
+from typing import List, Tuple
+
+# 句子：以中英文句末标点、分号或换行结尾
+_SENTENCE_PATTERN = re.compile(r'[^。！？!?；;\n]+[。！？!?；;\n]*|[。！？!?；;\n]+')
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """切分句子，去掉首尾空白，空句子丢弃"""
+    spans = []
+    for match in _SENTENCE_PATTERN.finditer(text):
+        start, end = match.span()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+def split_passages(text: str, max_chars: int = 200) -> List[Tuple[int, int]]:
+    """把文本切分为段落，返回 [(start, end), ...]
+
+    相邻句子合并到同一段落直到超过 max_chars；单个句子超长时按 max_chars 硬切分。
+    """
+    passages = []
+    current_start = current_end = None
+
+    for start, end in _sentence_spans(text or ''):
+        if end - start > max_chars:
+            if current_start is not None:
+                passages.append((current_start, current_end))
+                current_start = None
+            for offset in range(start, end, max_chars):
+                passages.append((offset, min(offset + max_chars, end)))
+            continue
+
+        if current_start is not None and end - current_start <= max_chars:
+            current_end = end
+        else:
+            if current_start is not None:
+                passages.append((current_start, current_end))
+            current_start, current_end = start, end
+
+    if current_start is not None:
+        passages.append((current_start, current_end))
+    return passages
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库向量索引 - 预归一化float32矩阵 + 矩阵向量乘法检索
+
+索引以 .npy 文件持久化到磁盘，所有工作进程以只读 mmap 方式共享同一份数据，
+知识库版本号变化时原子地切换到新版本的文件。
+
+知识库增删改不触发全量重建：变更记录在 kb_change_log 中，各进程把变更
+作为内存增量（新增/替换的向量 + 被删除条目的墓碑）叠加在快照之上，
+增量积累到一定数量后合并写出新快照。
+
+知识库规模较大时可选用 IVF-flat 近似检索：先用球面k-means把条目划分到
+nlist 个倒排列表，查询时只对最接近的 nprobe 个列表内的条目精确打分。
+
+还可以额外保存按行缩放的 int8 量化矩阵：候选打分只扫描常驻内存的 int8 矩阵，
+前 top_k * rescore_factor 个候选再用 float32 行向量精确重打分，float32 矩阵
+只有被访问到的行才会从 mmap 文件读入内存。
+"""
+
+import os
+import json
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，退化为进程内锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 标题与内容的相似度权重（与原 _vector_search 保持一致）
+TITLE_WEIGHT = 0.8
+CONTENT_WEIGHT = 0.2
+
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = 'build.lock'
+
+BACKEND_BRUTE = 'brute'
+BACKEND_IVF = 'ivf'
+
+# k-means 训练参数：训练样本上限与分块大小（控制内存占用）
+IVF_TRAIN_SAMPLE = 50000
+IVF_ASSIGN_CHUNK = 8192
+
+# int8 量化矩阵分块反量化打分的行数（控制临时内存）
+QUANTIZED_SCORE_CHUNK = 4096
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """按行L2归一化，零向量保持为零"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        norm = np.linalg.norm(matrix)
+        return matrix / norm if norm > 0 else matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class KnowledgeVectorIndex:
+    """知识库向量索引
+
+    每个知识条目保存一行 TITLE_WEIGHT * 标题向量 + CONTENT_WEIGHT * 内容向量
+    （两者均已归一化），因此查询向量归一化后一次矩阵向量乘法即可得到与
+    原逐条余弦相似度加权完全相同的分数。索引只保存条目ID，标题和内容
+    由调用方按需从数据库读取。
+    """
+
+    def __init__(self, ids, matrix: np.ndarray, version: Optional[int] = None,
+                 centroids: Optional[np.ndarray] = None, list_offsets: Optional[np.ndarray] = None,
+                 change_id: int = 0):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = matrix
+        self.version = version
+        # 快照已包含的最后一条知识库变更记录ID
+        self.change_id = change_id
+        # int8 量化矩阵及每行的缩放系数（未量化时为 None）
+        self.quantized = None
+        self.scales = None
+        # IVF 结构：矩阵按倒排列表重排，第 i 个列表对应行 list_offsets[i]:list_offsets[i+1]
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+
+    def __len__(self):
+        return int(self.ids.shape[0])
+
+    @classmethod
+    def from_embeddings(cls, ids, title_embeddings, content_embeddings, version=None):
+        """由标题/内容向量构建索引"""
+        if len(ids) == 0:
+            return cls([], np.zeros((0, 0), dtype=np.float32), version)
+        title_matrix = normalize_rows(title_embeddings)
+        content_matrix = normalize_rows(content_embeddings)
+        matrix = TITLE_WEIGHT * title_matrix + CONTENT_WEIGHT * content_matrix
+        return cls(ids, np.ascontiguousarray(matrix, dtype=np.float32), version)
+
+    @classmethod
+    def build_from_rows(cls, rows: List[Dict[str, Any]], encode_fn: Callable[[List[str]], np.ndarray], version=None):
+        """从带 embedding 字段的知识条目构建索引
+
+        优先使用数据库中已存储的向量，缺失的标题/内容向量再批量编码补齐。
+        """
+        from embedding_codec import decode_embedding
+
+        if not rows:
+            return cls.from_embeddings([], None, None, version)
+
+        title_vectors = [None] * len(rows)
+        content_vectors = [None] * len(rows)
+        for i, row in enumerate(rows):
+            title_vectors[i], content_vectors[i] = decode_embedding(row.get('embedding'))
+
+        # 以已存储向量的主流维度为准，维度不符的（如更换过模型）重新编码
+        dims = [v.shape[0] for v in content_vectors if v is not None]
+        dim = max(set(dims), key=dims.count) if dims else None
+        for vectors in (title_vectors, content_vectors):
+            for i, vec in enumerate(vectors):
+                if vec is not None and vec.shape[0] != dim:
+                    vectors[i] = None
+
+        missing_titles = [i for i, v in enumerate(title_vectors) if v is None]
+        missing_contents = [i for i, v in enumerate(content_vectors) if v is None]
+        if missing_titles or missing_contents:
+            texts = [rows[i]['title'] for i in missing_titles] + [rows[i]['content'] for i in missing_contents]
+            encoded = encode_fn(texts)
+            for offset, i in enumerate(missing_titles):
+                title_vectors[i] = encoded[offset]
+            for offset, i in enumerate(missing_contents):
+                content_vectors[i] = encoded[len(missing_titles) + offset]
+            logger.info(f"向量索引构建时补齐了 {len(texts)} 个缺失的向量")
+
+        return cls.from_embeddings(
+            [row['id'] for row in rows],
+            np.vstack(title_vectors),
+            np.vstack(content_vectors),
+            version
+        )
+
+    def build_ivf(self, nlist: int = 0, iterations: int = 10, seed: int = 0) -> 'KnowledgeVectorIndex':
+        """训练 IVF 倒排列表，返回按列表重排后的新索引
+
+        nlist 为 0 时按 4 * sqrt(N) 自动选取。打分用的仍是完整的 float32 行向量，
+        因此被探测列表中的条目得到的是精确分数，近似只来自未被探测的列表。
+        """
+        count = len(self)
+        if count == 0:
+            return self
+        if nlist <= 0:
+            nlist = int(4 * np.sqrt(count))
+        nlist = max(1, min(nlist, count))
+
+        start_time = time.time()
+        rng = np.random.default_rng(seed)
+        data = normalize_rows(self.matrix)
+        sample = data
+        if count > IVF_TRAIN_SAMPLE:
+            sample = data[rng.choice(count, IVF_TRAIN_SAMPLE, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = _assign_lists(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            # 空列表重新随机取一个样本点作为中心
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        index = self._bucketed(self.ids, self.matrix, np.ascontiguousarray(centroids, dtype=np.float32),
+                               self.version, self.change_id)
+        logger.info(f"IVF倒排列表训练完成，共 {count} 条，{nlist} 个列表，耗时: {time.time() - start_time:.2f}秒")
+        return index
+
+    @classmethod
+    def _bucketed(cls, ids, matrix, centroids, version, change_id):
+        """按已有中心把各行分配到倒排列表，并按列表重排"""
+        nlist = centroids.shape[0]
+        assignments = _assign_lists(normalize_rows(matrix), centroids)
+        order = np.argsort(assignments, kind='stable')
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignments, minlength=nlist))
+        return cls(np.asarray(ids)[order], np.ascontiguousarray(matrix[order]), version,
+                   centroids, list_offsets, change_id)
+
+    def quantize(self) -> 'KnowledgeVectorIndex':
+        """生成按行缩放的 int8 量化矩阵：row ≈ quantized[row] * scales[row]"""
+        if len(self) == 0:
+            return self
+        matrix = np.asarray(self.matrix, dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        self.quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        self.scales = scales.astype(np.float32)
+        return self
+
+    def merged(self, overlay: 'KnowledgeVectorIndex', removed, version: int, change_id: int) -> 'KnowledgeVectorIndex':
+        """去掉 removed 中的条目并追加 overlay 的行，返回新索引（IVF 索引沿用原有中心）"""
+        keep = ~np.isin(self.ids, np.fromiter(removed, dtype=np.int64, count=len(removed)))
+        ids, matrix = _concat_rows(self.ids[keep], np.asarray(self.matrix)[keep], overlay.ids, overlay.matrix)
+        if self.centroids is not None and len(ids) > 0:
+            index = self._bucketed(ids, matrix, self.centroids, version, change_id)
+        else:
+            index = KnowledgeVectorIndex(ids, np.ascontiguousarray(matrix, dtype=np.float32), version, change_id=change_id)
+        return index.quantize() if self.quantized is not None else index
+
+    def search(self, query_embedding, top_k: int, threshold: float = 0.0,
+               nprobe: Optional[int] = None, rescore_factor: int = 4, exact: bool = False) -> List[Dict[str, Any]]:
+        """检索与查询向量最相似的 top_k 个条目（分数需大于 threshold），返回 id 与 similarity
+
+        IVF 索引只对最接近的 nprobe 个倒排列表打分；nprobe 为 None 或不小于列表数时
+        退化为全量扫描。有量化矩阵时先用 int8 打分取 top_k * rescore_factor 个候选，
+        再用 float32 精确重打分。exact=True 时忽略 IVF 和量化，全量精确打分。
+        """
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        rows = None
+        nlist = 0 if self.centroids is None else self.centroids.shape[0]
+        if not exact and nprobe is not None and 0 < nprobe < nlist:
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.concatenate([
+                np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in probe
+            ])
+
+        if not exact and self.quantized is not None:
+            approx = self._quantized_scores(query, rows)
+            shortlist = _top_indices(approx, top_k * max(rescore_factor, 1))
+            rows = shortlist if rows is None else rows[shortlist]
+            rows = np.sort(rows)  # 按行号顺序读取 mmap 文件
+            scores = np.asarray(self.matrix[rows]) @ query
+        elif rows is not None:
+            scores = self.matrix[rows] @ query
+        else:
+            scores = self.matrix @ query
+
+        results = []
+        for candidate in _top_indices(scores, top_k):
+            score = float(scores[candidate])
+            if score <= threshold:
+                break
+            row = candidate if rows is None else rows[candidate]
+            results.append({'id': int(self.ids[row]), 'similarity': score})
+        return results
+
+    def _quantized_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """用 int8 量化矩阵计算近似分数，分块反量化以限制临时内存"""
+        quantized = self.quantized if rows is None else self.quantized[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        scores = np.empty(quantized.shape[0], dtype=np.float32)
+        for start in range(0, quantized.shape[0], QUANTIZED_SCORE_CHUNK):
+            chunk = quantized[start:start + QUANTIZED_SCORE_CHUNK].astype(np.float32)
+            scores[start:start + QUANTIZED_SCORE_CHUNK] = chunk @ query
+        return scores * scales
+
+    def evaluate_recall(self, nprobe: Optional[int], top_k: int = 10, sample_size: int = 50,
+                        rescore_factor: int = 4, seed: int = 0) -> float:
+        """以全量精确扫描为基准，用索引中随机抽取的条目作查询，估算当前检索参数下的 recall@top_k"""
+        if len(self) == 0 or (self.centroids is None and self.quantized is None):
+            return 1.0
+
+        rng = np.random.default_rng(seed)
+        queries = rng.choice(len(self), min(sample_size, len(self)), replace=False)
+        hits = 0
+        total = 0
+        for row in queries:
+            query = np.asarray(self.matrix[row])
+            exact = {r['id'] for r in self.search(query, top_k, threshold=-1.0, exact=True)}
+            approx = {r['id'] for r in self.search(query, top_k, threshold=-1.0, nprobe=nprobe,
+                                                   rescore_factor=rescore_factor)}
+            hits += len(exact & approx)
+            total += len(exact)
+        return hits / total if total else 1.0
+
+    def save(self, directory: str, version: int) -> Dict[str, Any]:
+        """将索引保存为指定版本的 .npy 文件，返回清单信息"""
+        manifest = {
+            'version': version,
+            'change_id': self.change_id,
+            'matrix': f'kb_vectors_v{version}.npy',
+            'ids': f'kb_ids_v{version}.npy',
+            'count': len(self)
+        }
+        arrays = [(manifest['matrix'], self.matrix), (manifest['ids'], self.ids)]
+        if self.centroids is not None:
+            manifest['centroids'] = f'kb_centroids_v{version}.npy'
+            manifest['list_offsets'] = f'kb_lists_v{version}.npy'
+            arrays += [(manifest['centroids'], self.centroids), (manifest['list_offsets'], self.list_offsets)]
+        if self.quantized is not None:
+            manifest['quantized'] = f'kb_int8_v{version}.npy'
+            manifest['scales'] = f'kb_scales_v{version}.npy'
+            arrays += [(manifest['quantized'], self.quantized), (manifest['scales'], self.scales)]
+
+        for file_name, array in arrays:
+            tmp_path = os.path.join(directory, f'.{file_name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, file_name))
+        return manifest
+
+    @classmethod
+    def load(cls, directory: str, manifest: Dict[str, Any]):
+        """以只读 mmap 方式加载索引文件"""
+        matrix = np.load(os.path.join(directory, manifest['matrix']), mmap_mode='r')
+        ids = np.load(os.path.join(directory, manifest['ids']))
+        centroids = list_offsets = None
+        if manifest.get('centroids'):
+            centroids = np.load(os.path.join(directory, manifest['centroids']))
+            list_offsets = np.load(os.path.join(directory, manifest['list_offsets']))
+        index = cls(ids, matrix, manifest['version'], centroids, list_offsets, manifest['change_id'])
+        if manifest.get('quantized'):
+            index.quantized = np.load(os.path.join(directory, manifest['quantized']), mmap_mode='r')
+            index.scales = np.load(os.path.join(directory, manifest['scales']))
+        return index
+
+
+def _concat_rows(ids_a, matrix_a, ids_b, matrix_b):
+    """拼接两组 (ids, matrix)，任一组为空时直接返回另一组"""
+    if len(ids_b) == 0:
+        return ids_a, matrix_a
+    if len(ids_a) == 0:
+        return ids_b, matrix_b
+    return np.concatenate([ids_a, ids_b]), np.vstack([matrix_a, matrix_b])
+
+
+def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """分数最高的 k 个下标，按分数降序"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def _assign_lists(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """把每行分配到内积最大的中心，分块计算避免一次性生成 N x nlist 矩阵"""
+    assignments = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], IVF_ASSIGN_CHUNK):
+        chunk = data[start:start + IVF_ASSIGN_CHUNK]
+        assignments[start:start + IVF_ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+class LiveVectorIndex:
+    """快照 + 内存增量
+
+    base 为 mmap 映射的快照；overlay 保存快照之后新增或修改过的条目向量；
+    removed 为墓碑集合（已删除或已被 overlay 替换的条目ID），查询时从快照结果中剔除。
+    对象创建后不再修改，应用变更时返回新对象，查询线程无需加锁。
+    """
+
+    def __init__(self, base: KnowledgeVectorIndex, overlay: Optional[KnowledgeVectorIndex] = None,
+                 removed=frozenset(), change_id: Optional[int] = None):
+        self.base = base
+        self.overlay = overlay if overlay is not None else KnowledgeVectorIndex([], np.zeros((0, 0), dtype=np.float32))
+        self.removed = frozenset(removed)
+        self.change_id = base.change_id if change_id is None else change_id
+        masked = int(np.isin(base.ids, list(self.removed)).sum()) if self.removed else 0
+        self._count = len(base) - masked + len(self.overlay)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def pending(self) -> int:
+        """快照之后累计变更的条目数"""
+        return len(self.removed)
+
+    def apply(self, upserts: KnowledgeVectorIndex, deleted_ids, change_id: int) -> 'LiveVectorIndex':
+        """应用一批变更：upserts 中的条目新增或替换，deleted_ids 中的条目打墓碑"""
+        changed = set(upserts.ids.tolist()) | set(deleted_ids)
+        keep = ~np.isin(self.overlay.ids, list(changed))
+        ids, matrix = _concat_rows(self.overlay.ids[keep], self.overlay.matrix[keep], upserts.ids, upserts.matrix)
+        return LiveVectorIndex(self.base, KnowledgeVectorIndex(ids, matrix), self.removed | changed, change_id)
+
+    def compacted(self, version: int) -> KnowledgeVectorIndex:
+        """把增量合并进快照"""
+        return self.base.merged(self.overlay, self.removed, version, self.change_id)
+
+    def search(self, query_embedding, top_k: int, threshold: float = 0.0,
+               nprobe: Optional[int] = None, rescore_factor: int = 4) -> List[Dict[str, Any]]:
+        """与 KnowledgeVectorIndex.search 相同，结果合并快照与增量"""
+        if not self.removed:
+            return self.base.search(query_embedding, top_k, threshold, nprobe, rescore_factor)
+
+        # 多取墓碑数量的结果，保证剔除后仍有 top_k 条
+        hits = [hit for hit in self.base.search(query_embedding, top_k + len(self.removed), threshold,
+                                                nprobe, rescore_factor)
+                if hit['id'] not in self.removed]
+        hits += self.overlay.search(query_embedding, top_k, threshold)
+        hits.sort(key=lambda hit: hit['similarity'], reverse=True)
+        return hits[:top_k]
+
+
+class SharedVectorIndexHolder:
+    """跨工作进程共享的向量索引
+
+    每隔 check_interval 秒读取一次知识库版本号；版本变化时：
+    1. 磁盘上有更新的快照则映射它，没有任何快照时由拿到文件锁的进程构建；
+    2. 通过 changes_fn 读取快照之后的变更并叠加为内存增量；
+    3. 增量条目数达到 compact_threshold 时合并写出新快照，其余进程下次检查时映射。
+
+    全量构建和增量合并在后台线程进行，完成前继续使用当前索引（首次构建完成前返回 None），查询不会等待；
+    失败后继续使用当前索引，间隔 retry_interval 秒再重试。
+    """
+
+    def __init__(self, directory: str, version_fn: Callable[[], int],
+                 builder: Callable[[int], KnowledgeVectorIndex],
+                 changes_fn: Callable[[int], Optional[tuple]], check_interval: int = 5,
+                 backend: str = BACKEND_BRUTE, quantize: bool = False, compact_threshold: int = 1000,
+                 on_snapshot: Optional[Callable[[int], None]] = None, retry_interval: int = 60):
+        self.directory = directory
+        self.backend = backend
+        self.quantize = quantize
+        self._version_fn = version_fn
+        self._builder = builder
+        self._changes_fn = changes_fn
+        self._check_interval = check_interval
+        self._compact_threshold = compact_threshold
+        self._on_snapshot = on_snapshot
+        self._retry_interval = retry_interval
+        self._index = None
+        self._version = None
+        self._last_check = 0.0
+        self._building = False
+        self._failed_at = 0.0  # 最近一次生成快照失败的时间
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """本进程修改了知识库，下次查询时立即检查版本号"""
+        self._last_check = 0.0
+
+    def get(self) -> Optional[LiveVectorIndex]:
+        """获取当前版本的索引"""
+        if time.time() - self._last_check < self._check_interval:
+            return self._index
+
+        with self._lock:
+            if time.time() - self._last_check < self._check_interval:
+                return self._index
+            self._last_check = time.time()
+            try:
+                version = self._version_fn()
+                if self._index is None or self._version != version:
+                    self._index = self._refresh(version)
+                    self._version = version if self._index is not None else None
+            except Exception as e:
+                logger.error(f"刷新共享向量索引失败: {e}")
+            return self._index
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 只使用当前配置的后端/量化方式构建、且记录了变更位置的快照
+        if manifest.get('backend', BACKEND_BRUTE) != self.backend or 'change_id' not in manifest \
+                or bool(manifest.get('quantized')) != self.quantize:
+            return None
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp_path = os.path.join(self.directory, f'.{MANIFEST_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_FILE))
+
+    def _refresh(self, version: int) -> Optional[LiveVectorIndex]:
+        """映射更新的快照并叠加增量（调用方持有 self._lock）；需要构建或合并快照时交给后台线程"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        live = self._index
+        manifest = self._read_manifest()
+        if manifest and (live is None or manifest['change_id'] > live.base.change_id):
+            logger.info(f"映射共享向量索引快照，版本 {manifest['version']}，共 {manifest.get('count')} 条")
+            live = LiveVectorIndex(KnowledgeVectorIndex.load(self.directory, manifest))
+        if live is None:
+            self._start_snapshot(lambda: self._builder(version), 0, '构建')
+            return None
+
+        live = self._replay(live)
+        if live.pending >= self._compact_threshold:
+            self._start_snapshot(lambda: live.compacted(version), live.change_id, '合并增量')
+        return live
+
+    def _start_snapshot(self, make_snapshot: Callable[[], KnowledgeVectorIndex], min_change_id: int, action: str):
+        """在后台线程生成新快照（调用方持有 self._lock），同一时间只有一个；上次失败后 retry_interval 秒内不重试"""
+        if self._building or time.time() - self._failed_at < self._retry_interval:
+            return
+        self._building = True
+        threading.Thread(target=self._snapshot_in_background, args=(make_snapshot, min_change_id, action),
+                         name='vector-index-snapshot', daemon=True).start()
+
+    def _snapshot_in_background(self, make_snapshot: Callable[[], KnowledgeVectorIndex], min_change_id: int,
+                                action: str):
+        try:
+            start_time = time.time()
+            snapshot = self._with_build_lock(make_snapshot, min_change_id)
+            with self._lock:
+                # 期间已映射了同样新或更新的快照时不替换
+                if self._index is None or snapshot.change_id > self._index.base.change_id:
+                    self._index = self._replay(LiveVectorIndex(snapshot))
+                    # 生成期间的版本号未必与叠加的增量一致，下次查询时重新检查
+                    self._version = None
+                    self._last_check = 0.0
+            self._failed_at = 0.0
+            logger.info(f"共享向量索引{action}完成，耗时: {time.time() - start_time:.2f}秒")
+        except Exception as e:
+            self._failed_at = time.time()
+            logger.error(f"共享向量索引{action}失败，{self._retry_interval}秒后重试: {e}")
+        finally:
+            self._building = False
+
+    def _replay(self, live: LiveVectorIndex) -> LiveVectorIndex:
+        """把快照之后的知识库变更叠加为内存增量"""
+        changes = self._changes_fn(live.change_id)
+        if not changes:
+            return live
+        change_id, upserts, deleted_ids = changes
+        logger.info(f"向量索引应用增量变更：更新 {len(upserts)} 条，删除 {len(deleted_ids)} 条")
+        return live.apply(upserts, deleted_ids, change_id)
+
+    def _with_build_lock(self, make_snapshot: Callable[[], KnowledgeVectorIndex], min_change_id: int) -> KnowledgeVectorIndex:
+        """持文件锁生成并写出快照；等锁期间其他进程已写出足够新的快照时直接映射"""
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                manifest = self._read_manifest()
+                if manifest and manifest['change_id'] >= min_change_id:
+                    return KnowledgeVectorIndex.load(self.directory, manifest)
+
+                start_time = time.time()
+                snapshot = make_snapshot()
+                manifest = snapshot.save(self.directory, snapshot.version)
+                manifest['backend'] = self.backend
+                self._write_manifest(manifest)
+                self._remove_stale_files(manifest)
+                logger.info(f"共享向量索引快照写出完成，版本 {snapshot.version}，共 {len(snapshot)} 条，耗时: {time.time() - start_time:.2f}秒")
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        if self._on_snapshot:
+            try:
+                self._on_snapshot(manifest['change_id'])
+            except Exception as e:
+                logger.warning(f"快照写出后的清理失败: {e}")
+        return KnowledgeVectorIndex.load(self.directory, manifest)
+
+    def _remove_stale_files(self, manifest: Dict[str, Any]):
+        """删除旧版本索引文件（已映射的进程不受影响）"""
+        keep = {manifest['matrix'], manifest['ids'], manifest.get('centroids'), manifest.get('list_offsets'),
+                manifest.get('quantized'), manifest.get('scales'), MANIFEST_FILE, LOCK_FILE}
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith('kb_') and file_name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except OSError:
+                    pass